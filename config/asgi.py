@@ -3,6 +3,13 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Поток хода отправки рассылок (SSE, ``mailings.views.mailing_progress_stream``)
+работает только под ASGI-сервером, например:
+
+    uvicorn config.asgi:application
+
+Под WSGI страница рассылки опрашивает JSON-эндпоинт прогресса.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +19,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Под ASGI синхронный код выполняется в разных потоках, и постоянные
+# соединения копились бы по одному на поток: соединение на запрос или пул
+os.environ['DB_CONN_MAX_AGE'] = '0'
 
 application = get_asgi_application()
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'mailings.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,15 +61,54 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Постоянные соединения включаются явно: сколько секунд держать
+        # соединение между запросами (0 - новое на каждый запрос, None - без
+        # ограничения). Каждый поток WSGI-сервера держит свое соединение,
+        # поэтому потоков на все процессы должно хватать max_connections;
+        # под ASGI (config/asgi.py) и с DB_POOL они всегда выключены
+        'CONN_MAX_AGE': None if os.getenv('DB_CONN_MAX_AGE') == 'None' else int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        # Проверка соединения перед повторным использованием
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Пул соединений psycopg (psycopg_pool из зависимости psycopg[binary,pool]).
+# Рекомендуется при запуске под ASGI, где постоянные соединения не используются
+if os.getenv('DB_POOL') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Реплика для чтения: безопасные запросы (GET) читают с нее, запись,
+# отправка рассылок и команды работают с основной базой.
+# Незаданные DB_REPLICA_* берутся из основной базы
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': os.getenv('DB_REPLICA_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['mailings.routers.ReplicaRouter']
+
+# Сколько секунд после POST пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 # ========== НАСТРОЙКИ EMAIL ДЛЯ GMAIL ==========
 
 # URL сайта для ссылок в письмах
@@ -141,11 +181,34 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'mailings:home'
 LOGOUT_REDIRECT_URL = 'mailings:home'
 
+# Двухуровневый кеш: LRU в памяти процесса перед Redis (mailings.cache_backends).
+# Счетчики прогресса рассылок и состояние SMTP-выключателя меняются постоянно,
+# их читаем только из Redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'BACKEND': 'mailings.cache_backends.TwoTierCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 30)),
+            'LOCAL_EXCLUDE_PREFIXES': ['mailings:progress:', 'mailings:smtp:'],
+            'RETRY_INTERVAL': int(os.getenv('CACHE_RETRY_INTERVAL', 5)),
+            'socket_connect_timeout': float(os.getenv('REDIS_TIMEOUT', 0.5)),
+            'socket_timeout': float(os.getenv('REDIS_TIMEOUT', 0.5)),
+        },
     }
 }
 
 CACHE_MIDDLEWARE_SECONDS = 300
+
+# Архив попыток рассылок (помесячные секции, выгруженные из горячей таблицы)
+ATTEMPTS_ARCHIVE_DIR = os.getenv('ATTEMPTS_ARCHIVE_DIR', BASE_DIR / 'archive' / 'attempts')
+ATTEMPTS_HOT_MONTHS = int(os.getenv('ATTEMPTS_HOT_MONTHS', 6))
+
+# Фоновая отправка рассылок: количество потоков в каждом процессе
+MAILING_SEND_WORKERS = int(os.getenv('MAILING_SEND_WORKERS', 2))
+
+# Выключатель SMTP-сервера (mailings.circuit): после стольких ошибок соединения
+# подряд отправка через сервер откладывается на SMTP_BREAKER_OPEN_SECONDS секунд
+SMTP_BREAKER_THRESHOLD = int(os.getenv('SMTP_BREAKER_THRESHOLD', 5))
+SMTP_BREAKER_OPEN_SECONDS = int(os.getenv('SMTP_BREAKER_OPEN_SECONDS', 60))
@@ -0,0 +1,38 @@
+"""
+Настройки для запуска тестов без PostgreSQL и Redis:
+
+    python manage.py test --settings=config.settings_test
+
+Основная база и реплика — два отдельных файла SQLite, кеш — в памяти процесса.
+Маршрутизатор реплики по умолчанию выключен: тестовые данные создаются
+в основной базе. Тесты маршрутизации включают его через override_settings
+и заполняют реплику сами.
+"""
+
+from config.settings import *  # noqa: F401,F403
+from config.settings import BASE_DIR
+
+SECRET_KEY = 'test-secret-key'
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+    },
+}
+DATABASE_ROUTERS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+STATICFILES_DIRS = []
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -1,40 +1,276 @@
 from django.contrib import admin
-from mailings.models import Client, Message, Mailing, MailingAttempt
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from mailings.cache import bump_owners
+from mailings.models import (
+    Client,
+    Message,
+    Mailing,
+    MailingAttempt,
+    MessageAttachment,
+    Segment,
+    Suppression,
+)
+from mailings.pagination import ApproximatePaginator
+from mailings.search import apply_search
+from mailings.tasks import enqueue_mailing
+
+# Больше получателей в форме рассылки не выводится (см. MailingAdmin)
+MAX_EDITABLE_RECIPIENTS = 1000
+SUPPRESS_BATCH_SIZE = 2000
+
+
+class IndexedSearchMixin:
+    """Поиск в админке через индексы mailings.search вместо ILIKE '%...%'"""
+
+    search_text_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset = apply_search(
+            queryset, search_term, self.search_fields, self.search_text_fields
+        )
+        return queryset, False
+
+
+class LargeTableMixin:
+    """
+    Список без полного ``COUNT(*)``: приблизительное количество страниц
+    и без второго подсчета всех строк таблицы при фильтрации.
+    """
+
+    paginator = ApproximatePaginator
+    show_full_result_count = False
+
+
+class BlockMixin:
+    """
+    Блокировка записей по праву ``can_block_<модель>``.
+
+    Флаг ``is_blocked`` доступен для изменения только с этим правом,
+    действия меняют флаг одним UPDATE по выбранным записям.
+    """
+
+    def has_block_permission(self, request):
+        opts = self.opts
+        return request.user.has_perm(f"{opts.app_label}.can_block_{opts.model_name}")
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly = tuple(super().get_readonly_fields(request, obj))
+        if not self.has_block_permission(request):
+            readonly += ("is_blocked",)
+        return readonly
+
+    def update_flags(self, queryset, **values):
+        """UPDATE без сигналов: поколения кеша владельцев меняем сами"""
+        owner_ids = list(queryset.values_list("owner_id", flat=True).distinct())
+        updated = queryset.update(updated_at=timezone.now(), **values)
+        bump_owners(owner_ids)
+        return updated
+
+    @admin.action(description="Заблокировать выбранные", permissions=["block"])
+    def block(self, request, queryset):
+        updated = self.update_flags(queryset, is_blocked=True)
+        self.message_user(request, f"Заблокировано: {updated}")
+
+    @admin.action(description="Разблокировать выбранные", permissions=["block"])
+    def unblock(self, request, queryset):
+        updated = self.update_flags(queryset, is_blocked=False)
+        self.message_user(request, f"Разблокировано: {updated}")
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
-    list_display = ("full_name", "email", "owner")
-    list_filter = ("owner",)
+class ClientAdmin(LargeTableMixin, BlockMixin, IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ("full_name", "email", "owner", "is_blocked")
+    # Фильтр по владельцу выводил бы список всех пользователей,
+    # отбор по владельцу доступен через ?owner__id__exact=<id>
+    list_filter = ("is_blocked",)
+    list_select_related = ("owner",)
+    raw_id_fields = ("owner",)
     search_fields = ("full_name", "email")
+    search_text_fields = ("comment",)
+    actions = ["block", "unblock", "suppress"]
+
+    def has_suppress_permission(self, request):
+        return request.user.has_perm("mailings.add_suppression")
+
+    @admin.action(description="Добавить в список исключений", permissions=["suppress"])
+    def suppress(self, request, queryset):
+        emails = queryset.order_by().values_list("email", flat=True)
+        batch = []
+        for email in emails.iterator(chunk_size=SUPPRESS_BATCH_SIZE):
+            batch.append(Suppression(email=email, reason="unsubscribe"))
+            if len(batch) >= SUPPRESS_BATCH_SIZE:
+                Suppression.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Suppression.objects.bulk_create(batch, ignore_conflicts=True)
+        # Фильтр исключений подхватит новые адреса при следующем обновлении
+        self.message_user(request, "Адреса добавлены в список исключений")
+
+
+class MessageAttachmentInline(admin.TabularInline):
+    model = MessageAttachment
+    extra = 0
+    readonly_fields = ("size", "created_at")
 
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
-    list_display = ("subject", "owner")
-    list_filter = ("owner",)
+class MessageAdmin(LargeTableMixin, BlockMixin, IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ("subject", "owner", "is_blocked")
+    list_filter = ("is_blocked",)
+    list_select_related = ("owner",)
+    raw_id_fields = ("owner",)
     search_fields = ("subject",)
+    search_text_fields = ("body",)
+    actions = ["block", "unblock"]
+    inlines = [MessageAttachmentInline]
+
+
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ("name", "email_domains", "comment_tags", "owner")
+    list_select_related = ("owner",)
+    search_fields = ("name",)
+    raw_id_fields = ("owner",)
+
+
+class LatestAttemptsFormSet(BaseInlineFormSet):
+    """Только последние попытки рассылки, а не все ее строки"""
+
+    def get_queryset(self):
+        if not hasattr(self, "_latest_attempts"):
+            queryset = super().get_queryset().order_by("-attempt_time", "-id")
+            self._latest_attempts = queryset[: MailingAttemptInline.max_shown]
+        return self._latest_attempts
 
 
 class MailingAttemptInline(admin.TabularInline):
     model = MailingAttempt
+    formset = LatestAttemptsFormSet
+    max_shown = 20
     extra = 0
-    readonly_fields = ("attempt_time", "status", "server_response")
+    fields = ("attempt_time", "status", "server_response")
+    readonly_fields = fields
     can_delete = False
+    verbose_name_plural = f"Последние {max_shown} попыток"
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Mailing)
-class MailingAdmin(admin.ModelAdmin):
-    list_display = ("id", "message", "start_time", "end_time", "status", "owner")
-    list_filter = ("status", "owner")
+class MailingAdmin(LargeTableMixin, BlockMixin, admin.ModelAdmin):
+    list_display = (
+        "id",
+        "message",
+        "segment",
+        "start_time",
+        "end_time",
+        "status",
+        "is_blocked",
+        "is_disabled",
+        "owner",
+    )
+    list_filter = ("status", "is_blocked", "is_disabled")
+    list_select_related = ("message", "segment", "owner")
     search_fields = ("message__subject",)
-    filter_horizontal = ("recipients",)
+    raw_id_fields = ("message", "segment", "recipients", "owner")
     inlines = [MailingAttemptInline]
-    readonly_fields = ("status",)
+    readonly_fields = ("status", "recipients_summary", "attempts_link")
+    actions = [
+        "send_now",
+        "force_complete",
+        "disable",
+        "enable",
+        "block",
+        "unblock",
+    ]
+
+    def has_disable_permission(self, request):
+        return request.user.has_perm("mailings.can_disable_mailing")
+
+    @admin.action(description="Отправить сейчас", permissions=["change"])
+    def send_now(self, request, queryset):
+        # Список берется до UPDATE: фильтр по статусу в списке админки
+        # после него уже не выбрал бы эти рассылки
+        now = timezone.now()
+        active = list(
+            queryset.sendable()
+            .filter(start_time__lte=now, end_time__gte=now)
+            .select_related(None)
+            .only("id", "owner_id")
+        )
+        queryset.refresh_statuses()
+        queued = sum(enqueue_mailing(mailing) for mailing in active)
+        self.message_user(
+            request,
+            f"Поставлено в очередь: {queued}, уже отправляются: "
+            f"{len(active) - queued}, вне периода или заблокированы: "
+            f"{queryset.count() - len(active)}",
+        )
+
+    @admin.action(description="Завершить досрочно", permissions=["change"])
+    def force_complete(self, request, queryset):
+        updated = queryset.force_complete()
+        self.message_user(request, f"Завершено: {updated}")
+
+    @admin.action(description="Отключить выбранные", permissions=["disable"])
+    def disable(self, request, queryset):
+        updated = self.update_flags(queryset, is_disabled=True)
+        self.message_user(request, f"Отключено: {updated}")
+
+    @admin.action(description="Включить выбранные", permissions=["disable"])
+    def enable(self, request, queryset):
+        updated = self.update_flags(queryset, is_disabled=False)
+        self.message_user(request, f"Включено: {updated}")
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly = super().get_readonly_fields(request, obj)
+        if not self.has_disable_permission(request):
+            readonly += ("is_disabled",)
+        return readonly
+
+    def get_exclude(self, request, obj=None):
+        exclude = tuple(super().get_exclude(request, obj) or ())
+        # Поле raw_id выводит id всех получателей, для больших рассылок
+        # они редактируются на сайте
+        if obj is not None and obj.recipients.count() > MAX_EDITABLE_RECIPIENTS:
+            exclude += ("recipients",)
+        return exclude
+
+    @admin.display(description="Получателей в списке")
+    def recipients_summary(self, obj):
+        if obj.pk is None:
+            return "-"
+        return obj.recipients.count()
+
+    @admin.display(description="Все попытки")
+    def attempts_link(self, obj):
+        if obj.pk is None:
+            return "-"
+        url = reverse("admin:mailings_mailingattempt_changelist")
+        return format_html(
+            '<a href="{}?mailing__id__exact={}">Открыть список</a>', url, obj.pk
+        )
 
 
 @admin.register(MailingAttempt)
-class MailingAttemptAdmin(admin.ModelAdmin):
+class MailingAttemptAdmin(LargeTableMixin, admin.ModelAdmin):
     list_display = ("mailing", "attempt_time", "status")
     list_filter = ("status", "attempt_time")
+    list_select_related = ("mailing__message",)
+    # Совпадает с индексом attempt_time_id_idx (mailing_id — с
+    # attempt_mailing_time_id_idx при фильтре по рассылке)
+    ordering = ("-attempt_time", "-id")
     readonly_fields = ("attempt_time", "status", "server_response", "mailing")
+
+
+@admin.register(Suppression)
+class SuppressionAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ("email", "reason", "created_at")
+    list_filter = ("reason",)
+    search_fields = ("email",)
+    readonly_fields = ("created_at",)
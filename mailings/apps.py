@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MailingsConfig(AppConfig):
     name = "mailings"
+
+    def ready(self):
+        from mailings import signals  # noqa: F401
@@ -0,0 +1,59 @@
+"""
+Вложения писем, закодированные один раз на рассылку.
+
+Файл читается через ``mmap`` без копирования в память процесса и сразу
+кодируется в base64. Готовая MIME-часть с закодированным содержимым
+прикладывается ко всем письмам рассылки как есть: на каждого получателя
+не выполняется ни чтение файла, ни повторное кодирование.
+"""
+
+import base64
+import mmap
+
+import django
+
+if django.VERSION >= (6, 0):
+    from email.message import MIMEPart
+else:
+    from email.mime.base import MIMEBase
+
+
+def _new_part(content_type):
+    # Начиная с Django 6.0 EmailMessage.attach() принимает MIMEPart,
+    # прием MIMEBase объявлен устаревшим
+    if django.VERSION >= (6, 0):
+        part = MIMEPart()
+        part["Content-Type"] = content_type
+        return part
+    maintype, subtype = content_type.split("/", 1)
+    return MIMEBase(maintype, subtype)
+
+
+def _encode_file(field_file):
+    """Содержимое файла в base64 (строки по 76 символов, как требует MIME)"""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        # Хранилище без локальных путей: читаем обычным способом
+        with field_file.open("rb") as file:
+            return base64.encodebytes(file.read()).decode("ascii")
+
+    with open(path, "rb") as file:
+        if not file.seek(0, 2):
+            return ""
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return base64.encodebytes(data).decode("ascii")
+
+
+def encode_part(attachment):
+    """MIME-часть вложения с уже закодированным содержимым"""
+    part = _new_part(attachment.content_type or "application/octet-stream")
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=attachment.filename)
+    part.set_payload(_encode_file(attachment.file))
+    return part
+
+
+def encoded_parts(message):
+    """Закодированные вложения сообщения, по одному разу на рассылку"""
+    return [encode_part(attachment) for attachment in message.attachments.all()]
@@ -0,0 +1,83 @@
+"""
+Ключи кеша с поколениями (версиями).
+
+Закешированные данные никогда не удаляются явно: при изменении моделей
+сигналы увеличивают номер поколения, и следующие запросы обращаются уже
+к новым ключам. Старые записи просто вытесняются по таймауту.
+
+Вместе с поколением запоминается время последнего изменения области
+(``last_modified``) — по нему страницы отвечают на условные GET-запросы.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+GLOBAL_SCOPE = "global"
+
+
+def _version_key(scope):
+    return f"mailings:version:{scope}"
+
+
+def _changed_key(scope):
+    return f"mailings:changed:{scope}"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Начальное значение по времени, чтобы после вытеснения ключа версии
+        # не вернуться к номеру, под которым еще лежат устаревшие данные
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+    cache.set(_changed_key(scope), timezone.now(), timeout=None)
+
+
+def bump_owners(owner_ids, global_stats=False):
+    """Смена поколений после массовых изменений без сигналов (``update``)"""
+    if global_stats:
+        bump_version(GLOBAL_SCOPE)
+    for owner_id in set(owner_ids):
+        if owner_id:
+            bump_version(user_scope(owner_id))
+
+
+def last_modified(*scopes):
+    """Время последнего изменения любой из областей"""
+    values = cache.get_many([_changed_key(scope) for scope in scopes])
+    for scope in scopes:
+        if _changed_key(scope) not in values:
+            # Ключ вытеснен: считаем, что изменения были только что
+            now = timezone.now()
+            cache.add(_changed_key(scope), now, timeout=None)
+            values[_changed_key(scope)] = cache.get(_changed_key(scope), now)
+    return max(values.values())
+
+
+def versioned_key(name, *scopes):
+    """Ключ, который меняется при смене поколения любой из областей"""
+    versions = ":".join(f"{scope}={get_version(scope)}" for scope in scopes)
+    return f"mailings:{name}:{versions}"
+
+
+def get_or_set(name, scopes, default, timeout=None):
+    if timeout is None:
+        timeout = settings.CACHE_MIDDLEWARE_SECONDS
+    return cache.get_or_set(versioned_key(name, *scopes), default, timeout)
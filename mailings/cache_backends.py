@@ -0,0 +1,389 @@
+"""
+Двухуровневый кеш: LRU в памяти процесса перед Redis.
+
+Чтение сначала идет в локальный LRU, при промахе — в Redis, и значение
+запоминается локально не дольше ``LOCAL_TIMEOUT`` секунд. Изменения ключей
+(``set``, ``incr``, ``delete``...) публикуются в канал Redis, и остальные
+процессы удаляют эти ключи из своего LRU. Если Redis недоступен, кеш
+продолжает работать на локальном уровне (с тем же сроком ``LOCAL_TIMEOUT``)
+и повторяет попытку подключения не чаще раза в ``RETRY_INTERVAL`` секунд.
+
+Ключи с префиксами ``LOCAL_EXCLUDE_PREFIXES`` никогда не хранятся локально.
+``add`` без Redis возвращает ``False``: на нем построены блокировки,
+а локальная копия не защищает от второго процесса.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'mailings.cache_backends.TwoTierCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+            'OPTIONS': {
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 30,
+                'LOCAL_EXCLUDE_PREFIXES': ['mailings:progress:'],
+            },
+        }
+    }
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.redis import RedisCache
+from redis import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+ALL_KEYS = "*"
+
+
+class RemoteUnavailable(Exception):
+    """Redis не ответил или помечен недоступным до следующей попытки"""
+
+
+class LocalLRU:
+    """Ограниченный по размеру словарь с вытеснением давно не используемых ключей"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return _MISSING
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self.data[key]
+                return _MISSING
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.data[key] = (value, expires_at)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            return self.data.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class LocalTier:
+    """
+    Общее для всех потоков процесса состояние: LRU, подписка на инвалидацию
+    и отметка о недоступности Redis.
+
+    Django создает экземпляр бэкенда кеша в каждом потоке, поэтому это
+    состояние хранится отдельно, по одному на адрес Redis и канал.
+    """
+
+    def __init__(self, server, channel, max_entries, retry_interval, timeouts):
+        self.server = server
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.timeouts = timeouts
+        self.lru = LocalLRU(max_entries)
+        self.token = uuid.uuid4().hex
+        self.down_until = 0.0
+        self.lock = threading.Lock()
+        self._redis = None
+        self._listener = None
+        self._listener_pid = None
+
+    @property
+    def is_down(self):
+        return time.monotonic() < self.down_until
+
+    def mark_down(self, error):
+        if not self.is_down:
+            logger.warning("Redis недоступен, кеш работает локально: %s", error)
+        self.down_until = time.monotonic() + self.retry_interval
+
+    def publish(self, keys):
+        if not keys or self.is_down:
+            return
+        payload = self.token + "|" + "\n".join(keys)
+        try:
+            if self._redis is None:
+                self._redis = Redis.from_url(self.server, **self.timeouts)
+            self._redis.publish(self.channel, payload)
+        except RedisError as e:
+            self.mark_down(e)
+
+    def ensure_listener(self):
+        """Подписка на инвалидацию, отдельно в каждом процессе (после fork)"""
+        pid = os.getpid()
+        if self._listener_pid == pid or self.is_down:
+            return
+        with self.lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+            self._redis = None
+            try:
+                # Без socket_timeout: соединение подписки подолгу простаивает
+                subscriber = Redis.from_url(
+                    self.server,
+                    socket_connect_timeout=self.timeouts["socket_connect_timeout"],
+                )
+                pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_message})
+                self._listener = pubsub.run_in_thread(
+                    sleep_time=1,
+                    daemon=True,
+                    exception_handler=self._on_listener_error,
+                )
+            except RedisError as e:
+                # Повторим при первом обращении после RETRY_INTERVAL
+                self._listener_pid = None
+                self.mark_down(e)
+
+    def _on_listener_error(self, error, pubsub, thread):
+        # Пока подписка не работала, сообщения об изменениях могли потеряться
+        self.lru.clear()
+        time.sleep(self.retry_interval)
+
+    def _on_message(self, message):
+        data = message["data"]
+        if isinstance(data, bytes):
+            data = data.decode()
+        token, _, keys = data.partition("|")
+        if token == self.token:
+            return
+        for key in keys.split("\n"):
+            if key == ALL_KEYS:
+                self.lru.clear()
+            else:
+                self.lru.delete(key)
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def get_local_tier(server, channel, **kwargs):
+    with _tiers_lock:
+        tier = _tiers.get((server, channel))
+        if tier is None:
+            tier = _tiers[server, channel] = LocalTier(server, channel, **kwargs)
+        return tier
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = dict(params.get("OPTIONS", {}))
+        self.local_timeout = options.pop("LOCAL_TIMEOUT", 30)
+        self.exclude_prefixes = tuple(options.pop("LOCAL_EXCLUDE_PREFIXES", ()))
+        channel = options.pop("CHANNEL", "cache:invalidate")
+        max_entries = options.pop("LOCAL_MAX_ENTRIES", 1000)
+        retry_interval = options.pop("RETRY_INTERVAL", 5)
+        options.setdefault("socket_connect_timeout", 0.5)
+        options.setdefault("socket_timeout", 0.5)
+
+        self.remote = RedisCache(server, {**params, "OPTIONS": options})
+        self.tier = get_local_tier(
+            self.remote._servers[0],
+            channel,
+            max_entries=max_entries,
+            retry_interval=retry_interval,
+            timeouts={
+                "socket_connect_timeout": options["socket_connect_timeout"],
+                "socket_timeout": options["socket_timeout"],
+            },
+        )
+        self.local = self.tier.lru
+
+    def _call(self, method, *args, **kwargs):
+        if self.tier.is_down:
+            raise RemoteUnavailable
+        try:
+            return getattr(self.remote, method)(*args, **kwargs)
+        except RedisError as e:
+            self.tier.mark_down(e)
+            raise RemoteUnavailable from e
+
+    def _publish(self, keys):
+        self.tier.publish(keys)
+
+    def _ensure_listener(self):
+        self.tier.ensure_listener()
+
+    # Локальный уровень
+
+    def _is_local(self, key):
+        return not key.startswith(self.exclude_prefixes)
+
+    def _local_expiry(self, timeout):
+        expires_at = self.get_backend_timeout(timeout)
+        local_expires_at = time.time() + self.local_timeout
+        if expires_at is None:
+            return local_expires_at
+        return min(expires_at, local_expires_at)
+
+    def _remember(self, key, version, value, timeout=DEFAULT_TIMEOUT):
+        if not self._is_local(key):
+            return
+        cache_key = self.make_and_validate_key(key, version=version)
+        expires_at = self._local_expiry(timeout)
+        if expires_at is not None and expires_at <= time.time():
+            self.local.delete(cache_key)
+        else:
+            self.local.set(cache_key, value, expires_at)
+
+    def _forget(self, keys, version):
+        cache_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        for cache_key in cache_keys:
+            self.local.delete(cache_key)
+        return [
+            cache_key for key, cache_key in zip(keys, cache_keys) if self._is_local(key)
+        ]
+
+    # API кеша Django
+
+    def get(self, key, default=None, version=None):
+        self._ensure_listener()
+        cache_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(cache_key)
+        if value is not _MISSING:
+            return value
+        try:
+            value = self._call("get", key, _MISSING, version=version)
+        except RemoteUnavailable:
+            return default
+        if value is _MISSING:
+            return default
+        self._remember(key, version, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._ensure_listener()
+        result = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                result[key] = value
+        if missing:
+            try:
+                found = self._call("get_many", missing, version=version)
+            except RemoteUnavailable:
+                found = {}
+            for key, value in found.items():
+                self._remember(key, version, value)
+            result.update(found)
+        return result
+
+    def has_key(self, key, version=None):
+        if (
+            self.local.get(self.make_and_validate_key(key, version=version))
+            is not _MISSING
+        ):
+            return True
+        try:
+            return self._call("has_key", key, version=version)
+        except RemoteUnavailable:
+            return False
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            added = self._call("add", key, value, timeout, version=version)
+        except RemoteUnavailable:
+            return False
+        if added:
+            self._remember(key, version, value, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        try:
+            self._call("set", key, value, timeout, version=version)
+        except RemoteUnavailable:
+            self._remember(key, version, value, timeout)
+            return
+        self._publish(self._forget([key], version))
+        self._remember(key, version, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        try:
+            self._call("set_many", data, timeout, version=version)
+        except RemoteUnavailable:
+            for key, value in data.items():
+                self._remember(key, version, value, timeout)
+            return []
+        self._publish(self._forget(list(data), version))
+        for key, value in data.items():
+            self._remember(key, version, value, timeout)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            touched = self._call("touch", key, timeout, version=version)
+        except RemoteUnavailable:
+            return False
+        # Локальная копия перечитается из Redis с новым сроком
+        self._forget([key], version)
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        self._ensure_listener()
+        try:
+            value = self._call("incr", key, delta, version=version)
+        except RemoteUnavailable:
+            cache_key = self.make_and_validate_key(key, version=version)
+            current = self.local.get(cache_key)
+            if current is _MISSING:
+                raise ValueError(f"Key '{key}' not found")
+            value = current + delta
+            self._remember(key, version, value, None)
+            return value
+        self._publish(self._forget([key], version))
+        return value
+
+    def delete(self, key, version=None):
+        self._ensure_listener()
+        self._publish(self._forget([key], version))
+        try:
+            return self._call("delete", key, version=version)
+        except RemoteUnavailable:
+            return False
+
+    def delete_many(self, keys, version=None):
+        self._ensure_listener()
+        keys = list(keys)
+        self._publish(self._forget(keys, version))
+        try:
+            self._call("delete_many", keys, version=version)
+        except RemoteUnavailable:
+            pass
+
+    def clear(self):
+        self.local.clear()
+        self._publish([ALL_KEYS])
+        try:
+            return self._call("clear")
+        except RemoteUnavailable:
+            return False
+
+    def close(self, **kwargs):
+        self.remote.close(**kwargs)
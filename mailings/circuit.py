@@ -0,0 +1,112 @@
+"""
+Автоматический выключатель (circuit breaker) для SMTP-серверов.
+
+Состояние хранится в общем кеше, поэтому его видят все процессы и потоки
+отправки:
+
+* закрыт — письма отправляются, подряд идущие ошибки соединения считаются;
+* открыт — после ``SMTP_BREAKER_THRESHOLD`` ошибок подряд сервер не
+  используется ``SMTP_BREAKER_OPEN_SECONDS`` секунд, оставшиеся письма
+  откладываются;
+* полуоткрыт — по истечении паузы одно письмо (из любого процесса)
+  отправляется пробным: успех закрывает выключатель, ошибка снова
+  открывает его.
+
+Ошибками сервера считаются только сбои соединения и временные отказы
+(4xx); отказ в конкретном адресе (``SMTPRecipientsRefused``) к ним
+не относится.
+"""
+
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_THRESHOLD = 5
+DEFAULT_OPEN_SECONDS = 60
+# Пробное письмо дольше этого времени не блокирует другие попытки
+PROBE_TIMEOUT = 60
+
+
+def is_host_failure(error):
+    """Ошибка сервера целиком, а не отдельного получателя или письма"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPSenderRefused):
+        # Отправителя сервер отклонит и для всех остальных писем
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # SMTPServerDisconnected, таймауты, отказ в соединении
+    return isinstance(error, OSError)
+
+
+def connection_host(connection):
+    """Имя SMTP-сервера соединения, для прочих бэкендов — имя бэкенда"""
+    host = getattr(connection, "host", None)
+    if host:
+        return f"{host}:{getattr(connection, 'port', '')}"
+    return type(connection).__module__
+
+
+class SMTPCircuitBreaker:
+    def __init__(self, host):
+        self.host = host
+        self.threshold = getattr(settings, "SMTP_BREAKER_THRESHOLD", DEFAULT_THRESHOLD)
+        self.open_seconds = getattr(
+            settings, "SMTP_BREAKER_OPEN_SECONDS", DEFAULT_OPEN_SECONDS
+        )
+
+    def key(self, field):
+        return f"mailings:smtp:{self.host}:{field}"
+
+    def state(self):
+        opened_until = cache.get(self.key("opened_until"))
+        if opened_until is None:
+            return CLOSED
+        return OPEN if time.time() < opened_until else HALF_OPEN
+
+    def retry_in(self):
+        """Секунд до пробного письма (0 — можно отправлять)"""
+        opened_until = cache.get(self.key("opened_until"))
+        return max(0.0, opened_until - time.time()) if opened_until else 0.0
+
+    def allow(self):
+        """Можно ли отправить следующее письмо через этот сервер"""
+        state = self.state()
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        # Полуоткрыт: пробное письмо отправляет только один участник
+        return cache.add(self.key("probe"), 1, timeout=PROBE_TIMEOUT)
+
+    def record_success(self):
+        keys = [self.key("failures"), self.key("opened_until")]
+        # Обычно выключатель закрыт и ошибок нет: только одно чтение
+        if cache.get_many(keys):
+            cache.delete_many([*keys, self.key("probe")])
+
+    def record_failure(self):
+        if self.state() != CLOSED:
+            # Пробное письмо не прошло
+            self.open()
+            return
+        try:
+            failures = cache.incr(self.key("failures"))
+        except ValueError:
+            cache.set(self.key("failures"), 1, timeout=self.open_seconds * 10)
+            failures = 1
+        if failures >= self.threshold:
+            self.open()
+
+    def open(self):
+        cache.set(
+            self.key("opened_until"), time.time() + self.open_seconds, timeout=None
+        )
+        cache.delete_many([self.key("failures"), self.key("probe")])
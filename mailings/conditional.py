@@ -0,0 +1,90 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для страниц сервиса.
+
+Валидаторы строятся без основных запросов страницы: по поколениям кеша
+и времени последнего изменения данных владельца (``mailings.cache``) или
+по ``updated_at`` одной записи. Если они совпадают с заголовками
+``If-None-Match`` / ``If-Modified-Since``, ответ 304 отдается без
+выборки списков и рендеринга шаблона.
+"""
+
+import hashlib
+import json
+
+from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from mailings.cache import get_version, last_modified, user_scope
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для представлений с данными текущего пользователя.
+
+    По умолчанию страница зависит от поколения ``user:<id>``; представления
+    переопределяют ``get_change_scopes`` или ``get_validators`` целиком.
+    """
+
+    def get_change_scopes(self):
+        return [user_scope(self.request.user.pk)]
+
+    def get_validators(self):
+        """
+        Пара (значения для ETag, время изменения).
+
+        ``None`` — проверить актуальность заранее нельзя, страница строится
+        полностью.
+        """
+        scopes = self.get_change_scopes()
+        return [get_version(scope) for scope in scopes], last_modified(*scopes)
+
+    def get_etag(self, parts):
+        request = self.request
+        # Пользователь и CSRF-токен тоже попадают в страницу (меню, формы)
+        payload = json.dumps(
+            [request.user.pk, request.META.get("CSRF_COOKIE"), *parts], default=str
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def is_conditional(self, request):
+        # Непоказанные flash-сообщения выводятся только при рендеринге
+        return (
+            request.method in ("GET", "HEAD")
+            and request.user.is_authenticated
+            and not len(messages.get_messages(request))
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        validators = self.get_validators()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        parts, modified = validators
+        etag = self.get_etag(parts)
+        view = condition(
+            etag_func=lambda *args, **kwargs: etag,
+            last_modified_func=lambda *args, **kwargs: modified,
+        )(super().dispatch)
+        response = view(request, *args, **kwargs)
+        # Браузер не должен показывать копию без проверки на сервере
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ConditionalDetailMixin(ConditionalGetMixin):
+    """Страница одной записи: валидатор — ее ``updated_at``"""
+
+    def get_validators(self):
+        updated_at = (
+            self.get_queryset()
+            .filter(pk=self.kwargs["pk"])
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        return [updated_at.isoformat()], updated_at
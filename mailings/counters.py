@@ -0,0 +1,81 @@
+"""
+Счетчики общей статистики главной страницы.
+
+Значения хранятся в таблице ``StatCounter`` и меняются атомарным
+``UPDATE ... SET value = value + delta`` из сигналов сохранения и удаления,
+поэтому главная страница не сканирует большие таблицы. В одной транзакции
+с самой записью счетчик меняется, только если вызывающий код выполняется
+внутри ``transaction.atomic()``; иначе это отдельный запрос сразу после
+записи. Пути, минуя сигналы (``bulk_create``, ``QuerySet.update``), должны
+вызывать ``increment`` сами; расхождения исправляет команда
+``reconcile_counters``.
+
+Активными считаются рассылки со статусом «Запущена». Статус зависит от
+времени, поэтому ``send_mailings`` и ``reconcile_counters`` сначала
+переводят рассылки, чей период начался или закончился, в актуальный статус
+(``Mailing.objects.refresh_statuses()``), обновляя и счетчик.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+
+TOTAL_MAILINGS = "total_mailings"
+ACTIVE_MAILINGS = "active_mailings"
+TOTAL_CLIENTS = "total_clients"
+
+COUNTERS = (TOTAL_MAILINGS, ACTIVE_MAILINGS, TOTAL_CLIENTS)
+
+
+def compute(name):
+    """Точное значение счетчика по исходным таблицам"""
+    from mailings.models import Client, Mailing
+
+    if name == TOTAL_MAILINGS:
+        return Mailing.objects.count()
+    if name == ACTIVE_MAILINGS:
+        return Mailing.objects.filter(status="started").count()
+    if name == TOTAL_CLIENTS:
+        # email уникален, поэтому число клиентов равно числу уникальных адресов
+        return Client.objects.count()
+    raise ValueError(f"Неизвестный счетчик: {name}")
+
+
+def reconcile(name):
+    """Пересчет счетчика по исходной таблице, возвращает (было, стало)"""
+    from mailings.models import StatCounter
+
+    value = compute(name)
+    counter, created = StatCounter.objects.get_or_create(
+        name=name, defaults={"value": value}
+    )
+    old_value = None if created else counter.value
+    if not created and counter.value != value:
+        counter.value = value
+        counter.save(update_fields=["value", "updated_at"])
+    return old_value, value
+
+
+def increment(name, delta=1):
+    from mailings.models import StatCounter
+
+    if not delta:
+        return
+    updated = StatCounter.objects.filter(name=name).update(
+        value=F("value") + delta, updated_at=timezone.now()
+    )
+    if not updated:
+        # Счетчика еще нет: считаем его целиком, изменение уже в таблице
+        reconcile(name)
+
+
+def get_counters():
+    """Текущие значения всех счетчиков одним запросом"""
+    from mailings.models import StatCounter
+
+    values = dict(
+        StatCounter.objects.filter(name__in=COUNTERS).values_list("name", "value")
+    )
+    for name in COUNTERS:
+        if name not in values:
+            values[name] = reconcile(name)[1]
+    return values
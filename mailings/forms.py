@@ -1,7 +1,8 @@
 from django import forms
 from django.utils import timezone
+from django.utils.functional import cached_property
 
-from mailings.models import Client, Message, Mailing
+from mailings.models import Client, Message, Mailing, Segment
 
 
 class ClientForm(forms.ModelForm):
@@ -20,8 +21,36 @@ class ClientForm(forms.ModelForm):
             ),
         }
 
+    def clean_email(self):
+        return Client.normalize_email(self.cleaned_data["email"])
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """Поле загрузки нескольких файлов сразу"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput(attrs={"class": "form-control"}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [
+                super(MultipleFileField, self).clean(item, initial) for item in data
+            ]
+        return [super().clean(data, initial)] if data else []
+
 
 class MessageForm(forms.ModelForm):
+    attachments = MultipleFileField(
+        label="Вложения",
+        required=False,
+        help_text="Файлы добавляются к уже загруженным вложениям сообщения",
+    )
+
     class Meta:
         model = Message
         fields = ["subject", "body"]
@@ -38,11 +67,97 @@ class MessageForm(forms.ModelForm):
             ),
         }
 
+    def save(self, commit=True):
+        message = super().save(commit)
+        if commit:
+            self.save_attachments()
+        return message
+
+    def save_attachments(self):
+        for upload in self.cleaned_data.get("attachments") or []:
+            self.instance.attachments.create(
+                file=upload,
+                filename=upload.name,
+                content_type=upload.content_type or "application/octet-stream",
+                size=upload.size,
+            )
+
+
+class SegmentForm(forms.ModelForm):
+    class Meta:
+        model = Segment
+        fields = ["name", "email_domains", "comment_tags"]
+        widgets = {
+            "name": forms.TextInput(
+                attrs={"class": "form-control", "placeholder": "Название"}
+            ),
+            "email_domains": forms.TextInput(
+                attrs={"class": "form-control", "placeholder": "mail.ru, yandex.ru"}
+            ),
+            "comment_tags": forms.TextInput(
+                attrs={"class": "form-control", "placeholder": "vip, опт"}
+            ),
+        }
+
+
+class ClientIdsField(forms.ModelMultipleChoiceField):
+    """
+    Клиенты, переданные одним скрытым полем через запятую.
+
+    Одно поле вместо поля на каждого клиента: форма не упирается в
+    ``DATA_UPLOAD_MAX_NUMBER_FIELDS``, сколько бы клиентов ни было выбрано.
+    """
+
+    widget = forms.HiddenInput
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Client.objects.none())
+        kwargs.setdefault("required", False)
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def split(value):
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+    def clean(self, value):
+        return super().clean(self.split(value))
+
+    def has_changed(self, initial, data):
+        return super().has_changed(initial, self.split(data))
+
 
 class MailingForm(forms.ModelForm):
+    """
+    Форма рассылки.
+
+    Выбранные вручную получатели остаются на сервере: форма показывает их
+    количество и постраничный список (``mailings:client_search`` с
+    ``recipients_of``), а отправляет только изменения — добавленных
+    (``recipients_add``) и убранных (``recipients_remove``) клиентов.
+    """
+
+    recipients_add = ClientIdsField(label="Добавить получателей")
+    recipients_remove = ClientIdsField(label="Убрать получателей")
+    select_all_matching = forms.BooleanField(
+        label="Добавить всех найденных клиентов",
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+    recipients_query = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    # Поля, которые шаблон выводит блоком выбора получателей
+    picker_fields = (
+        "recipients_add",
+        "recipients_remove",
+        "select_all_matching",
+        "recipients_query",
+    )
+
     class Meta:
         model = Mailing
-        fields = ["start_time", "end_time", "message", "recipients"]
+        fields = ["start_time", "end_time", "message", "segment"]
         widgets = {
             "start_time": forms.DateTimeInput(
                 attrs={"class": "form-control", "type": "datetime-local"}
@@ -51,18 +166,31 @@ class MailingForm(forms.ModelForm):
                 attrs={"class": "form-control", "type": "datetime-local"}
             ),
             "message": forms.Select(attrs={"class": "form-control"}),
-            "recipients": forms.SelectMultiple(
-                attrs={"class": "form-control", "size": "10"}
-            ),
+            "segment": forms.Select(attrs={"class": "form-control"}),
         }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
+        self.user = user
         if user:
             # Фильтруем сообщения и получателей только для текущего пользователя
             self.fields["message"].queryset = Message.objects.filter(owner=user)
-            self.fields["recipients"].queryset = Client.objects.filter(owner=user)
+            self.fields["segment"].queryset = Segment.objects.filter(owner=user)
+            clients = Client.objects.filter(owner=user)
+            self.fields["recipients_add"].queryset = clients
+            self.fields["recipients_remove"].queryset = clients
+
+    @cached_property
+    def recipients_count(self):
+        """Количество уже сохраненных получателей, выбранных вручную"""
+        if not self.instance.pk:
+            return 0
+        return self.instance.recipients.count()
+
+    def added_clients(self):
+        """Клиенты, добавленные до повторного показа формы с ошибками"""
+        return getattr(self, "cleaned_data", {}).get("recipients_add") or []
 
     def clean(self):
         cleaned_data = super().clean()
@@ -78,4 +206,54 @@ class MailingForm(forms.ModelForm):
                     "Дата начала должна быть раньше даты окончания"
                 )
 
+        if not (
+            cleaned_data.get("segment")
+            or cleaned_data.get("recipients_add")
+            or cleaned_data.get("select_all_matching")
+            or self.keeps_recipients(cleaned_data.get("recipients_remove"))
+        ):
+            raise forms.ValidationError("Выберите сегмент или получателей")
+
         return cleaned_data
+
+    def keeps_recipients(self, removed):
+        """Остаются ли у рассылки сохраненные получатели после удаления"""
+        if not self.instance.pk:
+            return False
+        remaining = self.instance.recipients.all()
+        if removed:
+            remaining = remaining.exclude(pk__in=removed)
+        return remaining.exists()
+
+    def matching_clients(self):
+        """Клиенты владельца, найденные строкой поиска выбора получателей"""
+        clients = Client.objects.filter(owner=self.user or self.instance.owner)
+        return clients.search(self.cleaned_data.get("recipients_query"))
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        removed = self.cleaned_data.get("recipients_remove")
+        if removed:
+            self.instance.recipients.remove(*removed)
+        added = self.cleaned_data.get("recipients_add")
+        if added:
+            # Уже добавленные пропускаются, повторная отправка формы безопасна
+            self.instance.add_recipients(added)
+        if self.cleaned_data.get("select_all_matching"):
+            # Все найденные добавляются на сервере одним INSERT ... SELECT
+            self.instance.add_recipients(self.matching_clients())
+
+
+class ClientImportForm(forms.Form):
+    file = forms.FileField(
+        label="Файл",
+        help_text="CSV с заголовком email,full_name,comment или NDJSON (.ndjson, .jsonl)",
+        widget=forms.ClearableFileInput(
+            attrs={"class": "form-control", "accept": ".csv,.ndjson,.jsonl"}
+        ),
+    )
+    update_existing = forms.BooleanField(
+        label="Обновлять существующих клиентов",
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
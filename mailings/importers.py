@@ -0,0 +1,213 @@
+"""
+Потоковый импорт клиентов из CSV и NDJSON.
+
+Файл читается построчно и обрабатывается пачками: в каждой пачке адреса
+проверяются, дубликаты внутри файла отбрасываются, существующие адреса
+ищутся одним запросом по уникальному индексу, а запись идет одним
+``bulk_create``.
+"""
+
+import csv
+import io
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from mailings import counters
+from mailings.cache import GLOBAL_SCOPE, bump_version, user_scope
+from mailings.models import Client
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_ERRORS = 20
+# Сколько раз пачка раскладывается заново, если адрес из нее успели добавить
+WRITE_ATTEMPTS = 3
+FORMATS = ("csv", "ndjson")
+
+
+class ImportStats:
+    """Итоги импорта, обновляются после каждой пачки"""
+
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.updated = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Скорость обработки, строк в секунду"""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"Строка {line}: {message}")
+
+    def __str__(self):
+        return (
+            f"Обработано: {self.total}, создано: {self.created}, "
+            f"обновлено: {self.updated}, пропущено: {self.skipped}, "
+            f"дубликатов: {self.duplicates}, ошибок: {self.invalid} "
+            f"({self.rate:.0f} строк/сек)"
+        )
+
+
+def detect_format(filename):
+    return "ndjson" if filename.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def iter_rows(stream, fmt):
+    """
+    Построчное чтение файла: пары (номер строки, словарь полей).
+
+    ``stream`` — бинарный или текстовый поток, файл целиком в память не читается.
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _clean_row(row):
+    """Нормализация и проверка строки, возвращает словарь полей Client"""
+    if row is None:
+        raise ValidationError("некорректная строка")
+    email = Client.normalize_email(str(row.get("email") or ""))
+    validate_email(email)
+    full_name = str(row.get("full_name") or "").strip()
+    if not full_name:
+        raise ValidationError("не указано Ф.И.О.")
+    return {
+        "email": email,
+        "full_name": full_name[: Client._meta.get_field("full_name").max_length],
+        "comment": str(row.get("comment") or "").strip(),
+    }
+
+
+def _write_batch(batch, owner, update_existing, stats):
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            created, updated, skipped = _try_write_batch(batch, owner, update_existing)
+            break
+        except IntegrityError:
+            # Адрес добавили параллельно между проверкой и вставкой:
+            # пачка откатилась целиком, раскладываем ее заново
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+
+    stats.created += created
+    stats.updated += updated
+    stats.skipped += skipped
+
+
+def _try_write_batch(batch, owner, update_existing):
+    """Запись пачки, возвращает (создано, обновлено, пропущено)"""
+    # Один запрос на пачку по уникальному индексу email
+    existing = dict(
+        Client.objects.with_emails(item["email"] for item in batch).values_list(
+            "email", "owner_id"
+        )
+    )
+
+    new_clients = []
+    own_clients = []
+    skipped = 0
+    for item in batch:
+        if item["email"] not in existing:
+            new_clients.append(Client(owner=owner, **item))
+        elif existing[item["email"]] == owner.pk and update_existing:
+            own_clients.append(Client(owner=owner, **item))
+        else:
+            # Адрес уже есть у этого или другого владельца
+            skipped += 1
+
+    with transaction.atomic():
+        if own_clients:
+            Client.objects.bulk_create(
+                own_clients,
+                update_conflicts=True,
+                unique_fields=["email"],
+                update_fields=["full_name", "comment", "updated_at"],
+            )
+        if new_clients:
+            # Без ignore_conflicts: пропущенная строка не должна попасть
+            # в счетчик, поэтому конфликт откатывает пачку
+            Client.objects.bulk_create(new_clients)
+            # bulk_create не отправляет сигналы, счетчик обновляем сами
+            counters.increment(counters.TOTAL_CLIENTS, len(new_clients))
+
+    return len(new_clients), len(own_clients), skipped
+
+
+def import_clients(
+    rows,
+    owner,
+    update_existing=False,
+    batch_size=DEFAULT_BATCH_SIZE,
+    progress=None,
+):
+    """
+    Импорт клиентов владельца из итератора ``iter_rows``.
+
+    ``progress`` вызывается с ``ImportStats`` после каждой записанной пачки.
+    """
+    stats = ImportStats()
+    seen = set()
+    batch = []
+
+    for line, row in rows:
+        stats.total += 1
+        try:
+            item = _clean_row(row)
+        except ValidationError as e:
+            stats.add_error(line, "; ".join(e.messages))
+            continue
+
+        if item["email"] in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(item["email"])
+
+        batch.append(item)
+        if len(batch) >= batch_size:
+            _write_batch(batch, owner, update_existing, stats)
+            batch = []
+            if progress:
+                progress(stats)
+
+    if batch:
+        _write_batch(batch, owner, update_existing, stats)
+        if progress:
+            progress(stats)
+
+    if stats.created or stats.updated:
+        bump_version(GLOBAL_SCOPE)
+        bump_version(user_scope(owner.pk))
+    return stats
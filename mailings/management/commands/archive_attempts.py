@@ -0,0 +1,73 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mailings import partitions
+
+
+class Command(BaseCommand):
+    help = "Создание помесячных секций попыток и архивирование старых периодов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            default=settings.ATTEMPTS_HOT_MONTHS,
+            help="Сколько последних месяцев оставлять в горячей таблице",
+        )
+        parser.add_argument(
+            "--before",
+            help="Архивировать периоды до указанного месяца (YYYY-MM), "
+            "вместо --keep-months",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=2,
+            help="Сколько будущих месяцев подготовить заранее",
+        )
+        parser.add_argument(
+            "--keep-detached",
+            action="store_true",
+            help="Не удалять отсоединенные секции (только PostgreSQL)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать периоды, которые будут архивированы",
+        )
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                cutoff = partitions.parse_period(options["before"])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            current = partitions.month_start(datetime.now(dt_timezone.utc))
+            cutoff = partitions.add_months(current, -options["keep_months"])
+
+        created = partitions.ensure_partitions(options["ahead"])
+        for period in created:
+            self.stdout.write(f"Создана секция за {period:%m.%Y}")
+
+        periods = partitions.archived_periods(cutoff, split=not options["dry_run"])
+        if not periods:
+            self.stdout.write(f"Нет периодов для архивирования до {cutoff:%m.%Y}")
+            return
+
+        for period in periods:
+            if options["dry_run"]:
+                self.stdout.write(f"Будет архивирован период {period:%m.%Y}")
+                continue
+
+            archive = partitions.archive_period(
+                period, keep_detached=options["keep_detached"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Период {period:%m.%Y} архивирован: "
+                    f"{archive.rows_count} попыток -> {archive.file_path}"
+                )
+            )
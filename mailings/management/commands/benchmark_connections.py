@@ -0,0 +1,148 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from mailings.models import Mailing
+from mailings.views import ClientListView, MailingListView, MessageListView
+
+LIST_VIEWS = (
+    ("/clients/", ClientListView),
+    ("/messages/", MessageListView),
+    ("/mailings/", MailingListView),
+)
+
+
+class Command(BaseCommand):
+    help = "Замер задержки списков и отправителя с разными режимами соединений с БД"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Количество запросов на каждое представление",
+        )
+        parser.add_argument(
+            "--user",
+            help="Email пользователя, от имени которого открываются списки",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["user"]:
+            user = User.objects.filter(email=options["user"]).first()
+        else:
+            user = User.objects.order_by("id").first()
+        if user is None:
+            raise CommandError("Нет пользователя для открытия списков")
+
+        settings_dict = connection.settings_dict
+        original = (settings_dict["CONN_MAX_AGE"], settings_dict["OPTIONS"])
+        options_without_pool = {
+            key: value
+            for key, value in settings_dict["OPTIONS"].items()
+            if key != "pool"
+        }
+        modes = [
+            ("новое соединение на запрос", 0, options_without_pool),
+            ("постоянные соединения", 600, options_without_pool),
+        ]
+        pool_error = self.pool_unavailable()
+        if pool_error is None:
+            # Пул с настройками DB_POOL_*, если они заданы, иначе по умолчанию
+            pool_options = settings_dict["OPTIONS"].get("pool") or True
+            modes.append(
+                (
+                    "пул соединений",
+                    0,
+                    {**options_without_pool, "pool": pool_options},
+                )
+            )
+
+        self.stdout.write(
+            f"БД: {connection.vendor}, запросов на представление: {options['requests']}"
+        )
+        try:
+            for title, max_age, db_options in modes:
+                self.reset_connection()
+                settings_dict["CONN_MAX_AGE"] = max_age
+                settings_dict["OPTIONS"] = db_options
+                self.stdout.write(f"\n{title}:")
+                for path, view_class in LIST_VIEWS:
+                    self.report(
+                        path, self.measure_view(path, view_class, user, options)
+                    )
+                self.report("send_mailings (выборка)", self.measure_sender(options))
+        finally:
+            self.reset_connection()
+            settings_dict["CONN_MAX_AGE"], settings_dict["OPTIONS"] = original
+        if pool_error:
+            self.stdout.write(self.style.WARNING(f"\nпул соединений: {pool_error}"))
+
+    def pool_unavailable(self):
+        """Причина, по которой режим пула не замерить, или ``None``"""
+        if connection.vendor != "postgresql":
+            return "поддерживается только в PostgreSQL"
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        if not is_psycopg3:
+            return "нужен psycopg 3 (пакет psycopg[binary,pool])"
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return "нужен пакет psycopg[pool]"
+        return None
+
+    def reset_connection(self):
+        connection.close()
+        if connection.vendor == "postgresql":
+            # Следующий режим создаст пул заново или обойдется без него
+            connection.close_pool()
+
+    def measure(self, func, count):
+        """Время «запроса» вместе с открытием/закрытием соединения, как в WSGI"""
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            close_old_connections()
+            func()
+            close_old_connections()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def measure_view(self, path, view_class, user, options):
+        factory = RequestFactory()
+        view = view_class.as_view()
+
+        def request():
+            http_request = factory.get(path)
+            http_request.user = user
+            http_request.session = {}
+            http_request._messages = []
+            view(http_request).render()
+
+        return self.measure(request, options["requests"])
+
+    def measure_sender(self, options):
+        def scan():
+            now = timezone.now()
+            list(
+                Mailing.objects.sendable()
+                .filter(start_time__lte=now, end_time__gte=now, status="started")
+                .values_list("id", flat=True)
+            )
+
+        return self.measure(scan, options["requests"])
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0
+        self.stdout.write(
+            f"  {name:<28} среднее {statistics.mean(timings):7.2f} мс, "
+            f"p50 {statistics.median(timings):7.2f} мс, p95 {p95:7.2f} мс"
+        )
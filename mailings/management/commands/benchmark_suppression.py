@@ -0,0 +1,150 @@
+import random
+import string
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mailings import suppression
+from mailings.models import Suppression
+
+# Домен адресов, которые команда добавляет в список и удаляет после замера
+BENCHMARK_DOMAIN = "benchmark-suppression.test"
+
+
+def random_email(rng, domain):
+    name = "".join(rng.choices(string.ascii_lowercase + string.digits, k=12))
+    return f"{name}@{domain}"
+
+
+@contextmanager
+def count_queries():
+    """Счетчик запросов к базе без накопления их текста"""
+    queries = [0]
+
+    def counter(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        yield queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер стоимости проверки получателя по списку исключенных адресов: "
+        "SuppressionFilter.is_suppressed по заполненной таблице Suppression"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=100000,
+            help="Количество исключенных адресов, добавляемых в таблицу",
+        )
+        parser.add_argument(
+            "--checks",
+            type=int,
+            default=100000,
+            help="Количество проверок адресов, которых нет в списке",
+        )
+        parser.add_argument(
+            "--hit-checks",
+            type=int,
+            default=1000,
+            help="Количество проверок исключенных адресов (каждая — запрос к базе)",
+        )
+        parser.add_argument(
+            "--db-checks",
+            type=int,
+            default=1000,
+            help="Количество проверок запросом к базе для сравнения",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if Suppression.objects.filter(email__endswith=f"@{BENCHMARK_DOMAIN}").exists():
+            raise CommandError(
+                f"В списке уже есть адреса @{BENCHMARK_DOMAIN}: "
+                "прошлый замер не завершился, удалите их"
+            )
+
+        rng = random.Random(options["seed"])
+        suppressed = [
+            random_email(rng, BENCHMARK_DOMAIN) for _ in range(options["size"])
+        ]
+        recipients = [
+            random_email(rng, BENCHMARK_DOMAIN) for _ in range(options["checks"])
+        ]
+        # Адреса получателей приходят в разном регистре, is_suppressed
+        # нормализует их сам
+        hits = [email.upper() for email in suppressed[: options["hit_checks"]]]
+
+        started = time.perf_counter()
+        Suppression.objects.bulk_create(
+            (Suppression(email=email, reason="unsubscribe") for email in suppressed),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f"Добавлено исключенных адресов: {len(suppressed)} "
+            f"за {time.perf_counter() - started:.2f} с"
+        )
+        try:
+            self.measure(recipients, hits, options["db_checks"])
+        finally:
+            deleted, _ = Suppression.objects.filter(
+                email__endswith=f"@{BENCHMARK_DOMAIN}"
+            ).delete()
+            self.stdout.write(f"Удалено адресов замера: {deleted}")
+
+    def measure(self, recipients, hits, db_checks):
+        # Первый вызов в процессе строит фильтр по всей таблице
+        started = time.perf_counter()
+        suppressed_filter = suppression.get_filter()
+        build_time = time.perf_counter() - started
+        bloom = suppressed_filter.bloom
+        self.stdout.write(
+            f"Фильтр: {bloom.count} адресов в таблице, "
+            f"{len(bloom.bits) / 1024:.0f} КБ, хеш-функций: {bloom.hash_count}, "
+            f"построен из базы за {build_time:.2f} с"
+        )
+
+        if recipients:
+            found, queries, elapsed = self.time_checks(recipients)
+            self.stdout.write(
+                f"Адрес не в списке: {elapsed / len(recipients) * 1e6:.2f} "
+                f"мкс/получатель, запросов к базе из-за ложных срабатываний: "
+                f"{queries} ({queries / len(recipients):.4%}), найдено: {found}"
+            )
+
+        if hits:
+            found, queries, elapsed = self.time_checks(hits)
+            self.stdout.write(
+                f"Адрес в списке: {elapsed / len(hits) * 1e6:.2f} мкс/получатель "
+                f"(с подтверждающим запросом к базе: {queries}), "
+                f"найдено {found} из {len(hits)}"
+            )
+
+        sample = recipients[:db_checks]
+        if sample:
+            started = time.perf_counter()
+            for email in sample:
+                Suppression.objects.filter(email=email).exists()
+            per_check = (time.perf_counter() - started) / len(sample) * 1e6
+            self.stdout.write(
+                f"Запрос к базе на каждого получателя: {per_check:.2f} мкс/получатель"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Замер завершен"))
+
+    def time_checks(self, emails):
+        """Проверки так же, как в цикле отправки, возвращает (найдено, запросов, с)"""
+        with count_queries() as queries:
+            started = time.perf_counter()
+            found = sum(
+                1 for email in emails if suppression.get_filter().is_suppressed(email)
+            )
+            elapsed = time.perf_counter() - started
+        return found, queries[0], elapsed
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mailings.importers import (
+    DEFAULT_BATCH_SIZE,
+    FORMATS,
+    detect_format,
+    import_clients,
+    iter_rows,
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Потоковый импорт клиентов из CSV или NDJSON (email, full_name, comment)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или '-' для stdin")
+        parser.add_argument(
+            "--owner", required=True, help="Email владельца импортируемых клиентов"
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Формат файла (по умолчанию определяется по расширению)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество строк в одной пачке записи",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Обновлять Ф.И.О. и комментарий у уже существующих клиентов владельца",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(email=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['owner']} не найден")
+
+        path = options["path"]
+        fmt = options["format"] or detect_format(path)
+
+        def progress(stats):
+            self.stdout.write(
+                f"  ... {stats.total} строк, {stats.rate:.0f} строк/сек",
+                ending="\r",
+            )
+            self.stdout.flush()
+
+        if path == "-":
+            stats = self.run_import(sys.stdin.buffer, fmt, owner, options, progress)
+        else:
+            if not Path(path).is_file():
+                raise CommandError(f"Файл {path} не найден")
+            with open(path, "rb") as source:
+                stats = self.run_import(source, fmt, owner, options, progress)
+
+        self.stdout.write("")
+        for error in stats.errors:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
+        self.stdout.write(self.style.SUCCESS(f"✅ {stats}"))
+        self.stdout.write(
+            f"Время: {stats.elapsed:.1f} сек, скорость: {stats.rate:.0f} строк/сек"
+        )
+
+    @staticmethod
+    def run_import(source, fmt, owner, options, progress):
+        return import_clients(
+            iter_rows(source, fmt),
+            owner,
+            update_existing=options["update"],
+            batch_size=options["batch_size"],
+            progress=progress,
+        )
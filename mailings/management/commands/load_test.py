@@ -0,0 +1,266 @@
+import http.client
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLPattern, reverse
+
+from mailings import urls as mailings_urls
+from mailings.models import Client, Mailing, Message, Segment
+from users import urls as users_urls
+
+# Маршруты, которые нельзя гонять в цикле: выход завершает сессию,
+# поток SSE под ASGI не заканчивается, вложение — файл, а не страница
+SKIPPED_ROUTES = {
+    "users:logout",
+    "mailings:mailing_progress_stream",
+    "mailings:message_attachment",
+}
+# Модель, id записи которой подставляется в <int:pk>
+PK_MODELS = {
+    "client": Client,
+    "message": Message,
+    "segment": Segment,
+    "mailing": Mailing,
+}
+QUERY_STRINGS = {
+    "mailings:client_search": "q=ива",
+    "mailings:client_list": "limit=50",
+}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект считается ответом, а не повод для второго запроса"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class Session:
+    """Вошедший пользователь со своими cookie"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect()
+        )
+        self.etags = {}
+
+    def cookie(self, name):
+        return next((c.value for c in self.cookies if c.name == name), None)
+
+    def request(self, path, data=None, headers=None):
+        """GET или POST, возвращает (код ответа, заголовки)"""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers or {}
+        )
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers
+
+    def login(self, email, password):
+        path = reverse("users:login")
+        self.request(path)
+        status, _ = self.request(
+            path,
+            {
+                "username": email,
+                "password": password,
+                "csrfmiddlewaretoken": self.cookie("csrftoken") or "",
+            },
+            headers={"Referer": self.base_url + path},
+        )
+        if status != 302 or not self.cookie("sessionid"):
+            raise CommandError(f"Не удалось войти как {email} (ответ {status})")
+
+    def get(self, path, revalidate=False):
+        headers = {}
+        if revalidate and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        status, response_headers = self.request(path, headers=headers)
+        if revalidate and response_headers.get("ETag"):
+            self.etags[path] = response_headers["ETag"]
+        return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест страниц сервиса: вход под пользователями seed_data "
+        "и запросы ко всем маршрутам mailings и users с заданной конкурентностью"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--concurrency", type=int, default=10, help="Количество потоков"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Длительность, секунд"
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=5,
+            help="Сколько пользователей seed_data задействовать",
+        )
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="password")
+        parser.add_argument(
+            "--routes",
+            nargs="*",
+            default=[],
+            help="Только маршруты, в имени которых есть одна из подстрок",
+        )
+        parser.add_argument(
+            "--revalidate",
+            action="store_true",
+            help="Повторные запросы с If-None-Match, как у браузера",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model()
+            .objects.filter(email__startswith=f"{options['prefix']}-user")
+            .order_by("email")[: options["users"]]
+        )
+        if not users:
+            raise CommandError(
+                "Нет пользователей для входа, сначала выполните seed_data"
+            )
+
+        targets = {
+            user.pk: self.build_targets(user, options["routes"]) for user in users
+        }
+        sessions = []
+        for index in range(options["concurrency"]):
+            user = users[index % len(users)]
+            session = Session(options["base_url"], options["timeout"])
+            session.login(user.email, options["password"])
+            sessions.append((session, targets[user.pk]))
+
+        self.stdout.write(
+            f"Маршрутов: {len(targets[users[0].pk])}, потоков: "
+            f"{options['concurrency']}, пользователей: {len(users)}, "
+            f"длительность: {options['duration']:.0f} с"
+        )
+
+        results = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["duration"]
+
+        def worker(number, session, routes):
+            rng = random.Random(options["seed"] + number)
+            local = []
+            while time.monotonic() < deadline:
+                name, path = rng.choice(routes)
+                started = time.perf_counter()
+                try:
+                    status = session.get(path, options["revalidate"])
+                except (OSError, http.client.HTTPException):
+                    # Сбой соединения или оборванный ответ (IncompleteRead,
+                    # BadStatusLine) под нагрузкой считается ошибкой
+                    status = 0
+                local.append((name, status, time.perf_counter() - started))
+            with lock:
+                results.extend(local)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            futures = [
+                executor.submit(worker, number, session, routes)
+                for number, (session, routes) in enumerate(sessions)
+            ]
+        # Непредвиденная ошибка в потоке не должна молча терять его результаты
+        for future in futures:
+            future.result()
+        self.report(results, time.monotonic() - started)
+
+    def build_targets(self, user, filters):
+        """Пары (имя маршрута, путь) для GET-запросов от имени ``user``"""
+        targets = []
+        for namespace, module in (("mailings", mailings_urls), ("users", users_urls)):
+            for pattern in module.urlpatterns:
+                if not isinstance(pattern, URLPattern) or not pattern.name:
+                    continue
+                name = f"{namespace}:{pattern.name}"
+                view_class = getattr(pattern.callback, "view_class", None)
+                if name in SKIPPED_ROUTES or (
+                    view_class and not hasattr(view_class, "get")
+                ):
+                    continue
+                if filters and not any(part in name for part in filters):
+                    continue
+
+                kwargs = {}
+                if "pk" in pattern.pattern.converters:
+                    model = PK_MODELS[pattern.name.split("_")[0]]
+                    pk = (
+                        model.objects.filter(owner=user)
+                        .order_by("id")
+                        .values_list("id", flat=True)
+                        .first()
+                    )
+                    if pk is None:
+                        continue
+                    kwargs["pk"] = pk
+
+                path = reverse(name, kwargs=kwargs)
+                if name in QUERY_STRINGS:
+                    path += "?" + QUERY_STRINGS[name]
+                targets.append((name, path))
+        if not targets:
+            raise CommandError("Нет маршрутов для проверки")
+        return targets
+
+    def report(self, results, elapsed):
+        by_route = {}
+        for name, status, latency in results:
+            by_route.setdefault(name, []).append((status, latency))
+
+        header = (
+            f"{'Маршрут':<34}{'запр.':>7}{'3xx':>6}{'ошиб.':>7}{'rps':>8}"
+            f"{'p50, мс':>9}{'p90, мс':>9}{'p99, мс':>9}{'max, мс':>9}"
+        )
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for name in sorted(by_route):
+            rows = by_route[name]
+            latencies = sorted(latency * 1000 for _, latency in rows)
+            # 3xx — 304 при --revalidate или редирект (например, на вход)
+            redirects = sum(1 for status, _ in rows if 300 <= status < 400)
+            errors = sum(1 for status, _ in rows if not 200 <= status < 400)
+            self.stdout.write(
+                f"{name:<34}{len(rows):>7}{redirects:>6}{errors:>7}"
+                f"{len(rows) / elapsed:>8.1f}"
+                f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.9):>9.1f}"
+                f"{percentile(latencies, 0.99):>9.1f}{latencies[-1]:>9.1f}"
+            )
+
+        total_errors = sum(1 for _, status, _ in results if not 200 <= status < 400)
+        message = (
+            f"Всего: {len(results)} запросов за {elapsed:.1f} с "
+            f"({len(results) / elapsed:.1f} запр/с), ошибок: {total_errors}"
+        )
+        style = self.style.WARNING if total_errors else self.style.SUCCESS
+        self.stdout.write(style(message))
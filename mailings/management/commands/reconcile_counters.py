@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from mailings import counters
+from mailings.cache import GLOBAL_SCOPE, bump_version
+from mailings.models import Mailing
+
+
+class Command(BaseCommand):
+    help = "Пересчет счетчиков общей статистики и исправление расхождений"
+
+    def handle(self, *args, **options):
+        # Статусы рассылок, чей период начался или закончился, до пересчета
+        refreshed = Mailing.objects.refresh_statuses()
+        if refreshed:
+            self.stdout.write(f"Обновлены статусы рассылок: {refreshed}")
+
+        fixed = 0
+        for name in counters.COUNTERS:
+            old_value, value = counters.reconcile(name)
+            if old_value is None:
+                self.stdout.write(f"{name}: создан со значением {value}")
+                fixed += 1
+            elif old_value != value:
+                self.stdout.write(self.style.WARNING(f"{name}: {old_value} -> {value}"))
+                fixed += 1
+            else:
+                self.stdout.write(f"{name}: {value}")
+
+        if fixed:
+            bump_version(GLOBAL_SCOPE)
+            self.stdout.write(self.style.SUCCESS(f"Исправлено счетчиков: {fixed}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет"))
@@ -0,0 +1,388 @@
+import datetime
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from mailings import counters, partitions
+from mailings.cache import GLOBAL_SCOPE, bump_owners, bump_version
+from mailings.models import (
+    Client,
+    Mailing,
+    MailingAttempt,
+    Message,
+    Segment,
+)
+
+DOMAINS = (
+    ("gmail.com", 35),
+    ("mail.ru", 25),
+    ("yandex.ru", 20),
+    ("outlook.com", 8),
+    ("rambler.ru", 5),
+    ("example.com", 7),
+)
+FIRST_NAMES = (
+    "Александр",
+    "Мария",
+    "Дмитрий",
+    "Анна",
+    "Сергей",
+    "Елена",
+    "Андрей",
+    "Ольга",
+    "Иван",
+    "Наталья",
+)
+LAST_NAMES = (
+    "Иванов",
+    "Смирнов",
+    "Кузнецов",
+    "Попов",
+    "Васильев",
+    "Петров",
+    "Соколов",
+    "Михайлов",
+)
+TAGS = ("vip", "новости", "b2b", "акции", "опрос", "партнер")
+SUBJECTS = (
+    "Новости недели",
+    "Специальное предложение",
+    "Приглашение на вебинар",
+    "Итоги месяца",
+    "Обновление сервиса",
+)
+FAILURES = (
+    "(550, b'5.1.1 User unknown')",
+    "(421, b'4.7.0 Try again later')",
+    "(552, b'5.2.2 Mailbox full')",
+    "Connection unexpectedly closed",
+    "timed out",
+)
+FAILURE_RATE = 0.08
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    DELETE пачками по первичному ключу одним SQL-запросом на пачку.
+
+    Объекты не загружаются, сигналы не отправляются: счетчики команда
+    пересчитывает сама.
+    """
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    batch = queryset.order_by().values("pk")[:batch_size]
+    deleted = 0
+    while True:
+        sql, params = batch.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+@contextmanager
+def explicit_attempt_time():
+    """bulk_create без подмены attempt_time текущим временем (auto_now_add)"""
+    field = MailingAttempt._meta.get_field("attempt_time")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерация синтетических данных для нагрузочного тестирования: "
+        "пользователи, клиенты, сообщения, рассылки, получатели и попытки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--clients-per-user", type=int, default=1000)
+        parser.add_argument("--messages-per-user", type=int, default=5)
+        parser.add_argument("--mailings-per-user", type=int, default=20)
+        parser.add_argument(
+            "--recipients-per-mailing",
+            type=int,
+            default=500,
+            help="Не больше числа клиентов пользователя",
+        )
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=100000,
+            help="Общее количество попыток рассылок",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Глубина истории рассылок и попыток в днях",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--anchor",
+            type=datetime.date.fromisoformat,
+            default=None,
+            help="Дата «сегодня» для расчета времени (YYYY-MM-DD), "
+            "чтобы повторные запуски давали одинаковые данные",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Префикс адресов пользователей и клиентов",
+        )
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить пользователей с этим префиксом перед генерацией",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"]
+        anchor = options["anchor"] or timezone.localdate()
+        self.now = timezone.make_aware(
+            datetime.datetime.combine(anchor, datetime.time(12))
+        )
+        self.history = datetime.timedelta(days=options["days"])
+
+        users = self.create_users(
+            options["users"], options["password"], options["seed"], options["clear"]
+        )
+        for index, user in enumerate(users):
+            client_ids = self.create_clients(user, index, options["clients_per_user"])
+            self.create_segments(user)
+            message_ids = self.create_messages(user, options["messages_per_user"])
+            self.create_mailings(
+                user,
+                message_ids,
+                client_ids,
+                options["mailings_per_user"],
+                options["recipients_per_mailing"],
+            )
+        self.create_attempts(users, options["attempts"])
+
+        # bulk_create не отправляет сигналы: счетчики и кеш обновляем сами
+        for name in counters.COUNTERS:
+            counters.reconcile(name)
+        bump_version(GLOBAL_SCOPE)
+        bump_owners(user.pk for user in users)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово. Пользователи: {self.prefix}-user0000@example.com … "
+                f"{self.prefix}-user{len(users) - 1:04d}@example.com, "
+                f"пароль: {options['password']}"
+            )
+        )
+
+    def report(self, name, count, started):
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"{name}: {count} за {elapsed:.1f} с ({rate:.0f} строк/сек)")
+
+    def random_time(self):
+        return self.now - self.history * self.rng.random()
+
+    def create_users(self, count, password, seed, clear):
+        User = get_user_model()
+        seeded = User.objects.filter(email__startswith=f"{self.prefix}-user")
+        if clear:
+            self.clear(seeded)
+        elif seeded.exists():
+            raise CommandError(
+                f"Пользователи с префиксом «{self.prefix}» уже есть, "
+                "используйте --clear или другой --prefix"
+            )
+
+        started = time.monotonic()
+        # Один хеш на всех: хеширование пароля — самая медленная часть
+        password_hash = make_password(password, salt=f"seed{seed}")
+        User.objects.bulk_create(
+            User(
+                email=f"{self.prefix}-user{index:04d}@example.com",
+                password=password_hash,
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                date_joined=self.random_time(),
+            )
+            for index in range(count)
+        )
+        users = list(seeded.order_by("email"))
+        self.report("Пользователи", len(users), started)
+        return users
+
+    def clear(self, seeded):
+        """
+        Удаление данных прошлой генерации.
+
+        Большие таблицы чистятся SQL-пачками, а не сборщиком ORM, который
+        загружает каждую удаляемую запись и отправляет ее сигналы.
+        Остаток (пользователи, сообщения, сегменты) удаляется обычным
+        ``delete()``, счетчики пересчитываются один раз в конце команды.
+        """
+        started = time.monotonic()
+        deleted = 0
+        for queryset in (
+            MailingAttempt.objects.filter(mailing__owner__in=seeded),
+            Mailing.recipients.through.objects.filter(mailing__owner__in=seeded),
+            Client.objects.filter(owner__in=seeded),
+            Mailing.objects.filter(owner__in=seeded),
+        ):
+            deleted += delete_in_batches(queryset, self.batch_size)
+        rest, _ = seeded.delete()
+        self.report("Удалено записей прошлой генерации", deleted + rest, started)
+
+    def create_clients(self, user, user_index, count):
+        started = time.monotonic()
+        domains = [domain for domain, _ in DOMAINS]
+        weights = [weight for _, weight in DOMAINS]
+        batch = []
+        for number in range(count):
+            tags = self.rng.sample(TAGS, self.rng.randint(0, 2))
+            batch.append(
+                Client(
+                    email=Client.normalize_email(
+                        f"{self.prefix}-{user_index}-{number}"
+                        f"@{self.rng.choices(domains, weights)[0]}"
+                    ),
+                    full_name=(
+                        f"{self.rng.choice(LAST_NAMES)} {self.rng.choice(FIRST_NAMES)}"
+                    ),
+                    comment=" ".join(tags),
+                    owner=user,
+                )
+            )
+            if len(batch) >= self.batch_size:
+                Client.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Client.objects.bulk_create(batch)
+        self.report(f"Клиенты {user.email}", count, started)
+        return list(
+            Client.objects.filter(owner=user)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def create_segments(self, user):
+        Segment.objects.bulk_create(
+            [
+                Segment(
+                    name="Российские почтовые службы",
+                    email_domains="mail.ru, yandex.ru, rambler.ru",
+                    owner=user,
+                ),
+                Segment(name="VIP", comment_tags="vip", owner=user),
+            ]
+        )
+
+    def create_messages(self, user, count):
+        messages = Message.objects.bulk_create(
+            Message(
+                subject=f"{self.rng.choice(SUBJECTS)} #{number + 1}",
+                body="Здравствуйте!\n\n" + "Текст синтетического письма. " * 20,
+                owner=user,
+            )
+            for number in range(count)
+        )
+        return [message.pk for message in messages]
+
+    def create_mailings(
+        self, user, message_ids, client_ids, count, recipients_per_mailing
+    ):
+        started = time.monotonic()
+        mailings = []
+        for _ in range(count):
+            # Большинство рассылок в прошлом, часть идет сейчас или запланирована
+            start_time = self.random_time() + self.history * 0.05
+            end_time = start_time + datetime.timedelta(
+                hours=self.rng.randint(1, 24 * 14)
+            )
+            mailings.append(
+                Mailing(
+                    start_time=start_time,
+                    end_time=end_time,
+                    status=Mailing.status_at(start_time, end_time, self.now),
+                    message_id=self.rng.choice(message_ids),
+                    owner=user,
+                )
+            )
+        Mailing.objects.bulk_create(mailings, batch_size=self.batch_size)
+
+        through = Mailing.recipients.through
+        size = min(recipients_per_mailing, len(client_ids))
+        batch = []
+        total = 0
+        for mailing in mailings:
+            for client_id in self.rng.sample(client_ids, size):
+                batch.append(through(mailing_id=mailing.pk, client_id=client_id))
+            if len(batch) >= self.batch_size:
+                through.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            through.objects.bulk_create(batch)
+            total += len(batch)
+        self.report(f"Рассылки {user.email} (получателей: {total})", count, started)
+
+    def create_attempts(self, users, count):
+        started = time.monotonic()
+        mailings = list(
+            Mailing.objects.filter(owner__in=users, start_time__lte=self.now)
+            .order_by("id")
+            .values_list("id", "start_time", "end_time")
+        )
+        if not mailings:
+            return
+
+        # Секции для всех месяцев истории: иначе строки попали бы в секцию
+        # по умолчанию, а создание секции потом переносит их по одной таблице
+        first = min(start_time for _, start_time, _ in mailings)
+        last = max(min(end_time, self.now) for _, _, end_time in mailings)
+        period = partitions.month_start(first.astimezone(datetime.timezone.utc))
+        while period <= last:
+            partitions.ensure_partition(period)
+            period = partitions.next_month(period)
+
+        created = 0
+        with explicit_attempt_time():
+            while created < count:
+                batch = []
+                for _ in range(min(self.batch_size, count - created)):
+                    mailing_id, start_time, end_time = self.rng.choice(mailings)
+                    # Основная часть писем уходит в первые часы после старта
+                    span = min(end_time, self.now) - start_time
+                    attempt_time = start_time + span * self.rng.random() ** 3
+                    failed = self.rng.random() < FAILURE_RATE
+                    batch.append(
+                        MailingAttempt(
+                            mailing_id=mailing_id,
+                            attempt_time=attempt_time,
+                            status="failed" if failed else "success",
+                            server_response=(
+                                self.rng.choice(FAILURES)
+                                if failed
+                                else "Успешно отправлено"
+                            ),
+                        )
+                    )
+                with transaction.atomic():
+                    MailingAttempt.objects.bulk_create(batch)
+                created += len(batch)
+                if created % (self.batch_size * 10) == 0 or created == count:
+                    self.report("Попытки", created, started)
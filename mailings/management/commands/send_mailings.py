@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from mailings.models import Mailing
+from mailings.progress import MailingProgress
+from mailings.tasks import run_mailing
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,12 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS('🚀 Запуск отправки рассылок...'))
 
+        # Статусы меняются со временем: переводим рассылки, чей период
+        # начался или закончился, заодно обновляя счетчик активных рассылок
+        refreshed = Mailing.objects.refresh_statuses()
+        if refreshed:
+            self.stdout.write(f'🔄 Обновлены статусы рассылок: {refreshed}')
+
         if mailing_id:
             # Отправка конкретной рассылки
             self.send_single_mailing(mailing_id, force)
@@ -38,11 +46,12 @@ class Command(BaseCommand):
         """Отправка одной рассылки по ID"""
         try:
             # Получаем рассылку
-            mailing = Mailing.objects.select_related('message').prefetch_related('recipients').get(pk=mailing_id)
+            # Получатели не загружаются заранее: send_mailing читает их порциями
+            mailing = Mailing.objects.select_related('message', 'segment').get(pk=mailing_id)
 
             self.stdout.write(f'\n📧 Обработка рассылки #{mailing.id}: {mailing.message.subject}')
             self.stdout.write(f'  Текущий статус: {mailing.get_status_display()}')
-            self.stdout.write(f'  Получателей: {mailing.recipients.count()}')
+            self.stdout.write(f'  Получателей: {mailing.get_recipients().active().count()}')
 
             # Обновляем статус
             old_status = mailing.status
@@ -66,7 +75,10 @@ class Command(BaseCommand):
                 ))
 
             # Отправляем
-            success, message = mailing.send_mailing()
+            sent = self.send_locked(mailing)
+            if sent is None:
+                return
+            success, message = sent
 
             if success:
                 self.stdout.write(self.style.SUCCESS(f'\n✅ {message}'))
@@ -78,16 +90,31 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'\n❌ Ошибка: {str(e)}'))
 
+    def send_locked(self, mailing):
+        """
+        Отправка под той же блокировкой, что и у кнопки на сайте и в админке.
+
+        Возвращает ``None``, если рассылка уже отправляется в другом процессе.
+        """
+        progress = MailingProgress(mailing.pk)
+        if not progress.queue(mailing.owner_id):
+            self.stdout.write(self.style.WARNING(
+                f'  ⏭️ Рассылка #{mailing.pk} уже отправляется, пропущена'
+            ))
+            return None
+        return run_mailing(mailing.pk, progress.token)
+
     def send_all_active_mailings(self):
         """Отправка всех активных рассылок"""
         now = timezone.now()
 
         # Получаем активные рассылки
-        mailings = Mailing.objects.filter(
+        # Заблокированные и отключенные рассылки отсекаются в запросе
+        mailings = Mailing.objects.sendable().filter(
             start_time__lte=now,
             end_time__gte=now,
             status='started'
-        ).select_related('message').prefetch_related('recipients')
+        ).select_related('message', 'segment')
 
         count = mailings.count()
         self.stdout.write(f'\n📊 Найдено активных рассылок: {count}')
@@ -101,10 +128,13 @@ class Command(BaseCommand):
 
         for mailing in mailings:
             self.stdout.write(f'\n📧 Обработка рассылки #{mailing.id}: {mailing.message.subject}')
-            self.stdout.write(f'  Получателей: {mailing.recipients.count()}')
+            self.stdout.write(f'  Получателей: {mailing.get_recipients().active().count()}')
 
             try:
-                success, message = mailing.send_mailing()
+                sent = self.send_locked(mailing)
+                if sent is None:
+                    continue
+                success, message = sent
 
                 if success:
                     self.stdout.write(self.style.SUCCESS(f'  ✅ {message}'))
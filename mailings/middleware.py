@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from mailings.routers import replica_reads
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_PIN_COOKIE = "db_primary"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Чтение с реплики для безопасных запросов с «прилипанием» к основной базе.
+
+    После POST пользователь на ``REPLICA_STICKY_SECONDS`` секунд читает
+    из основной базы (метка в cookie), поэтому видит свои изменения, даже
+    если реплика еще не догнала основную базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        use_replica = safe and PRIMARY_PIN_COOKIE not in request.COOKIES
+        with replica_reads(use_replica):
+            response = self.get_response(request)
+
+        if not safe:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                "1",
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,138 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+TABLE = "mailings_mailingattempt"
+LEGACY = f"{TABLE}_legacy"
+SEQUENCE = f"{TABLE}_id_seq"
+COLUMNS = "id, attempt_time, status, server_response, mailing_id"
+
+
+def partition_attempts(apps, schema_editor):
+    """Перевод таблицы попыток на помесячные секции (только PostgreSQL)"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    from mailings.partitions import (
+        DEFAULT_PARTITION,
+        ensure_partition,
+        ensure_partitions,
+        month_start,
+    )
+
+    statements = [
+        f"ALTER TABLE {TABLE} RENAME TO {LEGACY}",
+        f"ALTER INDEX {TABLE}_pkey RENAME TO {LEGACY}_pkey",
+        f"CREATE SEQUENCE {SEQUENCE}",
+        f"""
+        CREATE TABLE {TABLE} (
+            id bigint NOT NULL DEFAULT nextval('{SEQUENCE}'),
+            attempt_time timestamp with time zone NOT NULL,
+            status varchar(20) NOT NULL,
+            server_response text NOT NULL,
+            mailing_id bigint NOT NULL
+                REFERENCES mailings_mailing (id) DEFERRABLE INITIALLY DEFERRED,
+            PRIMARY KEY (id, attempt_time)
+        ) PARTITION BY RANGE (attempt_time)
+        """,
+        f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id",
+        f"CREATE INDEX {TABLE}_mailing_id_idx ON {TABLE} (mailing_id)",
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT",
+        f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}",
+        f"SELECT setval('{SEQUENCE}', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)",
+        f"DROP TABLE {LEGACY}",
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        # Секции за месяцы с уже существующими данными
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', attempt_time AT TIME ZONE 'UTC') "
+            f"FROM {TABLE}"
+        )
+        months = [row[0] for row in cursor.fetchall()]
+
+    # Только база, к которой применяется миграция
+    using = schema_editor.connection.alias
+    for month in months:
+        ensure_partition(month_start(month), using)
+    ensure_partitions(using=using)
+
+
+def unpartition_attempts(apps, schema_editor):
+    """Возврат к обычной таблице попыток"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    statements = [
+        f"ALTER TABLE {TABLE} RENAME TO {LEGACY}",
+        f"ALTER INDEX {TABLE}_pkey RENAME TO {LEGACY}_pkey",
+        f"ALTER SEQUENCE {SEQUENCE} OWNED BY NONE",
+        f"""
+        CREATE TABLE {TABLE} (
+            id bigint NOT NULL DEFAULT nextval('{SEQUENCE}') PRIMARY KEY,
+            attempt_time timestamp with time zone NOT NULL,
+            status varchar(20) NOT NULL,
+            server_response text NOT NULL,
+            mailing_id bigint NOT NULL
+                REFERENCES mailings_mailing (id) DEFERRABLE INITIALLY DEFERRED
+        )
+        """,
+        f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id",
+        f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}",
+        f"DROP TABLE {LEGACY} CASCADE",
+        f"CREATE INDEX {TABLE}_mailing_id_idx ON {TABLE} (mailing_id)",
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingAttemptArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.DateField(unique=True, verbose_name="Период (месяц)"),
+                ),
+                (
+                    "file_path",
+                    models.CharField(max_length=500, verbose_name="Файл архива"),
+                ),
+                (
+                    "rows_count",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Количество попыток"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата архивации"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архив попыток",
+                "verbose_name_plural": "Архивы попыток",
+                "ordering": ["-period"],
+            },
+        ),
+        migrations.RunPython(partition_attempts, unpartition_attempts),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0002_mailingattemptarchive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mailingattempt",
+            index=models.Index(
+                fields=["-attempt_time", "-id"], name="attempt_time_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailingattempt",
+            index=models.Index(
+                fields=["mailing", "-attempt_time", "-id"],
+                name="attempt_mailing_time_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Индексы для поиска по префиксу без учета регистра (istartswith) на PostgreSQL
+PREFIX_INDEXES = {
+    "client_owner_email_prefix_idx": "mailings_client (owner_id, UPPER(email::text) text_pattern_ops)",
+    "client_owner_name_prefix_idx": "mailings_client (owner_id, UPPER(full_name::text) text_pattern_ops)",
+    "message_owner_subject_prefix_idx": "mailings_message (owner_id, UPPER(subject::text) text_pattern_ops)",
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, definition in PREFIX_INDEXES.items():
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in PREFIX_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0003_attempt_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                fields=["owner", "email", "id"], name="client_owner_email_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["owner", "-id"], name="message_owner_id_idx"),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
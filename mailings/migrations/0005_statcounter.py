@@ -0,0 +1,61 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:32
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    """Начальные значения счетчиков по существующим данным"""
+    StatCounter = apps.get_model("mailings", "StatCounter")
+    Mailing = apps.get_model("mailings", "Mailing")
+    Client = apps.get_model("mailings", "Client")
+    db = schema_editor.connection.alias
+    StatCounter.objects.using(db).bulk_create(
+        [
+            StatCounter(name="total_mailings", value=Mailing.objects.using(db).count()),
+            StatCounter(
+                name="active_mailings",
+                value=Mailing.objects.using(db).filter(status="started").count(),
+            ),
+            StatCounter(name="total_clients", value=Client.objects.using(db).count()),
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0004_list_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Название"
+                    ),
+                ),
+                ("value", models.BigIntegerField(default=0, verbose_name="Значение")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлен"),
+                ),
+            ],
+            options={
+                "verbose_name": "Счетчик статистики",
+                "verbose_name_plural": "Счетчики статистики",
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:33
+
+from django.db import migrations, transaction
+from django.db.models import Count, Min, Value
+from django.db.models.functions import Coalesce, Lower, Trim
+
+BATCH_SIZE = 1000
+# Сколько конфликтующих адресов показывать в сообщении об ошибке
+MAX_LISTED_CONFLICTS = 50
+
+
+def normalized_email():
+    """То же, что ``Client.normalize_email``: без пробелов по краям, нижний регистр"""
+    return Lower(Trim("email"))
+
+
+def check_cross_owner_conflicts(Client, db):
+    """
+    Адреса, отличающиеся только регистром или пробелами по краям, у разных
+    владельцев.
+
+    Email уникален глобально, поэтому после нормализации такие клиенты
+    столкнутся. Объединять их нельзя — это данные разных
+    пользователей, — поэтому миграция останавливается до любых изменений.
+    """
+    conflicts = (
+        Client.objects.using(db)
+        .annotate(email_lower=normalized_email())
+        .values("email_lower")
+        # Клиенты без владельца — отдельная группа, а не «тот же владелец»
+        .annotate(owners=Count(Coalesce("owner_id", Value(0)), distinct=True))
+        .filter(owners__gt=1)
+        .order_by("email_lower")
+    )
+    total = conflicts.count()
+    if not total:
+        return
+
+    lines = []
+    for conflict in conflicts[:MAX_LISTED_CONFLICTS]:
+        clients = (
+            Client.objects.using(db)
+            .annotate(email_lower=normalized_email())
+            .filter(email_lower=conflict["email_lower"])
+            .order_by("pk")
+            .values_list("pk", "email", "owner_id")
+        )
+        lines.append(
+            ", ".join(
+                f"#{pk} «{email}» (владелец {owner_id})"
+                for pk, email, owner_id in clients
+            )
+        )
+    if total > MAX_LISTED_CONFLICTS:
+        lines.append(f"… и еще {total - MAX_LISTED_CONFLICTS}")
+    raise RuntimeError(
+        f"Адреса клиентов разных владельцев отличаются только регистром "
+        f"или пробелами ({total}). Исправьте их вручную и повторите миграцию:\n"
+        + "\n".join(lines)
+    )
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Объединение клиентов одного владельца, чьи адреса отличаются только
+    регистром или пробелами по краям.
+
+    Остается клиент с наименьшим id, рассылки дубликатов переносятся на него.
+    Группы обрабатываются пачками, каждая пачка в своей транзакции.
+    """
+    Client = apps.get_model("mailings", "Client")
+    Recipient = apps.get_model("mailings", "Mailing").recipients.through
+    StatCounter = apps.get_model("mailings", "StatCounter")
+    db = schema_editor.connection.alias
+
+    check_cross_owner_conflicts(Client, db)
+
+    groups = (
+        Client.objects.using(db)
+        .annotate(email_lower=normalized_email())
+        .values("owner_id", "email_lower")
+        .annotate(total=Count("id"), keep_id=Min("id"))
+        .filter(total__gt=1)
+        # Конфликтов между владельцами уже нет, поэтому адрес определяет
+        # группу однозначно и годится как ключ для постраничного обхода
+        .order_by("email_lower")
+    )
+    last_email = ""
+    while True:
+        batch = list(groups.filter(email_lower__gt=last_email)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_email = batch[-1]["email_lower"]
+
+        with transaction.atomic(using=db):
+            for group in batch:
+                keep_id = group["keep_id"]
+                duplicate_ids = list(
+                    Client.objects.using(db)
+                    .annotate(email_lower=normalized_email())
+                    .filter(
+                        owner_id=group["owner_id"], email_lower=group["email_lower"]
+                    )
+                    .exclude(pk=keep_id)
+                    .values_list("pk", flat=True)
+                )
+                links = Recipient.objects.using(db).filter(client_id__in=duplicate_ids)
+                # Рассылки, где оставшийся клиент уже есть, не дублируем
+                links.filter(
+                    mailing_id__in=Recipient.objects.using(db)
+                    .filter(client_id=keep_id)
+                    .values("mailing_id")
+                ).delete()
+                links.update(client_id=keep_id)
+                Client.objects.using(db).filter(pk__in=duplicate_ids).delete()
+
+    # Адреса нормализуются пачками по id
+    last_id = 0
+    while True:
+        ids = list(
+            Client.objects.using(db)
+            .filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        Client.objects.using(db).filter(pk__in=ids).update(email=normalized_email())
+
+    StatCounter.objects.using(db).filter(name="total_clients").update(
+        value=Client.objects.using(db).count()
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("mailings", "0005_statcounter"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:35
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0006_merge_duplicate_client_emails"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="client",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("email", django.db.models.functions.text.Lower("email"))
+                ),
+                name="client_email_lowercase",
+                violation_error_message="Email должен быть в нижнем регистре.",
+            ),
+        ),
+    ]
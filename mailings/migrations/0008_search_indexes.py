@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:40
+
+from django.db import migrations
+
+# Выражения индексов совпадают с SQL, который строит mailings.search:
+# icontains -> UPPER(поле::text) LIKE ..., SearchVector -> to_tsvector(...)
+SEARCH_INDEXES = {
+    "client_email_trgm_idx": "mailings_client USING GIN (UPPER(email::text) gin_trgm_ops)",
+    "client_full_name_trgm_idx": "mailings_client USING GIN (UPPER(full_name::text) gin_trgm_ops)",
+    "client_comment_fts_idx": "mailings_client USING GIN (to_tsvector('russian'::regconfig, COALESCE(comment, '')))",
+    "message_subject_trgm_idx": "mailings_message USING GIN (UPPER(subject::text) gin_trgm_ops)",
+    "message_body_fts_idx": "mailings_message USING GIN (to_tsvector('russian'::regconfig, COALESCE(body, '')))",
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, definition in SEARCH_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("mailings", "0007_client_email_lowercase"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0008_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mailing",
+            name="recipients",
+            field=models.ManyToManyField(
+                blank=True, to="mailings.client", verbose_name="Получатели"
+            ),
+        ),
+        migrations.CreateModel(
+            name="Segment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Название")),
+                (
+                    "email_domains",
+                    models.CharField(
+                        blank=True,
+                        help_text="Через запятую, например: mail.ru, yandex.ru. Пусто — любые",
+                        max_length=500,
+                        verbose_name="Домены email",
+                    ),
+                ),
+                (
+                    "comment_tags",
+                    models.CharField(
+                        blank=True,
+                        help_text="Через запятую; клиент должен содержать в комментарии все метки",
+                        max_length=500,
+                        verbose_name="Метки в комментарии",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создан"),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сегмент",
+                "verbose_name_plural": "Сегменты",
+                "ordering": ["name", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="segment",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="mailings",
+                to="mailings.segment",
+                verbose_name="Сегмент",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0009_mailing_segments"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Suppression",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "email",
+                    models.EmailField(
+                        max_length=254, unique=True, verbose_name="Email"
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("bounce", "Недоставлено"),
+                            ("complaint", "Жалоба на спам"),
+                            ("unsubscribe", "Отписка"),
+                        ],
+                        max_length=20,
+                        verbose_name="Причина",
+                    ),
+                ),
+                ("comment", models.TextField(blank=True, verbose_name="Комментарий")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Добавлен"),
+                ),
+            ],
+            options={
+                "verbose_name": "Исключенный адрес",
+                "verbose_name_plural": "Исключенные адреса",
+            },
+        ),
+    ]
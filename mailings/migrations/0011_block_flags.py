@@ -0,0 +1,61 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0010_suppression"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="is_blocked",
+            field=models.BooleanField(default=False, verbose_name="Заблокирован"),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="is_blocked",
+            field=models.BooleanField(default=False, verbose_name="Заблокирована"),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="is_disabled",
+            field=models.BooleanField(default=False, verbose_name="Отключена"),
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="is_blocked",
+            field=models.BooleanField(default=False, verbose_name="Заблокировано"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                condition=models.Q(("is_blocked", True)),
+                fields=["owner", "id"],
+                name="client_blocked_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailing",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_blocked", False), ("is_disabled", False), ("status", "started")
+                ),
+                fields=["start_time", "end_time"],
+                name="mailing_sendable_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("is_blocked", True)),
+                fields=["id"],
+                name="message_blocked_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0011_block_flags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageAttachment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to="attachments/%Y/%m/", verbose_name="Файл"
+                    ),
+                ),
+                (
+                    "filename",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Имя файла"
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.CharField(
+                        default="application/octet-stream",
+                        max_length=100,
+                        verbose_name="Тип содержимого",
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Размер, байт"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Загружен"),
+                ),
+                (
+                    "message",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attachments",
+                        to="mailings.message",
+                        verbose_name="Сообщение",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Вложение",
+                "verbose_name_plural": "Вложения",
+                "ordering": ["id"],
+            },
+        ),
+    ]
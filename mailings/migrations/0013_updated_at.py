@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0012_message_attachments"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Изменен",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Изменена",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Изменено",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailings", "0013_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="resume_after_id",
+            field=models.BigIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Отложена после получателя",
+            ),
+        ),
+    ]
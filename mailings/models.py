@@ -1,9 +1,36 @@
-from django.db import models
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Coalesce, Least, Lower
+from django.utils import timezone
 from config import settings
+from mailings import counters
+from mailings.cache import bump_owners
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Получатели читаются порциями такого размера, и раз на порцию попыток
+# сбрасывается кеш страниц владельца
+SEND_CHUNK_SIZE = 2000
+
+
+class ClientQuerySet(models.QuerySet):
+    def search(self, term):
+        from mailings.search import apply_search
+
+        return apply_search(self, term, Client.SEARCH_FIELDS, Client.SEARCH_TEXT_FIELDS)
+
+    def active(self):
+        """Клиенты, которым разрешена отправка"""
+        return self.filter(is_blocked=False)
+
+    def with_emails(self, emails):
+        """Клиенты с указанными адресами без учета регистра (по уникальному индексу)"""
+        return self.filter(
+            email__in=[Client.normalize_email(email) for email in emails]
+        )
+
 
 class Client(models.Model):
     """Модель получателя рассылки (клиента)"""
@@ -11,6 +38,8 @@ class Client(models.Model):
     email = models.EmailField(unique=True, verbose_name="Email")
     full_name = models.CharField(max_length=255, verbose_name="Ф.И.О.")
     comment = models.TextField(verbose_name="Комментарий", blank=True)
+    is_blocked = models.BooleanField(default=False, verbose_name="Заблокирован")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменен")
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -19,9 +48,35 @@ class Client(models.Model):
         blank=True,
     )
 
+    # Поля поиска клиентов (см. mailings.search.apply_search)
+    SEARCH_FIELDS = ("email", "full_name")
+    SEARCH_TEXT_FIELDS = ("comment",)
+
+    objects = ClientQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Получатель"
         verbose_name_plural = "Получатели"
+        indexes = [
+            models.Index(
+                fields=["owner", "email", "id"], name="client_owner_email_id_idx"
+            ),
+            # Заблокированных обычно мало: частичный индекс для их выборки
+            models.Index(
+                fields=["owner", "id"],
+                condition=models.Q(is_blocked=True),
+                name="client_blocked_idx",
+            ),
+        ]
+        constraints = [
+            # Адреса хранятся в нижнем регистре, поэтому уникальный индекс
+            # по email работает как уникальность без учета регистра
+            models.CheckConstraint(
+                condition=models.Q(email=Lower("email")),
+                name="client_email_lowercase",
+                violation_error_message="Email должен быть в нижнем регистре.",
+            ),
+        ]
         permissions = [
             ("can_view_all_clients", "Может просматривать всех клиентов"),
             ("can_block_client", "Может блокировать клиентов"),
@@ -30,12 +85,27 @@ class Client(models.Model):
     def __str__(self):
         return self.full_name
 
+    @staticmethod
+    def normalize_email(email):
+        """Адреса хранятся в нижнем регистре без пробелов по краям"""
+        return (email or "").strip().lower()
+
+    def clean(self):
+        # До проверки уникальности, чтобы Ivan@Mail.ru совпал с ivan@mail.ru
+        self.email = self.normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        self.email = self.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
 
 class Message(models.Model):
     """Модель сообщения для рассылки"""
 
     subject = models.CharField(max_length=255, verbose_name="Тема письма")
     body = models.TextField(verbose_name="Тело письма")
+    is_blocked = models.BooleanField(default=False, verbose_name="Заблокировано")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -47,6 +117,14 @@ class Message(models.Model):
     class Meta:
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
+        indexes = [
+            models.Index(fields=["owner", "-id"], name="message_owner_id_idx"),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_blocked=True),
+                name="message_blocked_idx",
+            ),
+        ]
         permissions = [
             ("can_view_all_messages", "Может просматривать все сообщения"),
             ("can_block_message", "Может блокировать сообщения"),
@@ -56,6 +134,215 @@ class Message(models.Model):
         return self.subject
 
 
+class MessageAttachment(models.Model):
+    """Файл, прикладываемый к письму"""
+
+    message = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        related_name="attachments",
+        verbose_name="Сообщение",
+    )
+    file = models.FileField(upload_to="attachments/%Y/%m/", verbose_name="Файл")
+    filename = models.CharField(max_length=255, blank=True, verbose_name="Имя файла")
+    content_type = models.CharField(
+        max_length=100,
+        default="application/octet-stream",
+        verbose_name="Тип содержимого",
+    )
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Размер, байт")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Загружен")
+
+    class Meta:
+        verbose_name = "Вложение"
+        verbose_name_plural = "Вложения"
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.filename
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.filename:
+            self.filename = os.path.basename(self.file.name)
+        if self.file and not self.size:
+            self.size = self.file.size
+        super().save(*args, **kwargs)
+
+
+class Segment(models.Model):
+    """
+    Сохраненный сегмент получателей.
+
+    Сегмент хранит только условия отбора клиентов владельца: получатели
+    выбираются из базы в момент отправки и не записываются в связь
+    ``Mailing.recipients``.
+    """
+
+    name = models.CharField(max_length=255, verbose_name="Название")
+    email_domains = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name="Домены email",
+        help_text="Через запятую, например: mail.ru, yandex.ru. Пусто — любые",
+    )
+    comment_tags = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name="Метки в комментарии",
+        help_text="Через запятую; клиент должен содержать в комментарии все метки",
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Владелец",
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+
+    class Meta:
+        verbose_name = "Сегмент"
+        verbose_name_plural = "Сегменты"
+        ordering = ["name", "id"]
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def split_list(value):
+        return [
+            item.strip().lower() for item in (value or "").split(",") if item.strip()
+        ]
+
+    def get_domains(self):
+        return [domain.lstrip("@") for domain in self.split_list(self.email_domains)]
+
+    def get_tags(self):
+        return [tag.lstrip("#") for tag in self.split_list(self.comment_tags)]
+
+    def get_clients(self):
+        """Клиенты сегмента (ленивый QuerySet, без материализации)"""
+        from mailings.search import filter_text
+
+        queryset = Client.objects.filter(owner_id=self.owner_id)
+
+        domains = self.get_domains()
+        if domains:
+            # iendswith дает UPPER(email) LIKE '%@DOMAIN' — по триграммному индексу
+            condition = models.Q()
+            for domain in domains:
+                condition |= models.Q(email__iendswith=f"@{domain}")
+            queryset = queryset.filter(condition)
+
+        return filter_text(queryset, "comment", self.get_tags())
+
+
+class MailingQuerySet(models.QuerySet):
+    def sendable(self):
+        """Рассылки, не заблокированные и не отключенные, с разрешенным сообщением"""
+        return self.filter(
+            is_blocked=False, is_disabled=False, message__is_blocked=False
+        )
+
+    def _transition(self, becomes_started, **values):
+        """
+        Смена статуса выбранных рассылок одним UPDATE.
+
+        ``becomes_started`` — условие, при котором рассылка после UPDATE будет
+        «Запущена» (``None`` — ни одна не будет). UPDATE не отправляет
+        сигналы, поэтому счетчик активных рассылок и поколения кеша
+        владельцев обновляются здесь же.
+
+        Строки блокируются до подсчета: параллельная смена статуса тех же
+        рассылок ждет конца транзакции и не расходится со счетчиком.
+        """
+        was_started = models.Q(status="started")
+        with transaction.atomic(using=self.db):
+            list(
+                self.select_for_update(of=("self",))
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if becomes_started is None:
+                changes = self.aggregate(left=models.Count("pk", filter=was_started))
+                changes["joined"] = 0
+            else:
+                changes = self.aggregate(
+                    left=models.Count("pk", filter=was_started & ~becomes_started),
+                    joined=models.Count("pk", filter=~was_started & becomes_started),
+                )
+            owner_ids = list(
+                self.order_by().values_list("owner_id", flat=True).distinct()
+            )
+            updated = self.update(updated_at=timezone.now(), **values)
+            counters.increment(
+                counters.ACTIVE_MAILINGS, changes["joined"] - changes["left"]
+            )
+        bump_owners(owner_ids, global_stats=True)
+        return updated
+
+    def refresh_statuses(self):
+        """``update_status`` для всех выбранных рассылок без загрузки объектов"""
+        now = timezone.now()
+        started = models.Q(start_time__lte=now, end_time__gte=now)
+        stale = self.filter(
+            models.Q(start_time__gt=now) & ~models.Q(status="created")
+            | models.Q(end_time__lt=now) & ~models.Q(status="completed")
+            | started & ~models.Q(status="started")
+        )
+        return stale._transition(
+            started,
+            status=models.Case(
+                models.When(start_time__gt=now, then=models.Value("created")),
+                models.When(end_time__lt=now, then=models.Value("completed")),
+                default=models.Value("started"),
+            ),
+        )
+
+    def force_complete(self):
+        """
+        Досрочное завершение выбранных рассылок.
+
+        Период обрезается текущим временем, чтобы ``update_status`` не вернул
+        рассылке прежний статус.
+        """
+        now = models.Value(timezone.now())
+        return self.exclude(status="completed")._transition(
+            None,
+            status="completed",
+            start_time=Least("start_time", now),
+            end_time=Least("end_time", now),
+        )
+
+    def with_counts(self):
+        """
+        Количество получателей и попыток одним запросом.
+
+        Счетчики считаются коррелированными подзапросами, а не JOIN-ами,
+        чтобы получатели и попытки не перемножались между собой.
+        """
+
+        def count_of(queryset):
+            subquery = (
+                queryset.filter(mailing_id=models.OuterRef("pk"))
+                .order_by()
+                .values("mailing_id")
+                .annotate(total=models.Count("*"))
+                .values("total")
+            )
+            return Coalesce(
+                models.Subquery(subquery), 0, output_field=models.IntegerField()
+            )
+
+        recipients = Mailing.recipients.through.objects
+        return self.annotate(
+            recipients_count=count_of(recipients.all()),
+            attempts_count=count_of(MailingAttempt.objects.all()),
+            success_count=count_of(MailingAttempt.objects.filter(status="success")),
+            fail_count=count_of(MailingAttempt.objects.filter(status="failed")),
+        )
+
+
 class Mailing(models.Model):
     """Модель рассылки"""
 
@@ -73,7 +360,26 @@ class Mailing(models.Model):
     message = models.ForeignKey(
         Message, on_delete=models.CASCADE, verbose_name="Сообщение"
     )
-    recipients = models.ManyToManyField(Client, verbose_name="Получатели")
+    recipients = models.ManyToManyField(Client, verbose_name="Получатели", blank=True)
+    segment = models.ForeignKey(
+        Segment,
+        on_delete=models.PROTECT,
+        verbose_name="Сегмент",
+        null=True,
+        blank=True,
+        related_name="mailings",
+    )
+    is_blocked = models.BooleanField(default=False, verbose_name="Заблокирована")
+    is_disabled = models.BooleanField(default=False, verbose_name="Отключена")
+    # Отправка прервана открытым выключателем SMTP (mailings.circuit):
+    # следующий запуск продолжит с получателей с большим id
+    resume_after_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Отложена после получателя",
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -82,9 +388,22 @@ class Mailing(models.Model):
         blank=True,
     )
 
+    objects = MailingQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Рассылка"
         verbose_name_plural = "Рассылки"
+        indexes = [
+            # Выборка активных рассылок в send_mailings идет только по этому
+            # индексу: заблокированные и отключенные в него не попадают
+            models.Index(
+                fields=["start_time", "end_time"],
+                condition=models.Q(
+                    status="started", is_blocked=False, is_disabled=False
+                ),
+                name="mailing_sendable_idx",
+            ),
+        ]
         permissions = [
             ("can_view_all_mailings", "Может просматривать все рассылки"),
             ("can_block_mailing", "Может блокировать рассылки"),
@@ -121,26 +440,38 @@ class Mailing(models.Model):
 
                 raise ValidationError("Дата начала должна быть раньше даты окончания")
 
-    def update_status(self):
-        """Обновление статуса рассылки на основе текущего времени"""
+    @staticmethod
+    def status_at(start_time, end_time, now=None):
+        """Статус рассылки с заданным периодом на момент ``now``"""
         from django.utils import timezone
 
-        now = timezone.now()
+        now = now or timezone.now()
 
-        if now < self.start_time:
-            new_status = "created"
-        elif self.start_time <= now <= self.end_time:
-            new_status = "started"
-        else:
-            new_status = "completed"
+        if now < start_time:
+            return "created"
+        elif start_time <= now <= end_time:
+            return "started"
+        return "completed"
+
+    def update_status(self):
+        """Обновление статуса рассылки на основе текущего времени"""
+        new_status = self.status_at(self.start_time, self.end_time)
 
         if self.status != new_status:
             self.status = new_status
             # Сохраняем без валидации, чтобы не проверять даты
-            self.save(update_fields=["status"], skip_validation=True)
+            self.save(update_fields=["status", "updated_at"], skip_validation=True)
 
         return self.status
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки нужен для учета активных рассылок
+        if "status" in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
     def save(self, *args, **kwargs):
         """Переопределяем save с возможностью пропустить валидацию"""
         # Если есть аргумент skip_validation, пропускаем валидацию
@@ -154,12 +485,78 @@ class Mailing(models.Model):
     def __str__(self):
         return f'Рассылка "{self.message.subject}" от {self.start_time.strftime("%d.%m.%Y")}'
 
-    def send_mailing(self):
+    def get_recipients(self):
+        """
+        Все получатели рассылки: выбранные вручную и клиенты сегмента.
+
+        Клиенты сегмента не записываются в связь ``recipients``, а выбираются
+        запросом; клиент из обоих источников не дублируется.
+        """
+        if not self.segment_id:
+            return self.recipients.all()
+
+        segment_clients = self.segment.get_clients()
+        explicit = Mailing.recipients.through.objects.filter(mailing_id=self.pk)
+        if not explicit.exists():
+            return segment_clients
+        return Client.objects.filter(
+            models.Q(pk__in=segment_clients.values("pk"))
+            | models.Q(pk__in=explicit.values("client_id"))
+        )
+
+    def add_recipients(self, clients):
+        """
+        Добавление всех клиентов из QuerySet одним INSERT ... SELECT.
+
+        Клиенты не загружаются в Python, уже добавленные пропускаются.
+        Возвращает количество добавленных получателей.
+        """
+        through = Mailing.recipients.through
+        db = router.db_for_write(through, instance=self)
+        existing = through.objects.using(db).filter(mailing_id=self.pk)
+        select = (
+            clients.using(db)
+            .exclude(pk__in=existing.values("client_id"))
+            .order_by()
+            .annotate(
+                mailing_ref=models.Value(self.pk, output_field=models.IntegerField())
+            )
+            .values_list("pk", "mailing_ref")
+        )
+        try:
+            sql, params = select.query.get_compiler(using=db).as_sql()
+        except EmptyResultSet:
+            # Пустой QuerySet (например, ``none()``): добавлять нечего
+            return 0
+
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        columns = ", ".join(
+            quote(through._meta.get_field(name).column)
+            for name in ("client", "mailing")
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(through._meta.db_table)} ({columns}) {sql}",
+                params,
+            )
+            added = cursor.rowcount
+        # Сырой INSERT не отправляет m2m_changed
+        if added:
+            bump_owners([self.owner_id])
+        return added
+
+    def send_mailing(self, progress=None):
         """
         Отправка рассылки всем получателям
+
+        ``progress`` — необязательный ``mailings.progress.MailingProgress``,
+        в который записывается результат по каждому получателю.
         """
         from mailings.models import MailingAttempt
-        from django.core.mail import send_mail
+        from mailings import attachments, circuit, suppression
+        from django.core.mail import EmailMessage, get_connection
+        from smtplib import SMTPRecipientsRefused
         import logging
 
         logger = logging.getLogger(__name__)
@@ -175,27 +572,78 @@ class Mailing(models.Model):
             logger.warning(error_msg)
             return False, error_msg
 
-        # Проверяем, есть ли получатели
-        recipients = self.recipients.all()
-        if not recipients:
+        if self.is_blocked or self.is_disabled or self.message.is_blocked:
+            error_msg = "Рассылка или ее сообщение заблокированы либо отключены"
+            logger.warning(error_msg)
+            return False, error_msg
+
+        # Проверяем, есть ли получатели. Сам список не загружается целиком:
+        # получатели сегмента читаются из базы порциями во время отправки,
+        # заблокированные клиенты отсекаются условием в том же запросе
+        recipients = self.get_recipients().active().only("id", "email").order_by("id")
+        if self.resume_after_id is not None:
+            # Продолжение отложенной отправки
+            recipients = recipients.filter(pk__gt=self.resume_after_id)
+        if not recipients.exists():
+            if self.resume_after_id is not None:
+                self._set_resume_point(None)
             error_msg = "Нет получателей для рассылки"
             logger.warning(error_msg)
             return False, error_msg
 
         success_count = 0
         fail_count = 0
+        suppressed_count = 0
+        # Фильтр исключенных адресов процесса: к базе только при совпадении
+        suppressed = suppression.get_filter()
+        # Вложения кодируются один раз на рассылку и общие для всех писем
+        attachment_parts = attachments.encoded_parts(self.message)
+        # Выключатель общий для всех процессов, отправляющих через этот сервер
+        smtp_host = circuit.connection_host(get_connection())
+        breaker = circuit.SMTPCircuitBreaker(smtp_host)
+        # 0 — отложено до первого получателя: все id больше
+        last_id = self.resume_after_id or 0
+        deferred = False
+        stopped = False
+        processed = 0
+        # Попытки без сигнала сброса кеша (см. SEND_CHUNK_SIZE)
+        unbumped_attempts = 0
+        if progress is not None:
+            progress.start(self.owner_id, recipients.count())
 
         # Отправляем каждому получателю
-        for recipient in recipients:
+        for recipient in recipients.iterator(chunk_size=SEND_CHUNK_SIZE):
+            # Рассылку могли досрочно завершить, отключить или заблокировать
+            # во время отправки: проверяем это перед каждой порцией
+            if processed and processed % SEND_CHUNK_SIZE == 0:
+                if not self._still_sendable():
+                    stopped = True
+                    break
+            processed += 1
+
+            if suppressed.is_suppressed(recipient.email):
+                suppressed_count += 1
+                if progress is not None:
+                    progress.record("skipped", recipient.email)
+                last_id = recipient.pk
+                continue
+
+            if not breaker.allow():
+                # Сервер недоступен: оставшимся письма не отправляем
+                # и не записываем тысячи одинаковых ошибок
+                deferred = True
+                break
+            last_id = recipient.pk
+
             try:
                 # Отправляем письмо
-                result = send_mail(
+                email = EmailMessage(
                     subject=self.message.subject,
-                    message=self.message.body,
-                    from_email=None,
-                    recipient_list=[recipient.email],
-                    fail_silently=False,
+                    body=self.message.body,
+                    to=[recipient.email],
+                    attachments=attachment_parts,
                 )
+                result = email.send(fail_silently=False)
 
                 if result == 1:
                     # Успешная отправка - СОЗДАЕМ ЗАПИСЬ
@@ -208,10 +656,18 @@ class Mailing(models.Model):
                         f"✅ Создана попытка #{attempt.id} для {recipient.email}"
                     )  # Отладка
                     success_count += 1
+                    breaker.record_success()
+                    if progress is not None:
+                        progress.record("sent", recipient.email)
                 else:
                     raise Exception(f"Письмо не отправлено (код: {result})")
 
             except Exception as e:
+                if isinstance(e, SMTPRecipientsRefused):
+                    # Сервер отклонил адрес: больше на него не отправляем
+                    suppressed.add(recipient.email, "bounce", str(e)[:200])
+                elif circuit.is_host_failure(e):
+                    breaker.record_failure()
                 # Ошибка отправки - СОЗДАЕМ ЗАПИСЬ
                 error_text = str(e)[:200]
                 attempt = MailingAttempt.objects.create(
@@ -223,10 +679,49 @@ class Mailing(models.Model):
                     f"❌ Создана попытка #{attempt.id} с ошибкой для {recipient.email}"
                 )  # Отладка
                 fail_count += 1
+                if progress is not None:
+                    progress.record("failed", recipient.email)
+
+            unbumped_attempts += 1
+            if unbumped_attempts >= SEND_CHUNK_SIZE:
+                bump_owners([self.owner_id])
+                unbumped_attempts = 0
+
+        if unbumped_attempts:
+            bump_owners([self.owner_id])
+        self._set_resume_point(last_id if deferred else None)
 
         result_message = f"Отправлено: {success_count}, ошибок: {fail_count}"
+        if suppressed_count:
+            result_message += f", пропущено исключенных адресов: {suppressed_count}"
+        if stopped:
+            result_message += (
+                ". Отправка остановлена: рассылка завершена, отключена "
+                "или заблокирована"
+            )
+        elif deferred:
+            result_message += (
+                f". SMTP-сервер {smtp_host} недоступен, отправка остальным "
+                f"отложена на {breaker.retry_in():.0f} с"
+            )
         return True, result_message
 
+    def _still_sendable(self):
+        """Рассылка по-прежнему запущена и не отключена (по данным в базе)"""
+        now = timezone.now()
+        return (
+            Mailing.objects.sendable()
+            .filter(
+                pk=self.pk, status="started", start_time__lte=now, end_time__gte=now
+            )
+            .exists()
+        )
+
+    def _set_resume_point(self, recipient_id):
+        if self.resume_after_id != recipient_id:
+            self.resume_after_id = recipient_id
+            self.save(update_fields=["resume_after_id"], skip_validation=True)
+
 
 class MailingAttempt(models.Model):
     """Модель попытки рассылки"""
@@ -253,6 +748,75 @@ class MailingAttempt(models.Model):
     class Meta:
         verbose_name = "Попытка рассылки"
         verbose_name_plural = "Попытки рассылок"
+        indexes = [
+            models.Index(fields=["-attempt_time", "-id"], name="attempt_time_id_idx"),
+            models.Index(
+                fields=["mailing", "-attempt_time", "-id"],
+                name="attempt_mailing_time_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return f'Попытка {self.attempt_time.strftime("%d.%m.%Y %H:%M")} - {self.get_status_display()}'
+
+
+class MailingAttemptArchive(models.Model):
+    """Архив попыток рассылок за месяц, выгруженный из горячей таблицы"""
+
+    period = models.DateField(unique=True, verbose_name="Период (месяц)")
+    file_path = models.CharField(max_length=500, verbose_name="Файл архива")
+    rows_count = models.PositiveBigIntegerField(
+        default=0, verbose_name="Количество попыток"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата архивации")
+
+    class Meta:
+        verbose_name = "Архив попыток"
+        verbose_name_plural = "Архивы попыток"
+        ordering = ["-period"]
+
+    def __str__(self):
+        return f'Архив попыток за {self.period.strftime("%m.%Y")}'
+
+
+class Suppression(models.Model):
+    """Адрес, на который больше нельзя отправлять письма"""
+
+    REASON_CHOICES = [
+        ("bounce", "Недоставлено"),
+        ("complaint", "Жалоба на спам"),
+        ("unsubscribe", "Отписка"),
+    ]
+
+    email = models.EmailField(unique=True, verbose_name="Email")
+    reason = models.CharField(
+        max_length=20, choices=REASON_CHOICES, verbose_name="Причина"
+    )
+    comment = models.TextField(verbose_name="Комментарий", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Добавлен")
+
+    class Meta:
+        verbose_name = "Исключенный адрес"
+        verbose_name_plural = "Исключенные адреса"
+
+    def __str__(self):
+        return f"{self.email} ({self.get_reason_display()})"
+
+    def save(self, *args, **kwargs):
+        self.email = Client.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
+
+class StatCounter(models.Model):
+    """Счетчик общей статистики, поддерживаемый инкрементально"""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название")
+    value = models.BigIntegerField(default=0, verbose_name="Значение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлен")
+
+    class Meta:
+        verbose_name = "Счетчик статистики"
+        verbose_name_plural = "Счетчики статистики"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,269 @@
+"""
+Keyset (cursor) пагинация для больших списков.
+
+В отличие от OFFSET-пагинации стоимость получения страницы не зависит от
+её номера: следующая страница выбирается условием по значениям полей
+сортировки последней строки, что позволяет использовать составной индекс.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.functional import cached_property
+
+from mailings.search import apply_search
+
+DEFAULT_PAGE_SIZE = 50
+COUNT_LIMIT = 10000
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps([direction, values], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Разбор курсора, ``None`` для пустого или поврежденного значения"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """Страница результатов с курсорами на соседние страницы"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по уникальному набору полей сортировки.
+
+    ``ordering`` должен однозначно упорядочивать строки, поэтому последним
+    полем обычно идет ``id``, например ``("-attempt_time", "-id")``.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [field.lstrip("-") for field in self.ordering]
+
+    def _to_python(self, values):
+        """
+        Значения курсора в типах полей, ``None`` для поврежденного курсора.
+
+        Курсор приходит от клиента, поэтому значения другой длины, ``null``
+        или неподходящего типа не должны приводить к ошибке сервера.
+        """
+        if len(values) != len(self.fields) or any(value is None for value in values):
+            return None
+        model = self.queryset.model
+        try:
+            converted = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if any(value is None for value in converted):
+            return None
+        return converted
+
+    def _seek_filter(self, values, reverse):
+        """Условие «строго после значений курсора» в заданном направлении"""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            step = Q(**{f"{self.fields[index]}__{lookup}": values[index]})
+            for name, value in zip(self.fields[:index], values[:index]):
+                step &= Q(**{name: value})
+            condition |= step
+        return condition
+
+    def _cursor_values(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def page(self, cursor=None):
+        # Поврежденный курсор — первая страница
+        decoded = decode_cursor(cursor)
+        values = self._to_python(decoded[1]) if decoded else None
+
+        queryset = self.queryset
+        ordering = self.ordering
+        reverse = False
+        if values is not None:
+            reverse = decoded[0] == "prev"
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in self.ordering
+            )
+
+        rows = list(queryset.order_by(*ordering)[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, None, None)
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = (
+            encode_cursor(self._cursor_values(rows[-1]), "next") if has_next else None
+        )
+        previous_cursor = (
+            encode_cursor(self._cursor_values(rows[0]), "prev")
+            if has_previous
+            else None
+        )
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def approximate_count(queryset, limit=COUNT_LIMIT):
+    """
+    Количество строк без полного сканирования.
+
+    Точное значение считается не дальше ``limit`` строк. Если строк больше,
+    на PostgreSQL используется оценка планировщика, на других СУБД — сам
+    ``limit``. Возвращает пару ``(количество, точное_ли_значение)``.
+    """
+    count = queryset.order_by()[: limit + 1].count()
+    if count <= limit:
+        return count, True
+
+    # Оценку берем у той же базы, откуда читается список (может быть реплика)
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        return max(estimate, limit), False
+
+    return limit, False
+
+
+class ApproximatePaginator(Paginator):
+    """
+    Постраничный вывод с приблизительным количеством (для админки).
+
+    Вместо полного ``COUNT(*)`` используется ``approximate_count``, поэтому
+    номер последней страницы на больших таблицах тоже приблизительный.
+    """
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)[0]
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset-пагинация, поиск и JSON-вариант для ``ListView``.
+
+    ``search_fields`` и ``search_text_fields`` — короткие поля и длинные
+    тексты для индексируемого поиска (см. ``mailings.search``),
+    ``json_fields`` — поля объектов в ответе ``?format=json``.
+    """
+
+    paginate_by = DEFAULT_PAGE_SIZE
+    ordering = ("-id",)
+    search_fields = ()
+    search_text_fields = ()
+    json_fields = ("id",)
+    max_page_size = 500
+
+    def get_search_query(self):
+        return self.request.GET.get("q", "").strip()
+
+    def search_queryset(self, queryset):
+        return apply_search(
+            queryset,
+            self.get_search_query(),
+            self.search_fields,
+            self.search_text_fields,
+        )
+
+    def get_paginate_by(self, queryset):
+        limit = self.request.GET.get("limit", "")
+        if limit.isdigit() and int(limit) > 0:
+            return min(int(limit), self.max_page_size)
+        return self.paginate_by
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        page = paginator.page(self.request.GET.get("cursor"))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["search_query"] = self.get_search_query()
+        filters = self.request.GET.copy()
+        filters.pop("cursor", None)
+        filters.pop("format", None)
+        context["filter_query"] = filters.urlencode()
+        return context
+
+    def wants_json(self):
+        return self.request.GET.get("format") == "json"
+
+    def get_json_data(self, context):
+        page = context["page_obj"]
+        return {
+            "results": [
+                {field: getattr(obj, field) for field in self.json_fields}
+                for obj in page.object_list
+            ],
+            "next_cursor": page.next_cursor,
+            "previous_cursor": page.previous_cursor,
+        }
+
+    def render_to_response(self, context, **response_kwargs):
+        if not self.wants_json():
+            return super().render_to_response(context, **response_kwargs)
+
+        return JsonResponse(
+            self.get_json_data(context), json_dumps_params={"ensure_ascii": False}
+        )
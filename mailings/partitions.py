@@ -0,0 +1,291 @@
+"""
+Помесячное партиционирование таблицы попыток рассылок и архивирование
+старых периодов в сжатые файлы.
+
+На PostgreSQL таблица ``mailings_mailingattempt`` является секционированной
+(PARTITION BY RANGE по ``attempt_time``), каждая секция хранит один месяц.
+На остальных СУБД используется та же схема «период = месяц», но без секций:
+архивирование выгружает строки периода в файл и удаляет их из таблицы.
+
+Строки месяцев без своей секции (поздние или задним числом вставленные
+попытки, синтетические данные) попадают в секцию по умолчанию; перед
+архивированием для таких месяцев создаются секции, и строки переносятся в них.
+
+Функции работы со схемой принимают ``using`` — псевдоним базы; миграция
+передает свое соединение, чтобы не трогать другие базы.
+"""
+
+import csv
+import gzip
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "mailings_mailingattempt"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+ARCHIVE_COLUMNS = ["id", "attempt_time", "status", "server_response", "mailing_id"]
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def get_connection(using=None):
+    """Соединение с базой ``using`` (по умолчанию — основной)"""
+    return connections[using or DEFAULT_DB_ALIAS]
+
+
+def is_partitioned(using=None):
+    """Используется ли нативное партиционирование (только PostgreSQL)"""
+    return get_connection(using).vendor == "postgresql"
+
+
+def month_start(value):
+    """Первое число месяца (00:00 UTC) для даты или datetime"""
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(period):
+    """Начало следующего месяца"""
+    if period.month == 12:
+        return period.replace(year=period.year + 1, month=1)
+    return period.replace(month=period.month + 1)
+
+
+def add_months(period, months):
+    """Сдвиг периода на указанное количество месяцев (в т.ч. отрицательное)"""
+    index = period.year * 12 + (period.month - 1) + months
+    return period.replace(year=index // 12, month=index % 12 + 1)
+
+
+def parse_period(value):
+    """Разбор периода в формате YYYY-MM"""
+    try:
+        return month_start(datetime.strptime(value, "%Y-%m"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Некорректный период: {value!r}, ожидается YYYY-MM")
+
+
+def partition_name(period):
+    return f"{PARENT_TABLE}_p{period.year:04d}{period.month:02d}"
+
+
+def list_partitions(using=None):
+    """Список периодов, для которых существуют секции (по возрастанию)"""
+    if not is_partitioned(using):
+        return []
+    with get_connection(using).cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    periods = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            periods.append(
+                datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+            )
+    return sorted(periods)
+
+
+def ensure_partition(period, using=None):
+    """
+    Создание секции за месяц, если её ещё нет.
+
+    Строки этого месяца, уже попавшие в секцию по умолчанию, переносятся
+    в новую секцию в той же транзакции.
+    """
+    if not is_partitioned(using) or period in list_partitions(using):
+        return False
+
+    connection = get_connection(using)
+    name = partition_name(period)
+    lower, upper = period, next_month(period)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE attempt_time >= %s AND attempt_time < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+    logger.info("Создана секция %s", name)
+    return True
+
+
+def ensure_partitions(ahead=2, using=None):
+    """Создание секций для текущего месяца и ``ahead`` следующих"""
+    period = month_start(datetime.now(dt_timezone.utc))
+    created = []
+    for offset in range(ahead + 1):
+        current = add_months(period, offset)
+        if ensure_partition(current, using):
+            created.append(current)
+    return created
+
+
+def default_partition_periods(before=None, using=None):
+    """Месяцы, строки которых лежат в секции по умолчанию (по возрастанию)"""
+    if not is_partitioned(using):
+        return []
+    sql = (
+        f"SELECT DISTINCT date_trunc('month', attempt_time AT TIME ZONE 'UTC') "
+        f"FROM {DEFAULT_PARTITION}"
+    )
+    params = []
+    if before is not None:
+        sql += " WHERE attempt_time < %s"
+        params.append(before)
+    with get_connection(using).cursor() as cursor:
+        cursor.execute(sql, params)
+        return sorted(month_start(row[0]) for row in cursor.fetchall())
+
+
+def split_default_partition(before=None, using=None):
+    """
+    Перенос строк из секции по умолчанию в помесячные секции.
+
+    Возвращает периоды, для которых секции были созданы.
+    """
+    return [
+        period
+        for period in default_partition_periods(before, using)
+        if ensure_partition(period, using)
+    ]
+
+
+def archive_dir():
+    path = Path(settings.ATTEMPTS_ARCHIVE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def archive_path(period):
+    return archive_dir() / f"attempts_{period:%Y_%m}.csv.gz"
+
+
+def archived_periods(older_than, split=True):
+    """
+    Периоды с данными в горячей таблице, которые старше ``older_than``.
+
+    Старые строки из секции по умолчанию иначе никогда не попали бы в архив,
+    поэтому они переносятся в секции своих месяцев; при ``split=False``
+    (пробный запуск) такие месяцы только добавляются в список.
+    """
+    from mailings.models import MailingAttempt
+
+    if is_partitioned():
+        if split:
+            split_default_partition(older_than)
+            pending = []
+        else:
+            pending = default_partition_periods(older_than)
+        periods = {period for period in list_partitions() if period < older_than}
+        return sorted(periods.union(pending))
+
+    periods = MailingAttempt.objects.filter(attempt_time__lt=older_than).dates(
+        "attempt_time", "month"
+    )
+    return sorted({month_start(period) for period in periods})
+
+
+def archive_period(period, keep_detached=False):
+    """
+    Выгрузка попыток за месяц в сжатый CSV и отсоединение их от горячей таблицы.
+
+    Возвращает запись ``MailingAttemptArchive``.
+    """
+    from mailings.models import MailingAttempt, MailingAttemptArchive
+
+    lower, upper = period, next_month(period)
+    path = archive_path(period)
+    tmp_path = path.with_suffix(".tmp")
+
+    queryset = (
+        MailingAttempt.objects.filter(attempt_time__gte=lower, attempt_time__lt=upper)
+        .order_by("id")
+        .values_list(*ARCHIVE_COLUMNS)
+    )
+
+    rows_count = 0
+    existing = MailingAttemptArchive.objects.filter(period=period.date()).first()
+    with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as archive:
+        writer = csv.writer(archive)
+        writer.writerow(ARCHIVE_COLUMNS)
+        if existing is not None:
+            # Период уже архивировали, а потом в него добавились строки:
+            # дописываем их к прежнему архиву, а не заменяем его
+            for row in iter_archived_attempts(existing):
+                writer.writerow(row[column] for column in ARCHIVE_COLUMNS)
+                rows_count += 1
+        for row in queryset.iterator(chunk_size=ARCHIVE_BATCH_SIZE):
+            writer.writerow(row[:1] + (row[1].isoformat(),) + row[2:])
+            rows_count += 1
+    tmp_path.replace(path)
+
+    with transaction.atomic():
+        if is_partitioned():
+            name = partition_name(period)
+            with get_connection().cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+                if not keep_detached:
+                    cursor.execute(f"DROP TABLE {name}")
+        else:
+            MailingAttempt.objects.filter(
+                attempt_time__gte=lower, attempt_time__lt=upper
+            ).delete()
+
+        archive, _ = MailingAttemptArchive.objects.update_or_create(
+            period=period.date(),
+            defaults={"file_path": str(path), "rows_count": rows_count},
+        )
+
+    logger.info("Период %s архивирован: %s строк -> %s", period, rows_count, path)
+    return archive
+
+
+def iter_archived_attempts(archive, mailing_ids=None):
+    """Потоковое чтение строк архива (словари) с фильтром по рассылкам"""
+    if mailing_ids is not None:
+        mailing_ids = {str(pk) for pk in mailing_ids}
+
+    with gzip.open(archive.file_path, "rt", encoding="utf-8", newline="") as source:
+        for row in csv.DictReader(source):
+            if mailing_ids is None or row["mailing_id"] in mailing_ids:
+                yield row
+
+
+def archived_attempt_stats(archives, mailing_ids):
+    """Количество успешных и неуспешных попыток по рассылкам из архивов"""
+    stats = {}
+    for archive in archives:
+        for row in iter_archived_attempts(archive, mailing_ids):
+            counters = stats.setdefault(
+                int(row["mailing_id"]), {"success": 0, "failed": 0}
+            )
+            counters[row["status"]] = counters.get(row["status"], 0) + 1
+    return stats
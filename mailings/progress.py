@@ -0,0 +1,183 @@
+"""
+Прогресс отправки рассылки в кеше (Redis).
+
+Цикл отправки увеличивает счетчики ``INCR`` по каждому получателю,
+а страница рассылки опрашивает их через легкий JSON-эндпоинт или получает
+через поток SSE (``mailings.streams``). Последние результаты хранятся как
+события с порядковым номером. Ни запись, ни чтение прогресса не обращаются
+к таблице попыток.
+
+Блокировка отправки живет недолго (``LOCK_TIMEOUT``) и продлевается по ходу
+отправки, поэтому после перезапуска процесса посреди отправки рассылку снова
+можно запустить через несколько минут, а не через сутки.
+"""
+
+import time
+import uuid
+
+from django.core.cache import cache
+
+PROGRESS_TIMEOUT = 24 * 60 * 60
+# Блокировка без продления освобождается через это время
+LOCK_TIMEOUT = 5 * 60
+# Продление не чаще, чем раз в столько секунд
+LOCK_REFRESH_INTERVAL = 30
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+# Отправка прервана недоступностью SMTP-сервера и будет продолжена
+DEFERRED = "deferred"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+COUNTERS = ("sent", "failed", "skipped")
+EVENTS_TIMEOUT = 10 * 60
+EVENTS_LIMIT = 20
+
+
+class MailingProgress:
+    def __init__(self, mailing_id, token=None):
+        self.mailing_id = mailing_id
+        # Метка владельца блокировки: задание из очереди узнает по ней свою
+        self.token = token
+        self.lock_refreshed_at = 0
+
+    def key(self, field):
+        return f"mailings:progress:{self.mailing_id}:{field}"
+
+    def _set(self, **values):
+        cache.set_many(
+            {self.key(field): value for field, value in values.items()},
+            timeout=PROGRESS_TIMEOUT,
+        )
+
+    def queue(self, owner_id):
+        """
+        Постановка в очередь; ``False``, если рассылка уже отправляется.
+
+        ``cache.add`` атомарен, поэтому два одновременных запуска не пройдут.
+        """
+        self.token = uuid.uuid4().hex
+        if not cache.add(self.key("lock"), self.token, timeout=LOCK_TIMEOUT):
+            return False
+        self.lock_refreshed_at = time.time()
+        self._set(
+            state=QUEUED,
+            owner_id=owner_id,
+            total=0,
+            sent=0,
+            failed=0,
+            skipped=0,
+            message="",
+            started_at=None,
+            finished_at=None,
+        )
+        return True
+
+    def acquire(self):
+        """
+        Проверка блокировки перед началом отправки.
+
+        Задание могло ждать в очереди дольше ``LOCK_TIMEOUT``: если блокировка
+        истекла, она берется заново, а если ее уже взял другой запуск —
+        отправлять должен он, и возвращается ``False``.
+        """
+        lock = self.key("lock")
+        if cache.get(lock) == self.token and cache.touch(lock, LOCK_TIMEOUT):
+            self.lock_refreshed_at = time.time()
+            return True
+        if cache.add(lock, self.token, timeout=LOCK_TIMEOUT):
+            self.lock_refreshed_at = time.time()
+            return True
+        return False
+
+    def refresh_lock(self):
+        """Продление блокировки, пока идет отправка"""
+        now = time.time()
+        if now - self.lock_refreshed_at >= LOCK_REFRESH_INTERVAL:
+            cache.touch(self.key("lock"), LOCK_TIMEOUT)
+            self.lock_refreshed_at = now
+
+    def start(self, owner_id, total):
+        self.refresh_lock()
+        self._set(
+            state=RUNNING,
+            owner_id=owner_id,
+            total=total,
+            sent=0,
+            failed=0,
+            skipped=0,
+            started_at=time.time(),
+        )
+
+    def record(self, outcome, email=""):
+        """Результат по одному получателю: ``sent``, ``failed`` или ``skipped``"""
+        self.refresh_lock()
+        self._incr(outcome)
+        seq = self._incr("seq")
+        cache.set(
+            self.key(f"event:{seq}"),
+            {"seq": seq, "outcome": outcome, "email": email, "time": time.time()},
+            timeout=EVENTS_TIMEOUT,
+        )
+
+    def _incr(self, field):
+        try:
+            return cache.incr(self.key(field))
+        except ValueError:
+            # Ключ вытеснен из кеша: начинаем счет заново, а не падаем
+            cache.set(self.key(field), 1, timeout=PROGRESS_TIMEOUT)
+            return 1
+
+    def last_seq(self):
+        return cache.get(self.key("seq"), 0)
+
+    def events_since(self, seq, limit=EVENTS_LIMIT):
+        """События с номером больше ``seq`` (не больше ``limit`` последних)"""
+        last = self.last_seq()
+        first = max(seq + 1, last - limit + 1)
+        if first > last:
+            return last, []
+        keys = [self.key(f"event:{number}") for number in range(first, last + 1)]
+        values = cache.get_many(keys)
+        return last, [values[key] for key in keys if key in values]
+
+    def finish(self, message, state=DONE):
+        self._set(state=state, message=message, finished_at=time.time())
+        # Чужую блокировку (взятую после истечения нашей) не снимаем
+        if self.token is None or cache.get(self.key("lock")) == self.token:
+            cache.delete(self.key("lock"))
+
+    def state(self):
+        return cache.get(self.key("state"))
+
+    def snapshot(self):
+        """Текущий прогресс одним запросом к кешу, ``None`` если отправок не было"""
+        fields = (
+            "state",
+            "owner_id",
+            "total",
+            "message",
+            "started_at",
+            "finished_at",
+        ) + COUNTERS
+        values = cache.get_many([self.key(field) for field in fields])
+        data = {field: values.get(self.key(field)) for field in fields}
+        if data["state"] is None:
+            return None
+
+        for field in ("total",) + COUNTERS:
+            data[field] = data[field] or 0
+        processed = data["sent"] + data["failed"] + data["skipped"]
+        data["remaining"] = max(data["total"] - processed, 0)
+
+        started_at = data["started_at"]
+        elapsed = (
+            ((data["finished_at"] or time.time()) - started_at) if started_at else 0
+        )
+        data["rate"] = round(processed / elapsed, 2) if elapsed > 0 else 0.0
+        data["percent"] = (
+            round(processed * 100 / data["total"], 1) if data["total"] else 0.0
+        )
+        return data
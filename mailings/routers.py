@@ -0,0 +1,52 @@
+"""
+Маршрутизация запросов между основной базой и репликой.
+
+Чтение уходит на реплику только внутри безопасных HTTP-запросов (GET, HEAD,
+OPTIONS), которые разрешает ``mailings.middleware.ReplicaRoutingMiddleware``.
+Все остальное — запись, отправка рассылок в фоне, команды управления —
+работает с основной базой. После первой записи в рамках запроса чтение
+тоже переключается на основную базу, чтобы видеть только что записанное.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = "replica"
+
+_replica_allowed = ContextVar("replica_allowed", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Разрешение (или запрет) чтения с реплики в пределах блока"""
+    token = _replica_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_allowed.get() and replica_configured():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes: после записи читаем из основной базы
+        _replica_allowed.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,85 @@
+"""
+Индексируемый поиск по клиентам и сообщениям.
+
+На PostgreSQL короткие поля ищутся подстрокой (``icontains``), которую
+обслуживают GIN-индексы pg_trgm по ``UPPER(поле::text)``, а длинные тексты —
+полнотекстовым поиском по GIN-индексу ``to_tsvector``. Запросы короче трех
+символов ищутся по началу строки, так как триграммы для них не работают.
+На остальных СУБД (SQLite в тестах) используется обычный LIKE.
+"""
+
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_CONFIG = "russian"
+MIN_TRIGRAM_LENGTH = 3
+
+
+def is_indexed():
+    return connection.vendor == "postgresql"
+
+
+def fulltext_vector(field):
+    """Выражение, совпадающее с выражением GIN-индекса полнотекстового поиска"""
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector(field, config=SEARCH_CONFIG)
+
+
+def apply_search(queryset, term, fields, text_fields=()):
+    """
+    Фильтр по строке поиска.
+
+    ``fields`` — короткие поля (email, имя, тема), ``text_fields`` — длинные
+    тексты (комментарий, тело письма).
+    """
+    term = (term or "").strip()
+    if not term:
+        return queryset
+
+    if len(term) < MIN_TRIGRAM_LENGTH:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f"{field}__istartswith": term})
+        return queryset.filter(condition)
+
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": term})
+
+    if not is_indexed():
+        for field in text_fields:
+            condition |= Q(**{f"{field}__icontains": term})
+        return queryset.filter(condition)
+
+    from django.contrib.postgres.search import SearchQuery
+
+    query = SearchQuery(term, config=SEARCH_CONFIG)
+    aliases = {f"{field}_vector": fulltext_vector(field) for field in text_fields}
+    for alias in aliases:
+        condition |= Q(**{alias: query})
+    return queryset.alias(**aliases).filter(condition)
+
+
+def filter_text(queryset, field, words):
+    """
+    Строки, в длинном тексте которых встречаются все слова ``words``.
+
+    На PostgreSQL используется тот же GIN-индекс ``to_tsvector``, что и в
+    ``apply_search``, на остальных СУБД — LIKE по каждому слову.
+    """
+    words = [word for word in words if word]
+    if not words:
+        return queryset
+
+    if not is_indexed():
+        for word in words:
+            queryset = queryset.filter(**{f"{field}__icontains": word})
+        return queryset
+
+    from django.contrib.postgres.search import SearchQuery
+
+    # plainto_tsquery объединяет слова через «И»
+    query = SearchQuery(" ".join(words), config=SEARCH_CONFIG)
+    alias = f"{field}_vector"
+    return queryset.alias(**{alias: fulltext_vector(field)}).filter(**{alias: query})
@@ -0,0 +1,70 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from mailings import counters
+from mailings.cache import GLOBAL_SCOPE, bump_version, user_scope
+from mailings.models import Client, Mailing, Message, Segment
+
+
+def _bump(owner_id, global_stats=False):
+    if global_stats:
+        bump_version(GLOBAL_SCOPE)
+    if owner_id:
+        bump_version(user_scope(owner_id))
+
+
+@receiver(post_save, sender=Mailing)
+def count_saved_mailing(sender, instance, created, **kwargs):
+    """Учет общего числа рассылок и смены статуса «Запущена»"""
+    if created:
+        counters.increment(counters.TOTAL_MAILINGS)
+
+    new_status = instance.status
+    old_status = None if created else getattr(instance, "_loaded_status", new_status)
+    counters.increment(
+        counters.ACTIVE_MAILINGS,
+        (new_status == "started") - (old_status == "started"),
+    )
+    instance._loaded_status = new_status
+
+
+@receiver(post_delete, sender=Mailing)
+def count_deleted_mailing(sender, instance, **kwargs):
+    counters.increment(counters.TOTAL_MAILINGS, -1)
+    if getattr(instance, "_loaded_status", instance.status) == "started":
+        counters.increment(counters.ACTIVE_MAILINGS, -1)
+
+
+@receiver(post_save, sender=Client)
+def count_saved_client(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(counters.TOTAL_CLIENTS)
+
+
+@receiver(post_delete, sender=Client)
+def count_deleted_client(sender, instance, **kwargs):
+    counters.increment(counters.TOTAL_CLIENTS, -1)
+
+
+@receiver(post_save, sender=Mailing)
+@receiver(post_delete, sender=Mailing)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_owner_and_stats(sender, instance, **kwargs):
+    """Рассылки и клиенты входят и в общую статистику, и в данные владельца"""
+    _bump(instance.owner_id, global_stats=True)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+@receiver(post_save, sender=Segment)
+@receiver(post_delete, sender=Segment)
+def invalidate_owner(sender, instance, **kwargs):
+    _bump(instance.owner_id)
+
+
+@receiver(m2m_changed, sender=Mailing.recipients.through)
+def invalidate_recipients_owner(sender, instance, action, **kwargs):
+    # instance — рассылка или клиент (client.mailing_set.add), оба с владельцем
+    if action.startswith("post_"):
+        _bump(instance.owner_id)
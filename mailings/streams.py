@@ -0,0 +1,95 @@
+"""
+Поток SSE с ходом отправки рассылки (работает под ASGI, ``config/asgi.py``).
+
+На каждую рассылку в процессе запускается одна задача, которая раз в
+``POLL_INTERVAL`` читает прогресс и новые события из кеша и раздает их
+всем подписанным зрителям. Стоимость опроса не зависит от количества
+зрителей, к базе задача не обращается.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from mailings.progress import ACTIVE_STATES, MailingProgress
+
+POLL_INTERVAL = 1.0
+KEEPALIVE_INTERVAL = 15.0
+QUEUE_SIZE = 100
+
+
+class ProgressBroadcaster:
+    """Рассылка обновлений прогресса подписчикам одного процесса"""
+
+    def __init__(self, mailing_id):
+        self.progress = MailingProgress(mailing_id)
+        self.subscribers = set()
+        self.task = None
+        self.last_payload = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.last_payload is not None:
+            queue.put_nowait(self.last_payload)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def _read(self, seq):
+        snapshot = self.progress.snapshot()
+        seq, events = self.progress.events_since(seq)
+        return seq, snapshot, events
+
+    async def _run(self):
+        seq = await sync_to_async(self.progress.last_seq)()
+        # Начальное состояние без истории событий
+        seq = max(seq - 10, 0)
+        while self.subscribers:
+            seq, snapshot, events = await sync_to_async(self._read)(seq)
+            if snapshot is not None:
+                snapshot.pop("owner_id", None)
+            if events or snapshot != (self.last_payload or {}).get("progress"):
+                payload = {"progress": snapshot, "events": events}
+                self.last_payload = payload
+                for queue in list(self.subscribers):
+                    try:
+                        queue.put_nowait(payload)
+                    except asyncio.QueueFull:
+                        # Медленный клиент пропускает промежуточные обновления
+                        pass
+            active = snapshot is not None and snapshot["state"] in ACTIVE_STATES
+            await asyncio.sleep(POLL_INTERVAL if active else POLL_INTERVAL * 5)
+        _broadcasters.pop(self.progress.mailing_id, None)
+
+
+_broadcasters = {}
+
+
+def get_broadcaster(mailing_id):
+    broadcaster = _broadcasters.get(mailing_id)
+    if broadcaster is None:
+        broadcaster = _broadcasters[mailing_id] = ProgressBroadcaster(mailing_id)
+    return broadcaster
+
+
+async def event_stream(mailing_id):
+    """Строки SSE для одного зрителя"""
+    broadcaster = get_broadcaster(mailing_id)
+    queue = broadcaster.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            data = json.dumps(payload, ensure_ascii=False)
+            yield f"event: progress\ndata: {data}\n\n"
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,144 @@
+"""
+Список исключенных адресов (недоставленные, жалобы, отписки).
+
+Чтобы не делать запрос к базе на каждого получателя, в каждом процессе
+держится фильтр Блума по всем исключенным адресам. Фильтр не дает ложных
+отрицательных ответов, поэтому к базе обращаемся только при возможном
+совпадении. Новые адреса догружаются инкрементально по ``id``, удаленные
+остаются в фильтре до полной пересборки и отсекаются проверкой в базе.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+
+ERROR_RATE = 0.001
+MIN_CAPACITY = 10000
+REFRESH_INTERVAL = 60  # секунды
+
+
+class BloomFilter:
+    """Фильтр Блума на ``bytearray`` с двойным хешированием"""
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(
+            8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    @property
+    def is_full(self):
+        return self.count > self.capacity
+
+
+class SuppressionFilter:
+    """Фильтр исключенных адресов процесса с подгрузкой новых записей"""
+
+    def __init__(self, refresh_interval=None):
+        if refresh_interval is None:
+            refresh_interval = getattr(
+                settings, "SUPPRESSION_REFRESH_INTERVAL", REFRESH_INTERVAL
+            )
+        self.refresh_interval = refresh_interval
+        self.bloom = None
+        self.last_id = 0
+        self.refreshed_at = 0.0
+        self.lock = threading.Lock()
+
+    def _load(self, bloom, after_id):
+        from mailings.models import Suppression
+
+        rows = (
+            Suppression.objects.filter(id__gt=after_id)
+            .order_by("id")
+            .values_list("id", "email")
+        )
+        last_id = after_id
+        for last_id, email in rows.iterator(chunk_size=5000):
+            bloom.add(email)
+        return last_id
+
+    def rebuild(self):
+        from mailings.models import Suppression
+
+        # Запас по емкости, чтобы инкрементальные добавления не
+        # ухудшали долю ложных срабатываний до следующей пересборки
+        capacity = max(MIN_CAPACITY, Suppression.objects.count() * 2)
+        bloom = BloomFilter(capacity)
+        last_id = self._load(bloom, 0)
+        self.bloom, self.last_id = bloom, last_id
+        self.refreshed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Догрузка адресов, добавленных с прошлого обновления"""
+        if (
+            not force
+            and self.bloom is not None
+            and time.monotonic() - self.refreshed_at < self.refresh_interval
+        ):
+            return
+        with self.lock:
+            if self.bloom is None or self.bloom.is_full:
+                self.rebuild()
+                return
+            self.last_id = self._load(self.bloom, self.last_id)
+            if self.bloom.is_full:
+                self.rebuild()
+            self.refreshed_at = time.monotonic()
+
+    def might_contain(self, email):
+        return email in self.bloom
+
+    def is_suppressed(self, email):
+        """Точная проверка: база читается только при совпадении в фильтре"""
+        from mailings.models import Client, Suppression
+
+        email = Client.normalize_email(email)
+        if not self.might_contain(email):
+            return False
+        return Suppression.objects.filter(email=email).exists()
+
+    def add(self, email, reason, comment=""):
+        """Добавление адреса в список и сразу в фильтр процесса"""
+        from mailings.models import Client, Suppression
+
+        email = Client.normalize_email(email)
+        Suppression.objects.get_or_create(
+            email=email, defaults={"reason": reason, "comment": comment}
+        )
+        if self.bloom is not None:
+            self.bloom.add(email)
+
+
+_filter = SuppressionFilter()
+
+
+def get_filter():
+    """Фильтр текущего процесса, обновленный не реже ``REFRESH_INTERVAL``"""
+    _filter.refresh()
+    return _filter
@@ -0,0 +1,125 @@
+"""
+Фоновая отправка рассылок.
+
+Рассылка отправляется в пуле потоков процесса, HTTP-запрос только ставит ее
+в очередь и сразу возвращает ответ. Ход отправки пишется в
+``mailings.progress``.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from mailings.circuit import (
+    HALF_OPEN,
+    OPEN,
+    PROBE_TIMEOUT,
+    SMTPCircuitBreaker,
+    connection_host,
+)
+from mailings.progress import DEFERRED, DONE, ERROR, MailingProgress
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "MAILING_SEND_WORKERS", 2),
+            thread_name_prefix="mailing-send",
+        )
+    return _executor
+
+
+def run_mailing(mailing_id, token):
+    """
+    Отправка рассылки, поставленной в очередь ``MailingProgress.queue``.
+
+    Вызывается в фоновом потоке, а командой ``send_mailings`` — синхронно.
+    Возвращает ``(успех, сообщение)``.
+    """
+    from mailings.models import Mailing
+
+    progress = MailingProgress(mailing_id, token)
+    close_old_connections()
+    try:
+        if not progress.acquire():
+            # Пока задание ждало в очереди, блокировка истекла
+            # и рассылку запустил кто-то другой
+            return False, "Рассылка уже отправляется"
+        mailing = Mailing.objects.select_related("message", "segment").get(
+            pk=mailing_id
+        )
+        success, message = mailing.send_mailing(progress=progress)
+        if mailing.resume_after_id is not None:
+            progress.finish(message, DEFERRED)
+            schedule_resume(mailing)
+        else:
+            progress.finish(message, DONE if success else ERROR)
+        return success, message
+    except Exception as e:
+        logger.exception("Ошибка фоновой отправки рассылки #%s", mailing_id)
+        progress.finish(f"Ошибка: {e}", ERROR)
+        return False, f"Ошибка: {e}"
+    finally:
+        # У потока пула свое соединение с базой, закрываем его сами
+        close_old_connections()
+
+
+def schedule_resume(mailing):
+    """
+    Повторная постановка отложенной рассылки, когда выключатель SMTP
+    перейдет в полуоткрытое состояние.
+
+    Таймер живет в памяти процесса; если процесс перезапустится раньше,
+    рассылку продолжит следующий запуск ``send_mailings``.
+    """
+    from django.core.mail import get_connection
+
+    breaker = SMTPCircuitBreaker(connection_host(get_connection()))
+    state = breaker.state()
+    if state == OPEN:
+        delay = breaker.retry_in() + 1
+    elif state == HALF_OPEN:
+        # Пробное письмо отправляет другой процесс: ждем его результата,
+        # а не переставляем рассылку в очередь каждую секунду
+        delay = PROBE_TIMEOUT
+    else:
+        delay = 1
+    timer = threading.Timer(delay, resume_mailing, [mailing.pk])
+    timer.daemon = True
+    timer.start()
+
+
+def resume_mailing(mailing_id):
+    from mailings.models import Mailing
+
+    close_old_connections()
+    try:
+        mailing = Mailing.objects.only("id", "owner_id").get(pk=mailing_id)
+        enqueue_mailing(mailing)
+    except Mailing.DoesNotExist:
+        pass
+    finally:
+        close_old_connections()
+
+
+def enqueue_mailing(mailing):
+    """
+    Постановка рассылки в очередь отправки.
+
+    Возвращает ``False``, если рассылка уже в очереди или отправляется.
+    """
+    progress = MailingProgress(mailing.pk)
+    if not progress.queue(mailing.owner_id):
+        return False
+    transaction.on_commit(
+        lambda: get_executor().submit(run_mailing, mailing.pk, progress.token)
+    )
+    return True
@@ -1,3 +1,1763 @@
-from django.test import TestCase
+import base64
+import contextlib
+import datetime
+import io
+import json
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from mailings import (
+    attachments,
+    cache as versioned_cache,
+    cache_backends,
+    circuit,
+    counters,
+    importers,
+    models,
+    partitions,
+    progress,
+    routers,
+    search,
+    streams,
+    suppression,
+    tasks,
+)
+from mailings.models import (
+    Client,
+    Mailing,
+    MailingAttempt,
+    Message,
+    Segment,
+    StatCounter,
+    Suppression,
+)
+from mailings.middleware import PRIMARY_PIN_COOKIE, ReplicaRoutingMiddleware
+from mailings.pagination import (
+    ApproximatePaginator,
+    KeysetPaginator,
+    approximate_count,
+    decode_cursor,
+    encode_cursor,
+)
+from mailings.search import apply_search
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Данные создаются в состоянии ``migrate_from``, проверка после ``migrate_to``"""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        self.apps = executor.loader.project_state([self.migrate_from]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_to])
+        return executor.loader.project_state([self.migrate_to]).apps
+
+
+class MergeDuplicateClientEmailsTest(MigrationTestCase):
+    migrate_from = ("mailings", "0005_statcounter")
+    migrate_to = ("mailings", "0006_merge_duplicate_client_emails")
+
+    def create_user(self, email):
+        User = self.apps.get_model("users", "User")
+        return User.objects.create(email=email, password="!")
+
+    def create_mailing(self, owner, clients):
+        Message = self.apps.get_model("mailings", "Message")
+        Mailing = self.apps.get_model("mailings", "Mailing")
+        message = Message.objects.create(subject="Тема", body="Текст", owner=owner)
+        mailing = Mailing.objects.create(
+            start_time="2026-01-01T00:00:00Z",
+            end_time="2026-01-02T00:00:00Z",
+            message=message,
+            owner=owner,
+        )
+        mailing.recipients.set(clients)
+        return mailing
+
+    def test_merges_duplicates_of_same_owner(self):
+        Client = self.apps.get_model("mailings", "Client")
+        owner = self.create_user("owner@example.com")
+        other = self.create_user("other@example.com")
+        kept = Client.objects.create(email="Foo@x.com", full_name="A", owner=owner)
+        duplicate = Client.objects.create(
+            email=" foo@x.com ", full_name="B", owner=owner
+        )
+        unrelated = Client.objects.create(email="Bar@x.com", full_name="C", owner=other)
+        both = self.create_mailing(owner, [kept, duplicate])
+        only_duplicate = self.create_mailing(owner, [duplicate])
+
+        apps = self.migrate()
+
+        Client = apps.get_model("mailings", "Client")
+        Mailing = apps.get_model("mailings", "Mailing")
+        self.assertEqual(
+            sorted(Client.objects.values_list("pk", "email", "owner_id")),
+            [(kept.pk, "foo@x.com", owner.pk), (unrelated.pk, "bar@x.com", other.pk)],
+        )
+        for mailing in (both, only_duplicate):
+            self.assertEqual(
+                list(
+                    Mailing.objects.get(pk=mailing.pk).recipients.values_list(
+                        "pk", flat=True
+                    )
+                ),
+                [kept.pk],
+            )
+
+    def test_stops_on_conflicts_between_owners(self):
+        Client = self.apps.get_model("mailings", "Client")
+        first = self.create_user("first@example.com")
+        second = self.create_user("second@example.com")
+        first_client = Client.objects.create(email="Foo@x.com", owner=first)
+        second_client = Client.objects.create(email="foo@x.com ", owner=second)
+        mailing = self.create_mailing(second, [second_client])
+
+        with self.assertRaisesMessage(RuntimeError, "«foo@x.com » (владелец"):
+            self.migrate()
+
+        # Ничего не объединено и не перенесено между владельцами
+        self.assertEqual(
+            sorted(Client.objects.values_list("pk", "email", "owner_id")),
+            [
+                (first_client.pk, "Foo@x.com", first.pk),
+                (second_client.pk, "foo@x.com ", second.pk),
+            ],
+        )
+        self.assertEqual(
+            list(mailing.recipients.values_list("pk", flat=True)),
+            [second_client.pk],
+        )
+        # Без конфликта tearDown сможет применить оставшиеся миграции
+        Client.objects.filter(pk=first_client.pk).delete()
+
+
+class FlakySMTPBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который отказывает в соединении, пока ``down``"""
+
+    host = "smtp.test"
+    port = 25
+    down = False
+    sent = []
+
+    def send_messages(self, messages):
+        if self.down:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        FlakySMTPBackend.sent.extend(message.to[0] for message in messages)
+        return len(messages)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, SMTP_BREAKER_THRESHOLD=3, SMTP_BREAKER_OPEN_SECONDS=60
+)
+class SMTPCircuitBreakerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = circuit.SMTPCircuitBreaker("smtp.test:25")
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(circuit.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_breaker(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), circuit.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), circuit.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_in(), 60)
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), circuit.CLOSED)
+
+    def test_half_open_allows_single_probe_then_closes(self):
+        self.open_breaker()
+        self.now += 61
+        self.assertEqual(self.breaker.state(), circuit.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        # Пока идет пробное письмо, остальные ждут
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(circuit.SMTPCircuitBreaker("smtp.test:25").allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state(), circuit.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.open_breaker()
+        self.now += 61
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), circuit.OPEN)
+        self.assertEqual(self.breaker.retry_in(), 60)
+
+    def test_recipient_refusal_is_not_host_failure(self):
+        refused = smtplib.SMTPRecipientsRefused({"a@x.com": (550, b"unknown")})
+        self.assertFalse(circuit.is_host_failure(refused))
+        self.assertTrue(circuit.is_host_failure(ConnectionRefusedError()))
+        self.assertTrue(
+            circuit.is_host_failure(smtplib.SMTPResponseException(421, b"later"))
+        )
+        self.assertFalse(
+            circuit.is_host_failure(smtplib.SMTPResponseException(554, b"spam"))
+        )
+
+    @mock.patch.object(tasks.threading, "Timer")
+    def test_resume_waits_for_probe_of_another_process(self, timer):
+        mailing = mock.Mock(pk=1)
+        with override_settings(EMAIL_BACKEND="mailings.tests.FlakySMTPBackend"):
+            self.open_breaker()
+            tasks.schedule_resume(mailing)
+            self.assertEqual(timer.call_args.args[0], 61)
+
+            self.now += 61
+            # Пробное письмо уже отправляет другой процесс
+            self.assertTrue(self.breaker.allow())
+            tasks.schedule_resume(mailing)
+            self.assertEqual(timer.call_args.args[0], circuit.PROBE_TIMEOUT)
+
+
+def create_started_mailing(owner, clients_count):
+    """Запущенная рассылка с ``clients_count`` новыми клиентами владельца"""
+    message = Message.objects.create(subject="Тема", body="Текст", owner=owner)
+    now = timezone.now()
+    mailing = Mailing(
+        start_time=now - datetime.timedelta(hours=1),
+        end_time=now + datetime.timedelta(hours=1),
+        message=message,
+        owner=owner,
+        status="started",
+    )
+    mailing.save(skip_validation=True)
+    first = Client.objects.count()
+    Client.objects.bulk_create(
+        Client(email=f"client{number}@example.com", full_name="Клиент", owner=owner)
+        for number in range(first, first + clients_count)
+    )
+    # bulk_create без сигналов, счетчик обновляется как при импорте
+    counters.increment(counters.TOTAL_CLIENTS, clients_count)
+    mailing.recipients.set(Client.objects.filter(owner=owner))
+    return mailing
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    EMAIL_BACKEND="mailings.tests.FlakySMTPBackend",
+    SMTP_BREAKER_THRESHOLD=3,
+    SMTP_BREAKER_OPEN_SECONDS=60,
+)
+class DeferredMailingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.mailing = create_started_mailing(owner, 10)
+        self.clients = list(Client.objects.filter(owner=owner).order_by("id"))
+
+    def test_defers_and_resumes_after_last_attempted_recipient(self):
+        FlakySMTPBackend.down = True
+        success, message = self.mailing.send_mailing()
+
+        self.assertTrue(success)
+        self.assertIn("отложена", message)
+        # Три ошибки подряд открыли выключатель, остальным не отправляли
+        self.assertEqual(self.mailing.attempts.count(), 3)
+        self.assertEqual(self.mailing.resume_after_id, self.clients[2].pk)
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.resume_after_id, self.clients[2].pk)
+
+        # Пока выключатель открыт, повторный запуск ничего не отправляет
+        FlakySMTPBackend.down = False
+        self.mailing.send_mailing()
+        self.assertEqual(FlakySMTPBackend.sent, [])
+        self.assertEqual(self.mailing.resume_after_id, self.clients[2].pk)
+
+        breaker = circuit.SMTPCircuitBreaker("smtp.test:25")
+        opened_until = cache.get(breaker.key("opened_until"))
+        with mock.patch.object(circuit.time, "time", return_value=opened_until + 1):
+            success, message = self.mailing.send_mailing()
+
+        self.assertEqual(message, "Отправлено: 7, ошибок: 0")
+        self.assertEqual(
+            FlakySMTPBackend.sent, [client.email for client in self.clients[3:]]
+        )
+        self.assertIsNone(self.mailing.resume_after_id)
+        self.assertEqual(breaker.state(), circuit.CLOSED)
+
+
+def raw_cursor(payload):
+    """Курсор с произвольным содержимым, как его может прислать клиент"""
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode())
+    return encoded.decode().rstrip("=")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        message = Message.objects.create(subject="Тема", body="Текст", owner=cls.owner)
+        now = timezone.now()
+        mailing = Mailing(
+            start_time=now,
+            end_time=now + datetime.timedelta(hours=1),
+            message=message,
+            owner=cls.owner,
+        )
+        mailing.save(skip_validation=True)
+        MailingAttempt.objects.bulk_create(
+            MailingAttempt(mailing=mailing, status="success") for _ in range(7)
+        )
+        # Две пары попыток с одинаковым временем: порядок задает id
+        for number, attempt in enumerate(MailingAttempt.objects.order_by("id")):
+            attempt.attempt_time = now - datetime.timedelta(minutes=number // 2)
+            attempt.save(update_fields=["attempt_time"])
+        cls.expected = list(
+            MailingAttempt.objects.order_by("-attempt_time", "-id").values_list(
+                "pk", flat=True
+            )
+        )
+
+    def paginator(self):
+        return KeysetPaginator(
+            MailingAttempt.objects.all(), ("-attempt_time", "-id"), per_page=3
+        )
+
+    def ids(self, page):
+        return [attempt.pk for attempt in page]
+
+    def test_walks_forward_and_back(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        self.assertEqual(self.ids(first), self.expected[:3])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(self.ids(second), self.expected[3:6])
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(self.ids(third), self.expected[6:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.expected[3:6])
+        self.assertEqual(
+            self.ids(paginator.page(back.previous_cursor)), self.expected[:3]
+        )
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(["2026-01-01 00:00:00+00:00", 5], "next")
+        self.assertEqual(
+            decode_cursor(cursor), ("next", ["2026-01-01 00:00:00+00:00", 5])
+        )
+        self.assertIsNone(decode_cursor("не base64"))
+        self.assertIsNone(decode_cursor(raw_cursor(["sideways", [1, 2]])))
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        paginator = self.paginator()
+        for payload in (
+            ["next", [123, 1]],
+            ["next", [None, 1]],
+            ["next", ["2026-01-01T00:00:00Z"]],
+            ["next", ["2026-01-01T00:00:00Z", 1, 2]],
+            ["next", ["не дата", 1]],
+            ["next", [{"a": 1}, [1]]],
+        ):
+            with self.subTest(payload=payload):
+                page = paginator.page(raw_cursor(payload))
+                self.assertEqual(self.ids(page), self.expected[:3])
+                self.assertFalse(page.has_previous())
+
+    def test_attempt_list_ignores_malformed_cursor(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse("mailings:attempt_list"),
+            {"cursor": raw_cursor(["next", [None, 1]]), "format": "json"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["id"] for row in response.json()["results"]], self.expected
+        )
+
+
+class FakePostgresConnection:
+    """Соединение, которое отвечает на EXPLAIN заданной оценкой строк"""
+
+    vendor = "postgresql"
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.executed = []
+
+    @contextlib.contextmanager
+    def cursor(self):
+        cursor = mock.Mock()
+        cursor.execute.side_effect = lambda sql, params: self.executed.append(sql)
+        cursor.fetchone.return_value = [
+            json.dumps([{"Plan": {"Plan Rows": self.estimate}}])
+        ]
+        yield cursor
+
+
+class ApproximatePaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        Client.objects.bulk_create(
+            Client(email=f"client{number}@example.com", owner=cls.owner)
+            for number in range(5)
+        )
+
+    def setUp(self):
+        self.queryset = Client.objects.order_by("email")
+
+    def test_exact_count_below_limit(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(approximate_count(self.queryset, limit=10), (5, True))
+        self.assertEqual(len(queries), 1)
+        # Подсчет ограничен limit + 1 строкой, ORDER BY отброшен
+        self.assertIn("LIMIT 11", queries[0]["sql"])
+        self.assertNotIn("ORDER BY", queries[0]["sql"])
+
+    def test_limit_without_planner_estimate(self):
+        self.assertEqual(approximate_count(self.queryset, limit=3), (3, False))
+
+    def test_planner_estimate_on_postgresql(self):
+        fake = FakePostgresConnection(estimate=120000)
+        with mock.patch("mailings.pagination.connections", {self.queryset.db: fake}):
+            self.assertEqual(approximate_count(self.queryset, limit=3), (120000, False))
+            # Оценка меньше limit не уменьшает уже посчитанное
+            fake.estimate = 1
+            self.assertEqual(approximate_count(self.queryset, limit=3), (3, False))
+        self.assertTrue(fake.executed[0].startswith("EXPLAIN (FORMAT JSON) SELECT"))
+
+    def test_paginator_uses_approximate_count(self):
+        paginator = ApproximatePaginator(self.queryset, 2)
+        self.assertEqual((paginator.count, paginator.num_pages), (5, 3))
+        self.assertEqual(
+            [client.email for client in paginator.page(3)], ["client4@example.com"]
+        )
+
+        with mock.patch(
+            "mailings.pagination.approximate_count", return_value=(4, False)
+        ):
+            paginator = ApproximatePaginator(self.queryset, 2)
+            self.assertEqual((paginator.count, paginator.num_pages), (4, 2))
+            self.assertEqual(len(paginator.page(2)), 2)
+
+    def test_admin_changelist(self):
+        admin_user = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="x"
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(
+            reverse("admin:mailings_client_changelist"), {"q": "client1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        changelist = response.context["cl"]
+        self.assertIsInstance(changelist.paginator, ApproximatePaginator)
+        self.assertEqual(changelist.result_count, 1)
+        self.assertContains(response, "client1@example.com")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClientListPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user(email="owner@example.com", password="x")
+        other = User.objects.create_user(email="other@example.com", password="x")
+        Client.objects.bulk_create(
+            Client(email=f"client{number}@example.com", owner=cls.owner)
+            for number in range(5)
+        )
+        Client.objects.create(email="client0@other.com", owner=other)
+        Message.objects.create(subject="Акция", body="Скидки", owner=cls.owner)
+        Message.objects.create(subject="Новости", body="Акция", owner=cls.owner)
+        Message.objects.create(subject="Отчет", body="Итоги", owner=cls.owner)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def get_json(self, name, **params):
+        response = self.client.get(reverse(name), {"format": "json", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_client_list_follows_cursors(self):
+        emails = []
+        params = {"limit": 2}
+        while True:
+            data = self.get_json("mailings:client_list", **params)
+            emails += [row["email"] for row in data["results"]]
+            if not data["next_cursor"]:
+                break
+            params["cursor"] = data["next_cursor"]
+
+        self.assertEqual(emails, [f"client{number}@example.com" for number in range(5)])
+        # С последней страницы можно вернуться назад
+        data = self.get_json(
+            "mailings:client_list", limit=2, cursor=data["previous_cursor"]
+        )
+        self.assertEqual(
+            [row["email"] for row in data["results"]],
+            ["client2@example.com", "client3@example.com"],
+        )
+
+    def test_message_list_searches_subject_and_body(self):
+        data = self.get_json("mailings:message_list", q="Акция")
+        self.assertEqual(
+            sorted(row["subject"] for row in data["results"]), ["Акция", "Новости"]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MailingListPagesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.first = create_started_mailing(self.owner, 3)
+        self.second = create_started_mailing(self.owner, 2)
+        self.client.force_login(self.owner)
+
+    def get_json(self, name, **params):
+        response = self.client.get(reverse(name), {"format": "json", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_mailing_list_pages_with_counts(self):
+        data = self.get_json("mailings:mailing_list", limit=1)
+        self.assertEqual(
+            data["results"],
+            [{"id": self.second.pk, "status": "started", "recipients_count": 5}],
+        )
+        data = self.get_json(
+            "mailings:mailing_list", limit=1, cursor=data["next_cursor"]
+        )
+        self.assertEqual(data["results"][0]["recipients_count"], 3)
+        self.assertIsNone(data["next_cursor"])
+
+        response = self.client.get(reverse("mailings:mailing_list"), {"limit": 1})
+        self.assertContains(response, "Вперед ›")
+
+    def test_report_counts_page_and_refreshes_statuses(self):
+        MailingAttempt.objects.create(
+            mailing=self.first, status="success", server_response="250 OK"
+        )
+        MailingAttempt.objects.create(
+            mailing=self.first, status="failed", server_response="550"
+        )
+        # Статус устарел: UPDATE без сигналов, как после смены периода
+        Mailing.objects.filter(pk=self.first.pk).update(status="created")
+
+        data = self.get_json("mailings:report", limit=1, cursor="")
+        self.assertEqual(data["results"][0]["id"], self.second.pk)
+        data = self.get_json("mailings:report", limit=1, cursor=data["next_cursor"])
+        self.assertEqual(
+            data["results"],
+            [
+                {
+                    "id": self.first.pk,
+                    "status": "started",
+                    "recipients_count": 3,
+                    "success_count": 1,
+                    "fail_count": 1,
+                }
+            ],
+        )
+
+        response = self.client.get(reverse("mailings:report"))
+        self.assertEqual(response.context["total_mailings"], 2)
+        self.assertEqual(response.context["active_mailings"], 2)
+        self.assertEqual(
+            (response.context["success_attempts"], response.context["failed_attempts"]),
+            (1, 1),
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.mailing = create_started_mailing(self.owner, 2)
+        self.client.force_login(self.owner)
+
+    def validators(self, url):
+        # Первый ответ выдает CSRF-cookie, а она входит в ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        return response["ETag"], response["Last-Modified"]
+
+    def test_list_answers_304_until_data_changes(self):
+        url = reverse("mailings:client_list")
+        etag, modified = self.validators(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304
+        )
+
+        Client.objects.create(
+            email="new@example.com", full_name="Новый", owner=self.owner
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "new@example.com")
+
+    def test_other_user_does_not_get_304(self):
+        url = reverse("mailings:mailing_list")
+        etag, _ = self.validators(url)
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="x"
+        )
+        self.client.force_login(other)
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_mailing_detail_with_stale_status_is_rebuilt(self):
+        url = reverse("mailings:mailing_detail", args=[self.mailing.pk])
+        etag, _ = self.validators(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Mailing.objects.filter(pk=self.mailing.pk).update(status="created")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.status, "started")
+
+    def test_pending_flash_message_disables_304(self):
+        url = reverse("mailings:mailing_list")
+        etag, _ = self.validators(url)
+        with mock.patch(
+            "mailings.conditional.messages.get_messages",
+            return_value=["Рассылка успешно создана!"],
+        ):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheGenerationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.scope = versioned_cache.user_scope(self.owner.pk)
+
+    def versions(self):
+        return (
+            versioned_cache.get_version(versioned_cache.GLOBAL_SCOPE),
+            versioned_cache.get_version(self.scope),
+        )
+
+    def test_signals_bump_owner_and_global_scopes(self):
+        global_version, user_version = self.versions()
+
+        Message.objects.create(subject="Тема", body="Текст", owner=self.owner)
+        self.assertEqual(self.versions()[0], global_version)
+        self.assertNotEqual(self.versions()[1], user_version)
+
+        global_version, user_version = self.versions()
+        Client.objects.create(email="client@example.com", owner=self.owner)
+        new_global, new_user = self.versions()
+        self.assertNotEqual(new_global, global_version)
+        self.assertNotEqual(new_user, user_version)
+
+    def test_bump_owners_skips_empty_owner(self):
+        global_version, user_version = self.versions()
+        versioned_cache.bump_owners([None])
+        self.assertEqual(self.versions(), (global_version, user_version))
+
+        versioned_cache.bump_owners([self.owner.pk, self.owner.pk])
+        self.assertEqual(self.versions()[0], global_version)
+        self.assertEqual(self.versions()[1], user_version + 1)
+
+    @override_settings(EMAIL_BACKEND="mailings.tests.FlakySMTPBackend")
+    def test_send_bumps_owner_once_per_chunk(self):
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        mailing = create_started_mailing(self.owner, 5)
+
+        with (
+            mock.patch.object(models, "SEND_CHUNK_SIZE", 2),
+            mock.patch.object(models, "bump_owners") as bump,
+        ):
+            mailing.send_mailing()
+
+        self.assertEqual(len(FlakySMTPBackend.sent), 5)
+        # Две полные порции и остаток, а не вызов на каждую попытку
+        self.assertEqual(bump.call_args_list, [mock.call([self.owner.pk])] * 3)
+
+    def test_home_page_shows_new_mailing(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("mailings:home"))
+        self.assertEqual(list(response.context["mailings"]), [])
+        self.assertEqual(response.context["total_mailings"], 0)
+
+        message = Message.objects.create(subject="Тема", body="Текст", owner=self.owner)
+        now = timezone.now()
+        mailing = Mailing(
+            start_time=now,
+            end_time=now + datetime.timedelta(hours=1),
+            message=message,
+            owner=self.owner,
+        )
+        mailing.save(skip_validation=True)
+
+        response = self.client.get(reverse("mailings:home"))
+        self.assertEqual(list(response.context["mailings"]), [mailing])
+        self.assertEqual(response.context["total_mailings"], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+
+    def test_signals_follow_creation_status_and_deletion(self):
+        mailing = create_started_mailing(self.owner, 2)
+        self.assertEqual(
+            counters.get_counters(),
+            {
+                counters.TOTAL_MAILINGS: 1,
+                counters.ACTIVE_MAILINGS: 1,
+                counters.TOTAL_CLIENTS: 2,
+            },
+        )
+
+        mailing.status = "completed"
+        mailing.save(skip_validation=True)
+        self.assertEqual(counters.get_counters()[counters.ACTIVE_MAILINGS], 0)
+
+        mailing = Mailing.objects.get(pk=mailing.pk)
+        mailing.status = "started"
+        mailing.save(skip_validation=True)
+        self.assertEqual(counters.get_counters()[counters.ACTIVE_MAILINGS], 1)
+
+        Mailing.objects.get(pk=mailing.pk).delete()
+        Client.objects.filter(owner=self.owner).first().delete()
+        self.assertEqual(
+            counters.get_counters(),
+            {
+                counters.TOTAL_MAILINGS: 0,
+                counters.ACTIVE_MAILINGS: 0,
+                counters.TOTAL_CLIENTS: 1,
+            },
+        )
+
+    def test_reconcile_fixes_drift(self):
+        create_started_mailing(self.owner, 3)
+        StatCounter.objects.filter(name=counters.TOTAL_CLIENTS).update(value=10)
+
+        self.assertEqual(counters.reconcile(counters.TOTAL_CLIENTS), (10, 3))
+        self.assertEqual(counters.reconcile(counters.TOTAL_CLIENTS), (3, 3))
+
+        StatCounter.objects.all().delete()
+        self.assertEqual(counters.reconcile(counters.TOTAL_MAILINGS), (None, 1))
+
+    def test_reconcile_command_refreshes_statuses(self):
+        mailing = create_started_mailing(self.owner, 1)
+        # Период закончился, но статус еще «Запущена»
+        Mailing.objects.filter(pk=mailing.pk).update(
+            end_time=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        StatCounter.objects.filter(name=counters.TOTAL_MAILINGS).update(value=5)
+
+        out = io.StringIO()
+        call_command("reconcile_counters", stdout=out)
+
+        self.assertIn("Обновлены статусы рассылок: 1", out.getvalue())
+        self.assertIn("total_mailings: 5 -> 1", out.getvalue())
+        self.assertEqual(Mailing.objects.get(pk=mailing.pk).status, "completed")
+        self.assertEqual(
+            counters.get_counters(),
+            {
+                counters.TOTAL_MAILINGS: 1,
+                counters.ACTIVE_MAILINGS: 0,
+                counters.TOTAL_CLIENTS: 1,
+            },
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, EMAIL_BACKEND="mailings.tests.FlakySMTPBackend"
+)
+class MailingTransitionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.started = create_started_mailing(self.owner, 5)
+        now = timezone.now()
+        self.planned = Mailing(
+            start_time=now + datetime.timedelta(days=1),
+            end_time=now + datetime.timedelta(days=2),
+            message=self.started.message,
+            owner=self.owner,
+            status="created",
+        )
+        self.planned.save(skip_validation=True)
+
+    def active(self):
+        return counters.get_counters()[counters.ACTIVE_MAILINGS]
+
+    def test_force_complete_adjusts_active_counter(self):
+        self.assertEqual(self.active(), 1)
+        self.assertEqual(Mailing.objects.force_complete(), 2)
+        self.assertEqual(self.active(), 0)
+        self.assertEqual(
+            set(Mailing.objects.values_list("status", flat=True)), {"completed"}
+        )
+        # Повторно завершать нечего, счетчик не уходит в минус
+        self.assertEqual(Mailing.objects.force_complete(), 0)
+        self.assertEqual(self.active(), 0)
+
+    def test_refresh_statuses_adjusts_active_counter(self):
+        now = timezone.now()
+        # Период первой закончился, второй — начался, статусы устарели
+        Mailing.objects.filter(pk=self.started.pk).update(
+            end_time=now - datetime.timedelta(minutes=1)
+        )
+        Mailing.objects.filter(pk=self.planned.pk).update(
+            start_time=now - datetime.timedelta(minutes=1)
+        )
+        self.assertEqual(self.active(), 1)
+
+        self.assertEqual(Mailing.objects.refresh_statuses(), 2)
+        self.assertEqual(
+            dict(Mailing.objects.values_list("pk", "status")),
+            {self.started.pk: "completed", self.planned.pk: "started"},
+        )
+        self.assertEqual(self.active(), counters.compute(counters.ACTIVE_MAILINGS))
+        self.assertEqual(Mailing.objects.refresh_statuses(), 0)
+        self.assertEqual(self.active(), 1)
+
+    def test_force_complete_stops_send_in_progress(self):
+        mailing = self.started
+        send_messages = FlakySMTPBackend.send_messages
+
+        def send_and_complete(backend, messages):
+            # Администратор завершает рассылку, пока идет отправка
+            Mailing.objects.filter(pk=mailing.pk).force_complete()
+            return send_messages(backend, messages)
+
+        with (
+            mock.patch.object(models, "SEND_CHUNK_SIZE", 2),
+            mock.patch.object(FlakySMTPBackend, "send_messages", send_and_complete),
+        ):
+            success, message = mailing.send_mailing()
+
+        self.assertTrue(success)
+        self.assertIn("Отправка остановлена", message)
+        # Текущая порция дописывается, следующая уже не начинается
+        self.assertEqual(len(FlakySMTPBackend.sent), 2)
+        self.assertIsNone(Mailing.objects.get(pk=mailing.pk).resume_after_id)
+
+    def test_disabled_mailing_is_not_sendable(self):
+        self.assertTrue(self.started._still_sendable())
+        Mailing.objects.filter(pk=self.started.pk).update(is_disabled=True)
+        self.assertFalse(self.started._still_sendable())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeedDataTest(TestCase):
+    options = {
+        "users": 2,
+        "clients_per_user": 6,
+        "messages_per_user": 2,
+        "mailings_per_user": 3,
+        "recipients_per_mailing": 4,
+        "attempts": 40,
+        "days": 90,
+        "anchor": datetime.date(2026, 6, 15),
+        "batch_size": 5,
+    }
+
+    def seed(self, **options):
+        with mock.patch.object(
+            partitions, "ensure_partition", wraps=partitions.ensure_partition
+        ) as ensure_partition:
+            call_command("seed_data", stdout=io.StringIO(), **self.options, **options)
+        return [call.args[0] for call in ensure_partition.call_args_list]
+
+    def test_partitions_created_for_every_seeded_month(self):
+        periods = self.seed()
+        first, last = periods[0], periods[-1]
+        self.assertEqual(
+            periods,
+            [partitions.add_months(first, offset) for offset in range(len(periods))],
+        )
+        times = MailingAttempt.objects.values_list("attempt_time", flat=True)
+        self.assertLessEqual(first, min(times))
+        self.assertLess(max(times), partitions.next_month(last))
+
+    def test_clear_deletes_previous_run_and_reconciles_counters(self):
+        self.seed()
+        self.seed(clear=True)
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(Client.objects.count(), 12)
+        self.assertEqual(Mailing.objects.count(), 6)
+        self.assertEqual(Mailing.recipients.through.objects.count(), 24)
+        self.assertEqual(MailingAttempt.objects.count(), 40)
+        self.assertEqual(
+            counters.get_counters(),
+            {name: counters.compute(name) for name in counters.COUNTERS},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClientImportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(email="owner@example.com", password="x")
+        self.other = User.objects.create_user(email="other@example.com", password="x")
+        Client.objects.create(email="own@x.com", full_name="Старое", owner=self.owner)
+        Client.objects.create(
+            email="foreign@x.com", full_name="Чужой", owner=self.other
+        )
+
+    def run_import(self, text, fmt="csv", **kwargs):
+        rows = importers.iter_rows(io.StringIO(text), fmt)
+        return importers.import_clients(rows, self.owner, batch_size=2, **kwargs)
+
+    def test_skips_duplicates_invalid_and_existing_rows(self):
+        stats = self.run_import(
+            "email,full_name,comment\n"
+            "New@X.com,Новый,\n"
+            "new@x.com ,Повтор,\n"
+            "not-an-email,Ошибка,\n"
+            "own@x.com,Обновленное,\n"
+            "FOREIGN@x.com,Чужой,\n"
+            "second@x.com,,\n"
+            "third@x.com,Третий,VIP\n"
+        )
+
+        self.assertEqual(
+            (stats.total, stats.created, stats.updated, stats.skipped),
+            (7, 2, 0, 2),
+        )
+        self.assertEqual((stats.duplicates, stats.invalid), (1, 2))
+        self.assertEqual(len(stats.errors), 2)
+        self.assertEqual(
+            sorted(
+                Client.objects.filter(owner=self.owner).values_list(
+                    "email", "full_name"
+                )
+            ),
+            [
+                ("new@x.com", "Новый"),
+                ("own@x.com", "Старое"),
+                ("third@x.com", "Третий"),
+            ],
+        )
+        self.assertEqual(counters.get_counters()[counters.TOTAL_CLIENTS], 4)
+
+    def test_updates_own_clients_only(self):
+        stats = self.run_import(
+            '{"email": "own@x.com", "full_name": "Обновленное"}\n'
+            '{"email": "foreign@x.com", "full_name": "Перехват"}\n'
+            "[1, 2]\n",
+            fmt="ndjson",
+            update_existing=True,
+        )
+
+        self.assertEqual((stats.created, stats.updated, stats.skipped), (0, 1, 1))
+        self.assertEqual(stats.invalid, 1)
+        self.assertEqual(Client.objects.get(email="own@x.com").full_name, "Обновленное")
+        self.assertEqual(Client.objects.get(email="foreign@x.com").full_name, "Чужой")
+
+    def test_retries_batch_after_concurrent_insert(self):
+        original = importers._try_write_batch
+        calls = []
+
+        def insert_concurrently(batch, owner, update_existing):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                # Другой процесс добавил адрес после проверки, вставка откатилась
+                Client.objects.create(email="race@x.com", owner=self.other)
+                raise IntegrityError("duplicate key value violates unique constraint")
+            return original(batch, owner, update_existing)
+
+        with mock.patch.object(
+            importers, "_try_write_batch", side_effect=insert_concurrently
+        ):
+            stats = self.run_import("email,full_name\nrace@x.com,Гонка\nok@x.com,Да\n")
+
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual((stats.created, stats.skipped), (1, 1))
+        self.assertEqual(Client.objects.get(email="race@x.com").owner, self.other)
+
+
+class ApplySearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        for email, full_name, comment in (
+            ("ab@x.com", "Anna Brown", ""),
+            ("cab@x.com", "Carl Abbott", "VIP"),
+            ("zed@x.com", "Zed", "ab group"),
+        ):
+            Client.objects.create(
+                email=email, full_name=full_name, comment=comment, owner=owner
+            )
+
+    def emails(self, term, text_fields=Client.SEARCH_TEXT_FIELDS):
+        return sorted(
+            apply_search(
+                Client.objects.all(), term, Client.SEARCH_FIELDS, text_fields
+            ).values_list("email", flat=True)
+        )
+
+    def test_empty_term_returns_everything(self):
+        self.assertEqual(len(self.emails("  ")), 3)
+
+    def test_short_term_matches_start_of_short_fields(self):
+        # Короче трех символов: только начало строки, длинные тексты не ищутся
+        self.assertEqual(self.emails("ab"), ["ab@x.com"])
+        self.assertEqual(self.emails("Ca"), ["cab@x.com"])
+
+    def test_long_term_matches_substring_and_text_fields(self):
+        self.assertEqual(self.emails("abb"), ["cab@x.com"])
+        self.assertEqual(self.emails("ab@"), ["ab@x.com", "cab@x.com"])
+        self.assertEqual(self.emails("group"), ["zed@x.com"])
+        self.assertEqual(self.emails("group", text_fields=()), [])
+
+    def test_indexed_search_uses_fulltext_for_text_fields(self):
+        with mock.patch.object(search, "is_indexed", return_value=True):
+            queryset = apply_search(
+                Client.objects.all(), "group", Client.SEARCH_FIELDS, ("comment",)
+            )
+            sql = str(queryset.query)
+        self.assertIn("to_tsvector", sql)
+        self.assertIn("plainto_tsquery", sql)
+        self.assertNotIn('"comment" LIKE', sql)
+
+    def test_queryset_search_uses_client_fields(self):
+        self.assertEqual(
+            list(Client.objects.search("vip").values_list("email", flat=True)),
+            ["cab@x.com"],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SegmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user(email="owner@example.com", password="x")
+        other = User.objects.create_user(email="other@example.com", password="x")
+        for email, comment in (
+            ("a@mail.ru", "vip moscow"),
+            ("b@mail.ru", "vip"),
+            ("c@yandex.ru", "moscow vip"),
+            ("d@gmail.com", "vip moscow"),
+            ("e@sub.mail.ru", "vip moscow"),
+        ):
+            Client.objects.create(email=email, comment=comment, owner=cls.owner)
+        Client.objects.create(email="x@mail.ru", comment="vip moscow", owner=other)
+
+    def emails(self, queryset):
+        return sorted(queryset.values_list("email", flat=True))
+
+    def test_get_clients_filters_owner_domains_and_tags(self):
+        segment = Segment.objects.create(
+            name="VIP",
+            email_domains="@Mail.ru, yandex.ru",
+            comment_tags="#vip, moscow",
+            owner=self.owner,
+        )
+        self.assertEqual(
+            self.emails(segment.get_clients()), ["a@mail.ru", "c@yandex.ru"]
+        )
+
+        segment.email_domains = ""
+        segment.comment_tags = ""
+        self.assertEqual(len(segment.get_clients()), 5)
+
+    def test_recipients_combine_segment_and_explicit_clients(self):
+        segment = Segment.objects.create(
+            name="Yandex", email_domains="yandex.ru", owner=self.owner
+        )
+        mailing = create_started_mailing(self.owner, 0)
+        mailing.recipients.clear()
+        mailing.segment = segment
+        mailing.save(skip_validation=True)
+        self.assertEqual(self.emails(mailing.get_recipients()), ["c@yandex.ru"])
+
+        explicit = Client.objects.filter(email__in=["a@mail.ru", "c@yandex.ru"])
+        mailing.recipients.set(explicit)
+        self.assertEqual(
+            self.emails(mailing.get_recipients()), ["a@mail.ru", "c@yandex.ru"]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DATA_UPLOAD_MAX_NUMBER_FIELDS=100)
+class MailingRecipientPickerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="x"
+        )
+        # Получателей больше, чем полей, которые принимает форма
+        cls.mailing = create_started_mailing(cls.owner, 150)
+        cls.clients = list(cls.mailing.recipients.order_by("id"))
+        cls.new_client = Client.objects.create(email="new@x.com", owner=cls.owner)
+        cls.foreign = Client.objects.create(email="foreign@x.com", owner=other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        self.url = reverse("mailings:mailing_update", args=[self.mailing.pk])
+
+    def post(self, **data):
+        start = timezone.localtime() + datetime.timedelta(hours=1)
+        return self.client.post(
+            self.url,
+            {
+                "start_time": start.strftime("%Y-%m-%dT%H:%M"),
+                "end_time": (start + datetime.timedelta(hours=1)).strftime(
+                    "%Y-%m-%dT%H:%M"
+                ),
+                "message": self.mailing.message_id,
+                **data,
+            },
+        )
+
+    def recipient_ids(self):
+        return set(self.mailing.recipients.values_list("pk", flat=True))
+
+    def test_edit_page_shows_count_without_options(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, "Выбрано получателей: 150")
+        self.assertNotContains(response, 'name="recipients"')
+        self.assertNotContains(response, self.clients[0].email)
+
+    def test_posts_only_added_and_removed_clients(self):
+        removed = self.clients[:2]
+        response = self.post(
+            recipients_add=str(self.new_client.pk),
+            recipients_remove=",".join(str(client.pk) for client in removed),
+        )
+
+        self.assertRedirects(response, reverse("mailings:mailing_list"))
+        expected = {client.pk for client in self.clients[2:]} | {self.new_client.pk}
+        self.assertEqual(self.recipient_ids(), expected)
+
+    def test_saving_without_changes_keeps_recipients(self):
+        response = self.post()
+        self.assertRedirects(response, reverse("mailings:mailing_list"))
+        self.assertEqual(len(self.recipient_ids()), 150)
+
+    def test_rejects_foreign_clients_and_removing_everyone(self):
+        response = self.post(recipients_add=str(self.foreign.pk))
+        self.assertFormError(
+            response.context["form"],
+            "recipients_add",
+            f"Выберите корректный вариант. {self.foreign.pk} нет среди допустимых значений.",
+        )
+
+        response = self.post(
+            recipients_remove=",".join(str(client.pk) for client in self.clients)
+        )
+        self.assertFormError(
+            response.context["form"], None, "Выберите сегмент или получателей"
+        )
+        self.assertEqual(len(self.recipient_ids()), 150)
+
+    def test_search_pages_through_saved_recipients(self):
+        url = reverse("mailings:client_search")
+        data = self.client.get(url, {"recipients_of": self.mailing.pk}).json()
+        self.assertEqual(data["total"], 150)
+        self.assertEqual(len(data["results"]), 20)
+        self.assertTrue(data["next_cursor"])
+        self.assertNotIn(
+            self.new_client.pk, [client["id"] for client in data["results"]]
+        )
+
+        self.client.force_login(self.foreign.owner)
+        data = self.client.get(url, {"recipients_of": self.mailing.pk}).json()
+        self.assertEqual(data["results"], [])
+
+    def test_add_recipients_inserts_missing_clients_only(self):
+        scope = versioned_cache.user_scope(self.owner.pk)
+        version = versioned_cache.get_version(scope)
+
+        added = self.mailing.add_recipients(Client.objects.filter(owner=self.owner))
+
+        self.assertEqual(added, 1)
+        self.assertIn(self.new_client.pk, self.recipient_ids())
+        self.assertNotEqual(versioned_cache.get_version(scope), version)
+        self.assertEqual(self.mailing.add_recipients(Client.objects.none()), 0)
+
+
+class BloomFilterTest(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = suppression.BloomFilter(1000, error_rate=0.01)
+        added = [f"user{number}@x.com" for number in range(1000)]
+        for email in added:
+            bloom.add(email)
+
+        self.assertTrue(all(email in bloom for email in added))
+        false_positives = sum(
+            f"other{number}@x.com" in bloom for number in range(10000)
+        )
+        self.assertLess(false_positives, 300)
+        self.assertFalse(bloom.is_full)
+        bloom.add("one-more@x.com")
+        self.assertTrue(bloom.is_full)
+
+
+class SuppressionFilterTest(TestCase):
+    def setUp(self):
+        Suppression.objects.create(email="bounced@x.com", reason="bounce")
+        self.filter = suppression.SuppressionFilter(refresh_interval=3600)
+        self.filter.refresh()
+
+    def test_checks_database_only_on_possible_match(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(self.filter.is_suppressed("fresh@x.com"))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.filter.is_suppressed(" Bounced@X.com "))
+
+    def test_deleted_address_is_confirmed_by_database(self):
+        Suppression.objects.filter(email="bounced@x.com").delete()
+        self.assertTrue(self.filter.might_contain("bounced@x.com"))
+        self.assertFalse(self.filter.is_suppressed("bounced@x.com"))
+
+    def test_refresh_loads_new_rows_incrementally(self):
+        Suppression.objects.create(email="late@x.com", reason="complaint")
+        # Интервал обновления не прошел: новая строка еще не видна
+        self.filter.refresh()
+        self.assertFalse(self.filter.is_suppressed("late@x.com"))
+
+        self.filter.refresh(force=True)
+        self.assertTrue(self.filter.is_suppressed("late@x.com"))
+        self.assertEqual(self.filter.bloom.count, 2)
+
+        self.filter.add("Added@x.com", "unsubscribe")
+        self.assertTrue(self.filter.is_suppressed("added@x.com"))
+
+    @override_settings(
+        CACHES=LOCMEM_CACHES, EMAIL_BACKEND="mailings.tests.FlakySMTPBackend"
+    )
+    def test_send_skips_suppressed_recipients(self):
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        mailing = create_started_mailing(owner, 3)
+        Suppression.objects.create(email="client1@example.com", reason="bounce")
+        suppression.get_filter().refresh(force=True)
+
+        mailing.send_mailing()
+
+        self.assertEqual(
+            FlakySMTPBackend.sent, ["client0@example.com", "client2@example.com"]
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, EMAIL_BACKEND="mailings.tests.FlakySMTPBackend"
+)
+class BlockedFlagsTest(TestCase):
+    def setUp(self):
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        self.mailing = create_started_mailing(self.owner, 3)
+
+    def test_sendable_excludes_blocked_disabled_and_blocked_message(self):
+        disabled = create_started_mailing(self.owner, 0)
+        Mailing.objects.filter(pk=disabled.pk).update(is_disabled=True)
+        blocked = create_started_mailing(self.owner, 0)
+        Mailing.objects.filter(pk=blocked.pk).update(is_blocked=True)
+        blocked_message = create_started_mailing(self.owner, 0)
+        Message.objects.filter(pk=blocked_message.message_id).update(is_blocked=True)
+
+        self.assertEqual(list(Mailing.objects.sendable()), [self.mailing])
+
+    def test_send_skips_blocked_clients(self):
+        Client.objects.filter(email="client1@example.com").update(is_blocked=True)
+        self.assertEqual(
+            sorted(Client.objects.active().values_list("email", flat=True)),
+            ["client0@example.com", "client2@example.com"],
+        )
+
+        self.mailing.send_mailing()
+
+        self.assertEqual(
+            FlakySMTPBackend.sent, ["client0@example.com", "client2@example.com"]
+        )
+
+    def test_blocked_mailing_is_not_sent(self):
+        Message.objects.filter(pk=self.mailing.message_id).update(is_blocked=True)
+        mailing = Mailing.objects.get(pk=self.mailing.pk)
+
+        success, message = mailing.send_mailing()
+
+        self.assertFalse(success)
+        self.assertIn("заблокированы", message)
+        self.assertEqual(FlakySMTPBackend.sent, [])
+
+
+class MessageAttachmentTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, CACHES=LOCMEM_CACHES
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        User = get_user_model()
+        self.owner = User.objects.create_user(email="owner@example.com", password="x")
+        self.other = User.objects.create_user(email="other@example.com", password="x")
+        message = Message.objects.create(subject="Тема", body="Текст", owner=self.owner)
+        self.attachment = message.attachments.create(
+            file=SimpleUploadedFile("price.csv", b"a,b\n1,2\n"),
+            content_type="text/csv",
+        )
+        self.url = reverse("mailings:message_attachment", args=[self.attachment.pk])
+
+    def test_owner_downloads_attachment(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"a,b\n1,2\n")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertIn("price.csv", response["Content-Disposition"])
+
+    def test_other_users_and_anonymous_are_refused(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("users:login"), response["Location"])
+
+    def test_encoded_part_is_shared_by_all_messages(self):
+        (part,) = attachments.encoded_parts(self.attachment.message)
+        self.assertEqual(part.get_filename(), "price.csv")
+        self.assertEqual(part.get_payload(decode=True), b"a,b\n1,2\n")
+
+
+class ImmediateExecutor:
+    """Пул, выполняющий задание сразу в текущем потоке"""
+
+    def submit(self, function, *args):
+        function(*args)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MailingProgressLockTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_second_queue_is_refused_until_finish(self):
+        first = progress.MailingProgress(1)
+        self.assertTrue(first.queue(owner_id=7))
+        self.assertFalse(progress.MailingProgress(1).queue(owner_id=7))
+        self.assertEqual(first.state(), progress.QUEUED)
+
+        first.finish("Готово")
+        self.assertEqual(first.state(), progress.DONE)
+        self.assertTrue(progress.MailingProgress(1).queue(owner_id=7))
+
+    def test_acquire_after_lock_expired(self):
+        queued = progress.MailingProgress(1)
+        queued.queue(owner_id=7)
+        job = progress.MailingProgress(1, queued.token)
+        self.assertTrue(job.acquire())
+
+        # Блокировка истекла, пока задание ждало, и ее взял другой запуск
+        cache.delete(queued.key("lock"))
+        other = progress.MailingProgress(1)
+        self.assertTrue(other.queue(owner_id=7))
+        self.assertFalse(job.acquire())
+
+        # Завершение чужую блокировку не снимает
+        job.finish("Ошибка", progress.ERROR)
+        self.assertEqual(cache.get(queued.key("lock")), other.token)
+
+    def test_snapshot_counts_outcomes(self):
+        tracker = progress.MailingProgress(1)
+        self.assertIsNone(tracker.snapshot())
+        tracker.queue(owner_id=7)
+        tracker.start(owner_id=7, total=4)
+        tracker.record("sent", "a@x.com")
+        tracker.record("failed", "b@x.com")
+        tracker.record("skipped", "c@x.com")
+
+        data = tracker.snapshot()
+        self.assertEqual(
+            (data["sent"], data["failed"], data["skipped"], data["remaining"]),
+            (1, 1, 1, 1),
+        )
+        self.assertEqual(data["percent"], 75.0)
+        seq, events = tracker.events_since(1)
+        self.assertEqual(seq, 3)
+        self.assertEqual([event["email"] for event in events], ["b@x.com", "c@x.com"])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, EMAIL_BACKEND="mailings.tests.FlakySMTPBackend"
+)
+class MailingSendViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FlakySMTPBackend.down = False
+        FlakySMTPBackend.sent = []
+        User = get_user_model()
+        self.owner = User.objects.create_user(email="owner@example.com", password="x")
+        self.other = User.objects.create_user(email="other@example.com", password="x")
+        self.mailing = create_started_mailing(self.owner, 3)
+        self.send_url = reverse("mailings:mailing_send", args=[self.mailing.pk])
+        self.progress_url = reverse("mailings:mailing_progress", args=[self.mailing.pk])
+        self.client.force_login(self.owner)
+
+    def send(self):
+        return self.client.post(self.send_url, HTTP_ACCEPT="application/json")
+
+    def test_send_returns_202_and_runs_in_background(self):
+        self.assertEqual(self.client.get(self.progress_url).json(), {"state": "idle"})
+
+        with (
+            mock.patch.object(tasks, "get_executor", return_value=ImmediateExecutor()),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.send()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            response.json(), {"state": "queued", "progress_url": self.progress_url}
+        )
+        self.assertEqual(len(FlakySMTPBackend.sent), 3)
+        data = self.client.get(self.progress_url).json()
+        self.assertEqual((data["state"], data["sent"], data["total"]), ("done", 3, 3))
+        self.assertNotIn("owner_id", data)
+
+    def test_second_send_while_queued_is_conflict(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.send().status_code, 202)
+            response = self.send()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "Рассылка уже отправляется")
+        self.assertEqual(len(callbacks), 1)
+
+    def test_progress_of_foreign_mailing_is_hidden(self):
+        with self.captureOnCommitCallbacks():
+            self.send()
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.progress_url).status_code, 404)
+        self.assertEqual(self.send().status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MailingProgressStreamTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(email="owner@example.com", password="x")
+        self.other = User.objects.create_user(email="other@example.com", password="x")
+        self.mailing = create_started_mailing(self.owner, 2)
+        self.url = reverse("mailings:mailing_progress_stream", args=[self.mailing.pk])
+
+    def test_wsgi_request_gets_no_content(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+    async def test_streams_progress_events(self):
+        tracker = progress.MailingProgress(self.mailing.pk)
+        await sync_to_async(tracker.queue)(self.owner.pk)
+        await sync_to_async(tracker.start)(self.owner.pk, 2)
+        await sync_to_async(tracker.record)("sent", "client0@example.com")
+        await self.async_client.aforce_login(self.owner)
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+            event = (await anext(chunks)).decode()
+        finally:
+            await chunks.aclose()
+            streams.get_broadcaster(self.mailing.pk).task.cancel()
+
+        self.assertTrue(event.startswith("event: progress\ndata: "))
+        payload = json.loads(event.split("data: ", 1)[1])
+        self.assertEqual(payload["progress"]["sent"], 1)
+        self.assertNotIn("owner_id", payload["progress"])
+        self.assertEqual(
+            [item["email"] for item in payload["events"]], ["client0@example.com"]
+        )
+
+    async def test_foreign_mailing_is_hidden(self):
+        await self.async_client.aforce_login(self.other)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+@unittest.skipUnless(
+    routers.replica_configured(), "реплика не настроена (config.settings_test)"
+)
+@override_settings(
+    CACHES=LOCMEM_CACHES, DATABASE_ROUTERS=["mailings.routers.ReplicaRouter"]
+)
+class ReplicaRoutingTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def handle(self, request, view):
+        """Запрос через ReplicaRoutingMiddleware, ``view`` вызывается внутри"""
+        seen = []
+
+        def get_response(request):
+            seen.extend(view())
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen, response
+
+    def test_get_reads_from_replica(self):
+        # Строка есть только в реплике: GET видит ее, основная база — нет
+        Suppression.objects.using(routers.REPLICA_DB_ALIAS).create(
+            email="replica@example.com", reason="bounce"
+        )
+        seen, _ = self.handle(
+            self.factory.get("/"),
+            lambda: Suppression.objects.values_list("email", flat=True),
+        )
+        self.assertEqual(seen, ["replica@example.com"])
+        self.assertFalse(Suppression.objects.exists())
+
+    def test_first_write_pins_reads_to_default(self):
+        def view():
+            before = Client.objects.all().db
+            Suppression.objects.create(email="new@example.com", reason="bounce")
+            return [before, Client.objects.all().db]
+
+        seen, _ = self.handle(self.factory.get("/"), view)
+        self.assertEqual(seen, [routers.REPLICA_DB_ALIAS, "default"])
+
+    def test_post_sets_cookie_that_pins_next_get(self):
+        view = lambda: [Client.objects.all().db]  # noqa: E731
+
+        seen, response = self.handle(self.factory.post("/"), view)
+        self.assertEqual(seen, ["default"])
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get("/")
+        request.COOKIES[PRIMARY_PIN_COOKIE] = "1"
+        seen, response = self.handle(request, view)
+        self.assertEqual(seen, ["default"])
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+    def test_background_send_uses_default(self):
+        owner = get_user_model().objects.create_user(
+            email="owner@example.com", password="x"
+        )
+        mailing = create_started_mailing(owner, 1)
+        used = []
+        done = threading.Event()
+
+        def run_mailing(mailing_id, token):
+            used.append(Mailing.objects.all().db)
+            done.set()
+
+        def view():
+            # Постановка в очередь из GET-запроса, где чтение идет с реплики
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.enqueue_mailing(mailing)
+            return [Client.objects.all().db]
+
+        with mock.patch.object(tasks, "run_mailing", run_mailing):
+            self.handle(self.factory.get("/"), view)
+            self.assertTrue(done.wait(5))
+        self.assertEqual(used, ["default"])
+
+
+class UnavailableRedis:
+    """Redis, на любое обращение к которому возвращается ошибка соединения"""
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            raise RedisConnectionError("Connection refused")
+
+        return call
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    """Два процесса с общим «Redis» (LocMemCache) и доставкой pub/sub в памяти"""
+
+    def setUp(self):
+        tiers = mock.patch.dict(cache_backends._tiers, clear=True)
+        tiers.start()
+        self.addCleanup(tiers.stop)
+        listener = mock.patch.object(cache_backends.LocalTier, "ensure_listener")
+        listener.start()
+        self.addCleanup(listener.stop)
+
+        self.redis = LocMemCache("two-tier-test", {})
+        self.redis.clear()
+        self.first = self.make_process("first")
+        self.second = self.make_process("second")
+
+    def make_process(self, name):
+        backend = cache_backends.TwoTierCache(
+            "redis://127.0.0.1:6379/1",
+            {
+                "OPTIONS": {
+                    # Свой канал — свое локальное состояние, как в другом процессе
+                    "CHANNEL": f"test:{name}",
+                    "LOCAL_TIMEOUT": 30,
+                    "LOCAL_EXCLUDE_PREFIXES": ["lock:"],
+                }
+            },
+        )
+        backend.remote = self.redis
+        backend.tier.publish = lambda keys: self.deliver(backend.tier, keys)
+        return backend
+
+    def deliver(self, sender, keys):
+        if not keys or sender.is_down:
+            return
+        payload = (sender.token + "|" + "\n".join(keys)).encode()
+        for process in (self.first, self.second):
+            process.tier._on_message({"data": payload})
+
+    def take_down(self, backend):
+        backend.remote = UnavailableRedis()
+
+    def local_expiry(self, backend, key):
+        _, expires_at = backend.local.data[backend.make_and_validate_key(key)]
+        return expires_at
+
+    def test_change_invalidates_other_process(self):
+        self.first.set("stats", 1)
+        self.assertEqual(self.second.get("stats"), 1)
+
+        self.first.set("stats", 2)
+        self.assertEqual(self.second.get("stats"), 2)
+
+        self.first.delete("stats")
+        self.assertIsNone(self.second.get("stats"))
+
+    def test_excluded_prefix_is_never_local(self):
+        self.first.set("lock:1", "token")
+        self.assertEqual(self.first.get("lock:1"), "token")
+        self.assertEqual(self.first.local.data, {})
+
+        with self.assertLogs("mailings.cache_backends", "WARNING"):
+            self.take_down(self.first)
+            self.first.set("lock:2", "token")
+        self.assertEqual(self.first.local.data, {})
+        self.assertIsNone(self.first.get("lock:2"))
+
+    def test_add_fails_closed_without_redis(self):
+        with self.assertLogs("mailings.cache_backends", "WARNING"):
+            self.take_down(self.first)
+            self.assertFalse(self.first.add("lock:1", "token"))
+        self.assertFalse(self.first.add("stats", 1))
+        self.assertIsNone(self.first.get("stats"))
+
+    def test_outage_entries_expire_after_local_timeout(self):
+        with self.assertLogs("mailings.cache_backends", "WARNING"):
+            self.take_down(self.first)
+            self.first.set("stats", 1, timeout=None)
+        limit = time.time() + 30
+        self.assertLessEqual(self.local_expiry(self.first, "stats"), limit)
+
+        self.assertEqual(self.first.incr("stats"), 2)
+        self.assertLessEqual(self.local_expiry(self.first, "stats"), limit + 1)
+
+        # Когда локальный срок истек, ключ больше не читается из памяти
+        cache_key = self.first.make_and_validate_key("stats")
+        self.first.local.data[cache_key] = (2, time.time() - 1)
+        self.assertIsNone(self.first.get("stats"))
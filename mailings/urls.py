@@ -11,6 +11,8 @@ urlpatterns = [
     # Клиенты
     path("clients/", views.ClientListView.as_view(), name="client_list"),
     path("clients/create/", views.ClientCreateView.as_view(), name="client_create"),
+    path("clients/import/", views.ClientImportView.as_view(), name="client_import"),
+    path("clients/search/", views.ClientSearchView.as_view(), name="client_search"),
     # URL с параметрами - после конкретных
     path("clients/<int:pk>/", views.ClientDetailView.as_view(), name="client_detail"),
     path(
@@ -39,6 +41,24 @@ urlpatterns = [
         views.MessageDeleteView.as_view(),
         name="message_delete",
     ),
+    path(
+        "messages/attachments/<int:pk>/",
+        views.MessageAttachmentView.as_view(),
+        name="message_attachment",
+    ),
+    # Сегменты
+    path("segments/", views.SegmentListView.as_view(), name="segment_list"),
+    path("segments/create/", views.SegmentCreateView.as_view(), name="segment_create"),
+    path(
+        "segments/<int:pk>/update/",
+        views.SegmentUpdateView.as_view(),
+        name="segment_update",
+    ),
+    path(
+        "segments/<int:pk>/delete/",
+        views.SegmentDeleteView.as_view(),
+        name="segment_delete",
+    ),
     # Рассылки
     path("mailings/", views.MailingListView.as_view(), name="mailing_list"),
     path("mailings/create/", views.MailingCreateView.as_view(), name="mailing_create"),
@@ -46,6 +66,16 @@ urlpatterns = [
     path(
         "mailings/<int:pk>/send/", views.MailingSendView.as_view(), name="mailing_send"
     ),
+    path(
+        "mailings/<int:pk>/progress/",
+        views.MailingProgressView.as_view(),
+        name="mailing_progress",
+    ),
+    path(
+        "mailings/<int:pk>/progress/stream/",
+        views.mailing_progress_stream,
+        name="mailing_progress_stream",
+    ),
     # URL с параметрами - после send
     path(
         "mailings/<int:pk>/", views.MailingDetailView.as_view(), name="mailing_detail"
@@ -1,69 +1,170 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import (
     ListView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
+    FormView,
 )
 from django.contrib import messages
 from django.utils import timezone
 from django.shortcuts import redirect, get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.views import View
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
 from django.conf import settings
-from django.db.models import Count, Q, Case, When, IntegerField
-
-
-from mailings.models import Client, Message, Mailing, MailingAttempt, logger
-from mailings.forms import ClientForm, MessageForm, MailingForm
+from django.db.models import Case, When, IntegerField, ProtectedError
+
+
+from mailings.models import (
+    Client,
+    Message,
+    Mailing,
+    MailingAttempt,
+    MailingAttemptArchive,
+    MessageAttachment,
+    Segment,
+    logger,
+)
+from mailings import cache as versioned_cache, counters, streams
+from mailings.conditional import ConditionalDetailMixin, ConditionalGetMixin
+from mailings.forms import (
+    ClientForm,
+    ClientImportForm,
+    MessageForm,
+    MailingForm,
+    SegmentForm,
+)
+from mailings.importers import detect_format, import_clients, iter_rows
+from mailings.pagination import KeysetPaginationMixin, approximate_count
+from mailings.partitions import archived_attempt_stats, parse_period
+from mailings.progress import MailingProgress
+from mailings.tasks import enqueue_mailing
 
 
-@method_decorator(cache_page(settings.CACHE_MIDDLEWARE_SECONDS), name="dispatch")
-class HomeView(ListView):
+class HomeView(ConditionalGetMixin, ListView):
     """Главная страница с общей статистикой"""
 
     model = Mailing
     template_name = "mailings/home.html"
     context_object_name = "mailings"
+    latest_mailings_count = 5
 
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            return Mailing.objects.filter(owner=self.request.user)
-        return Mailing.objects.none()
+        if not self.request.user.is_authenticated:
+            return []
+        # Список рассылок кешируется для каждого пользователя отдельно
+        return versioned_cache.get_or_set(
+            "home_mailings",
+            [versioned_cache.user_scope(self.request.user.pk)],
+            lambda: list(
+                Mailing.objects.filter(owner=self.request.user)
+                .select_related("message")
+                .order_by("-start_time", "-id")[: self.latest_mailings_count]
+            ),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(
+            versioned_cache.get_or_set(
+                "home_stats", [versioned_cache.GLOBAL_SCOPE], self.get_stats
+            )
+        )
+        return context
 
-        # Общее количество рассылок
-        context["total_mailings"] = Mailing.objects.count()
-
-        # Количество активных рассылок
-        now = timezone.now()
-        context["active_mailings"] = Mailing.objects.filter(
-            start_time__lte=now, end_time__gte=now, status="started"
-        ).count()
-
-        # Количество уникальных получателей
-        context["total_clients"] = Client.objects.values("email").distinct().count()
+    def get_change_scopes(self):
+        return [
+            versioned_cache.GLOBAL_SCOPE,
+            versioned_cache.user_scope(self.request.user.pk),
+        ]
 
-        return context
+    @staticmethod
+    def get_stats():
+        # Счетчики поддерживаются сигналами, большие таблицы не сканируются
+        return counters.get_counters()
 
 
 # CRUD для клиентов
-class ClientListView(LoginRequiredMixin, ListView):
+class ClientListView(
+    LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView
+):
     model = Client
     template_name = "mailings/client_list.html"
     context_object_name = "clients"
+    ordering = ("email", "id")
+    search_fields = Client.SEARCH_FIELDS
+    search_text_fields = Client.SEARCH_TEXT_FIELDS
+    json_fields = ("id", "email", "full_name", "comment")
 
     def get_queryset(self):
-        return Client.objects.filter(owner=self.request.user)
+        queryset = Client.objects.filter(owner=self.request.user)
+
+        mailing_id = self.request.GET.get("mailing")
+        if mailing_id and mailing_id.isdigit():
+            mailing = (
+                Mailing.objects.filter(owner=self.request.user, pk=mailing_id)
+                .select_related("segment")
+                .first()
+            )
+            if mailing is None:
+                queryset = queryset.none()
+            else:
+                queryset = mailing.get_recipients().filter(owner=self.request.user)
+
+        segment_id = self.request.GET.get("segment")
+        if segment_id and segment_id.isdigit():
+            segment = Segment.objects.filter(
+                owner=self.request.user, pk=segment_id
+            ).first()
+            queryset = segment.get_clients() if segment else queryset.none()
+
+        return self.search_queryset(queryset)
+
+
+class ClientSearchView(ClientListView):
+    """
+    JSON-поиск клиентов для выбора получателей рассылки.
 
+    С ``recipients_of`` — постраничный список получателей рассылки,
+    выбранных вручную (без клиентов сегмента).
+    """
 
-class ClientDetailView(LoginRequiredMixin, DetailView):
+    paginate_by = 20
+    json_fields = ("id", "email", "full_name")
+
+    def get_queryset(self):
+        mailing_id = self.request.GET.get("recipients_of", "")
+        if not mailing_id.isdigit():
+            return super().get_queryset()
+        mailing = Mailing.objects.filter(owner=self.request.user, pk=mailing_id).first()
+        if mailing is None:
+            return Client.objects.none()
+        return self.search_queryset(mailing.recipients.filter(owner=self.request.user))
+
+    def wants_json(self):
+        return True
+
+    def get_json_data(self, context):
+        data = super().get_json_data(context)
+        # Количество для «выбрать все найденные» нужно только на первой
+        # странице: точно до COUNT_LIMIT строк, дальше оценка
+        if not self.request.GET.get("cursor"):
+            data["total"], data["total_exact"] = approximate_count(self.object_list)
+        return data
+
+
+class ClientDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Client
     template_name = "mailings/client_detail.html"
     context_object_name = "client"
@@ -84,6 +185,26 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
+class ClientImportView(LoginRequiredMixin, FormView):
+    """Массовый импорт клиентов из CSV/NDJSON"""
+
+    form_class = ClientImportForm
+    template_name = "mailings/client_import.html"
+    success_url = reverse_lazy("mailings:client_list")
+
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        stats = import_clients(
+            iter_rows(upload, detect_format(upload.name)),
+            self.request.user,
+            update_existing=form.cleaned_data["update_existing"],
+        )
+        messages.success(self.request, f"Импорт завершен. {stats}")
+        for error in stats.errors:
+            messages.warning(self.request, error)
+        return super().form_valid(form)
+
+
 class ClientUpdateView(LoginRequiredMixin, UpdateView):
     model = Client
     form_class = ClientForm
@@ -112,16 +233,21 @@ class ClientDeleteView(LoginRequiredMixin, DeleteView):
 
 
 # CRUD для сообщений
-class MessageListView(LoginRequiredMixin, ListView):
+class MessageListView(
+    LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView
+):
     model = Message
     template_name = "mailings/message_list.html"
     context_object_name = "messages"
+    search_fields = ("subject",)
+    search_text_fields = ("body",)
+    json_fields = ("id", "subject", "body")
 
     def get_queryset(self):
-        return Message.objects.filter(owner=self.request.user)
+        return self.search_queryset(Message.objects.filter(owner=self.request.user))
 
 
-class MessageDetailView(LoginRequiredMixin, DetailView):
+class MessageDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Message
     template_name = "mailings/message_detail.html"
     context_object_name = "message"
@@ -130,6 +256,25 @@ class MessageDetailView(LoginRequiredMixin, DetailView):
         return Message.objects.filter(owner=self.request.user)
 
 
+class MessageAttachmentView(LoginRequiredMixin, View):
+    """Скачивание вложения: файл отдается только владельцу сообщения"""
+
+    def get(self, request, pk):
+        attachment = get_object_or_404(
+            MessageAttachment, pk=pk, message__owner=request.user
+        )
+        try:
+            file = attachment.file.open("rb")
+        except FileNotFoundError:
+            raise Http404("Файл вложения не найден")
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=attachment.filename,
+            content_type=attachment.content_type,
+        )
+
+
 class MessageCreateView(LoginRequiredMixin, CreateView):
     model = Message
     form_class = MessageForm
@@ -169,74 +314,203 @@ class MessageDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
+# CRUD для сегментов
+class SegmentListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
+    model = Segment
+    template_name = "mailings/segment_list.html"
+    context_object_name = "segments"
+
+    def get_queryset(self):
+        return Segment.objects.filter(owner=self.request.user)
+
+
+class SegmentCreateView(LoginRequiredMixin, CreateView):
+    model = Segment
+    form_class = SegmentForm
+    template_name = "mailings/segment_form.html"
+    success_url = reverse_lazy("mailings:segment_list")
+
+    def form_valid(self, form):
+        form.instance.owner = self.request.user
+        messages.success(self.request, "Сегмент успешно создан!")
+        return super().form_valid(form)
+
+
+class SegmentUpdateView(LoginRequiredMixin, UpdateView):
+    model = Segment
+    form_class = SegmentForm
+    template_name = "mailings/segment_form.html"
+    success_url = reverse_lazy("mailings:segment_list")
+
+    def get_queryset(self):
+        return Segment.objects.filter(owner=self.request.user)
+
+    def form_valid(self, form):
+        messages.success(self.request, "Сегмент успешно обновлен!")
+        return super().form_valid(form)
+
+
+class SegmentDeleteView(LoginRequiredMixin, DeleteView):
+    model = Segment
+    template_name = "mailings/segment_confirm_delete.html"
+    success_url = reverse_lazy("mailings:segment_list")
+
+    def get_queryset(self):
+        return Segment.objects.filter(owner=self.request.user)
+
+    def form_valid(self, form):
+        try:
+            response = super().form_valid(form)
+        except ProtectedError:
+            messages.error(
+                self.request, "Сегмент используется в рассылках и не может быть удален"
+            )
+            return redirect("mailings:segment_list")
+        messages.success(self.request, "Сегмент успешно удален!")
+        return response
+
+
 # CRUD для рассылок
-class MailingListView(LoginRequiredMixin, ListView):
+class MailingListView(
+    LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView
+):
     model = Mailing
     template_name = "mailings/mailing_list.html"
     context_object_name = "mailings"
+    json_fields = ("id", "status", "recipients_count")
 
     def get_queryset(self):
-        return Mailing.objects.filter(owner=self.request.user)
+        # Количество получателей — подзапросом, а не запросом на каждую строку
+        return (
+            Mailing.objects.filter(owner=self.request.user)
+            .select_related("message", "segment")
+            .with_counts()
+        )
 
 
 class MailingSendView(LoginRequiredMixin, View):
     """Контроллер для отправки рассылки"""
 
     def post(self, request, pk):
-        print(f"\n{'=' * 60}")
-        print(f"✅ ПОЛУЧЕН POST ЗАПРОС НА ОТПРАВКУ РАССЫЛКИ #{pk}")
-        print(f"{'=' * 60}")
-        print(f"Пользователь: {request.user}")
-        print(f"CSRF токен: {request.POST.get('csrfmiddlewaretoken', 'НЕТ')}")
-
-        try:
-            # Получаем рассылку
-            mailing = get_object_or_404(Mailing, pk=pk, owner=request.user)
-            print(f"✅ Рассылка найдена: {mailing.message.subject}")
-            print(f"Статус: {mailing.status}")
-            print(f"Получателей: {mailing.recipients.count()}")
-
-            # Проверяем статус
-            mailing.update_status()
-            print(f"Статус после update: {mailing.status}")
-
-            if mailing.status != "started":
-                print("❌ Рассылка не активна")
-                messages.error(
-                    request,
-                    f"Рассылка не активна. Текущий статус: {mailing.get_status_display()}",
-                )
-                return redirect("mailings:mailing_detail", pk=pk)
-
-            # Отправляем
-            print("🚀 Запуск отправки...")
-            success, result = mailing.send_mailing()
-
-            print(f"Результат: {result}")
-
-            if success:
-                messages.success(request, f"✅ {result}")
-            else:
-                messages.error(request, f"❌ {result}")
+        mailing = get_object_or_404(
+            Mailing.objects.select_related("message"), pk=pk, owner=request.user
+        )
+        # Отправка идет в фоне, запрос только ставит рассылку в очередь
+        mailing.update_status()
 
-        except Exception as e:
-            print(f"❌ Ошибка: {e}")
-            import traceback
+        if mailing.status != "started":
+            error = (
+                f"Рассылка не активна. Текущий статус: {mailing.get_status_display()}"
+            )
+        elif not enqueue_mailing(mailing):
+            error = "Рассылка уже отправляется"
+        else:
+            error = None
+        logger.debug(
+            "Отправка рассылки #%s пользователем %s: %s",
+            pk,
+            request.user,
+            error or "поставлена в очередь",
+        )
 
-            traceback.print_exc()
-            messages.error(request, f"❌ Ошибка: {str(e)}")
+        if self.wants_json(request):
+            progress_url = reverse("mailings:mailing_progress", args=[pk])
+            if error:
+                return JsonResponse(
+                    {"error": error, "progress_url": progress_url}, status=409
+                )
+            return JsonResponse(
+                {"state": "queued", "progress_url": progress_url}, status=202
+            )
 
-        print(f"{'=' * 60}\n")
+        if error:
+            messages.error(request, f"❌ {error}")
+        else:
+            messages.success(request, "✅ Рассылка поставлена в очередь отправки")
         return redirect("mailings:mailing_detail", pk=pk)
 
-
-class MailingDetailView(LoginRequiredMixin, DetailView):
+    @staticmethod
+    def wants_json(request):
+        return "application/json" in request.headers.get("Accept", "")
+
+
+class MailingProgressView(LoginRequiredMixin, View):
+    """
+    Прогресс отправки рассылки в JSON.
+
+    Данные читаются из кеша; база затрагивается, только если по рассылке
+    еще не было отправок.
+    """
+
+    def get(self, request, pk):
+        data = MailingProgress(pk).snapshot()
+        if data is None:
+            get_object_or_404(Mailing.objects.only("id"), pk=pk, owner=request.user)
+            return JsonResponse({"state": "idle"})
+        if data.pop("owner_id") != request.user.pk:
+            raise Http404
+        return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+
+
+async def mailing_progress_stream(request, pk):
+    """
+    Поток Server-Sent Events с ходом отправки рассылки.
+
+    Асинхронное представление: держит соединение открытым без занятого
+    потока только под ASGI-сервером (``config.asgi``).
+    """
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI бесконечный поток занял бы поток сервера целиком:
+        # 204 останавливает переподключение EventSource, страница опрашивает
+        # JSON-эндпоинт прогресса
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise Http404
+    snapshot = await sync_to_async(MailingProgress(pk).snapshot)()
+    if snapshot is not None:
+        if snapshot["owner_id"] != user.pk:
+            raise Http404
+    elif not await Mailing.objects.filter(pk=pk, owner=user).aexists():
+        raise Http404
+
+    response = StreamingHttpResponse(
+        streams.event_stream(pk), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Отключает буферизацию ответа в nginx
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class MailingDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     model = Mailing
     template_name = "mailings/mailing_detail.html"
     context_object_name = "mailing"
+    recipients_preview_size = 20
+    attempts_preview_size = 10
 
     def get_queryset(self):
-        return Mailing.objects.filter(owner=self.request.user)
+        return (
+            Mailing.objects.filter(owner=self.request.user)
+            .select_related("message", "segment")
+            .with_counts()
+        )
+
+    def get_validators(self):
+        # Страница показывает попытки и получателей, поэтому валидатор —
+        # изменения данных владельца. Если статус устарел, get_object его
+        # сохранит, и страницу нужно построить заново.
+        period = (
+            Mailing.objects.filter(owner=self.request.user, pk=self.kwargs["pk"])
+            .values_list("start_time", "end_time", "status")
+            .first()
+        )
+        if period is None or Mailing.status_at(*period[:2]) != period[2]:
+            return None
+        parts, modified = super().get_validators()
+        return [*parts, self.kwargs["pk"]], modified
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
@@ -247,6 +521,23 @@ class MailingDetailView(LoginRequiredMixin, DetailView):
             print(f"Ошибка при обновлении статуса: {e}")
         return obj
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Только начало списков: полные списки доступны со своей пагинацией
+        if self.object.segment_id:
+            # Получатели сегмента не лежат в связи, считаем их отдельным запросом
+            recipients = self.object.get_recipients()
+            self.object.recipients_count = recipients.count()
+        else:
+            recipients = self.object.recipients.all()
+        context["recipients_preview"] = recipients.order_by("email", "id")[
+            : self.recipients_preview_size
+        ]
+        context["latest_attempts"] = self.object.attempts.order_by(
+            "-attempt_time", "-id"
+        )[: self.attempts_preview_size]
+        return context
+
 
 class MailingCreateView(LoginRequiredMixin, CreateView):
     model = Mailing
@@ -286,62 +577,72 @@ class MailingUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class MailingReportView(LoginRequiredMixin, ListView):
+class MailingReportView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Контроллер для отображения отчетов по рассылкам"""
 
     model = Mailing
     template_name = "mailings/report.html"
     context_object_name = "mailings"
+    ordering = ("-start_time", "-id")
+    json_fields = ("id", "status", "recipients_count", "success_count", "fail_count")
 
-    def get_queryset(self):
-        # Получаем все рассылки пользователя
-        mailings = Mailing.objects.filter(owner=self.request.user)
-
-        # Обновляем статусы
-        for mailing in mailings:
-            mailing.update_status()
+    def get_owner_mailings(self):
+        return Mailing.objects.filter(owner=self.request.user)
 
-        # Возвращаем рассылки с аннотациями
-        return (
-            Mailing.objects.filter(owner=self.request.user)
-            .annotate(
-                success_count=Count("attempts", filter=Q(attempts__status="success")),
-                fail_count=Count("attempts", filter=Q(attempts__status="failed")),
-            )
-            .prefetch_related("recipients", "attempts")
-            .order_by("-start_time")
-        )
+    def get_queryset(self):
+        # Статусы обновляются одним UPDATE, а не по рассылке
+        self.get_owner_mailings().refresh_statuses()
+        # Счетчики получателей и попыток — подзапросами, только для страницы
+        return self.get_owner_mailings().select_related("message").with_counts()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         # Текущее время
         now = timezone.now()
-
-        # Получаем все рассылки пользователя (уже с обновленными статусами)
-        all_mailings = list(self.get_queryset())
+        mailings = self.get_owner_mailings()
 
         # Общее количество рассылок
-        context["total_mailings"] = len(all_mailings)
+        context["total_mailings"] = mailings.count()
 
         # Количество клиентов
         context["total_clients"] = Client.objects.filter(
             owner=self.request.user
         ).count()
 
-        # Активные рассылки - используем обновленные статусы из queryset
-        active_mailings = [
-            m
-            for m in all_mailings
-            if m.status == "started" and m.start_time <= now <= m.end_time
-        ]
-        context["active_mailings"] = len(active_mailings)
+        # Активные рассылки: статусы уже обновлены в get_queryset
+        active_mailings = mailings.filter(
+            status="started", start_time__lte=now, end_time__gte=now
+        )
+        context["active_mailings"] = active_mailings.count()
 
         # Статистика по попыткам
         attempts = MailingAttempt.objects.filter(mailing__owner=self.request.user)
         context["success_attempts"] = attempts.filter(status="success").count()
         context["failed_attempts"] = attempts.filter(status="failed").count()
 
+        # Архивные периоды читаются только по явному запросу (?archive=YYYY-MM)
+        periods = []
+        for value in self.request.GET.getlist("archive"):
+            try:
+                periods.append(parse_period(value).date())
+            except ValueError:
+                continue
+        context["archives"] = MailingAttemptArchive.objects.all()
+        selected_archives = MailingAttemptArchive.objects.filter(period__in=periods)
+        context["selected_archives"] = selected_archives
+        if selected_archives:
+            archived = archived_attempt_stats(
+                selected_archives, mailings.values_list("pk", flat=True)
+            )
+            for mailing in context["mailings"]:
+                counters = archived.get(mailing.pk, {})
+                mailing.success_count += counters.get("success", 0)
+                mailing.fail_count += counters.get("failed", 0)
+            for counters in archived.values():
+                context["success_attempts"] += counters.get("success", 0)
+                context["failed_attempts"] += counters.get("failed", 0)
+
         # Добавляем текущее время в контекст
         context["now"] = now
 
@@ -364,14 +665,43 @@ class MailingDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class MailingAttemptListView(LoginRequiredMixin, ListView):
+class MailingAttemptListView(
+    LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView
+):
     model = MailingAttempt
     template_name = "mailings/attempt_list.html"
     context_object_name = "attempts"
+    ordering = ("-attempt_time", "-id")
+    json_fields = ("id", "attempt_time", "status", "server_response", "mailing_id")
 
     def get_queryset(self):
         # Показываем попытки только для рассылок текущего пользователя
-        user_mailings = Mailing.objects.filter(owner=self.request.user)
-        return MailingAttempt.objects.filter(mailing__in=user_mailings).order_by(
-            "-attempt_time"
+        queryset = MailingAttempt.objects.filter(
+            mailing__owner=self.request.user
+        ).select_related("mailing__message")
+
+        mailing_id = self.request.GET.get("mailing")
+        if mailing_id and mailing_id.isdigit():
+            queryset = queryset.filter(mailing_id=mailing_id)
+
+        status = self.request.GET.get("status")
+        if status in dict(MailingAttempt.STATUS_CHOICES):
+            queryset = queryset.filter(status=status)
+
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["total_attempts"], context["total_exact"] = approximate_count(
+            self.object_list
         )
+        context["user_mailings"] = (
+            Mailing.objects.filter(owner=self.request.user)
+            .select_related("message")
+            .only("id", "start_time", "message__subject")
+            .order_by("-start_time")
+        )
+        context["status_choices"] = MailingAttempt.STATUS_CHOICES
+        context["selected_mailing"] = self.request.GET.get("mailing", "")
+        context["selected_status"] = self.request.GET.get("status", "")
+        return context